@@ -124,7 +124,7 @@ fi
 
 # Check if required Python files exist
 cd src
-for file in launch_previewer.py fashionpreviewer.py icon_handler.py palette_ranges.py; do
+for file in launch_previewer.py fashionpreviewer.py icon_handler.py palette_ranges.py render_worker.py palette_buffer.py preview_hitmap.py frame_usage.py icon_assets.py icon_matching.py icon_batch.py icon_writer.py keying.py palette_index.py frame_export.py export_archive.py sprite_atlas.py frame_animation.py outfit_matrix.py portrait_export.py background_export.py export_queue.py; do
     if [ ! -f "$file" ]; then
         echo "Error: $file not found!"
         echo "Please redownload the repository and try again."
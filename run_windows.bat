@@ -110,6 +110,114 @@ if not exist "src\palette_ranges.py" (
     pause
     exit /b 1
 )
+if not exist "src\render_worker.py" (
+    echo Error: src\render_worker.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\palette_buffer.py" (
+    echo Error: src\palette_buffer.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\preview_hitmap.py" (
+    echo Error: src\preview_hitmap.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\frame_usage.py" (
+    echo Error: src\frame_usage.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\icon_assets.py" (
+    echo Error: src\icon_assets.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\icon_matching.py" (
+    echo Error: src\icon_matching.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\icon_batch.py" (
+    echo Error: src\icon_batch.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\icon_writer.py" (
+    echo Error: src\icon_writer.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\keying.py" (
+    echo Error: src\keying.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\palette_index.py" (
+    echo Error: src\palette_index.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\frame_export.py" (
+    echo Error: src\frame_export.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\export_archive.py" (
+    echo Error: src\export_archive.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\sprite_atlas.py" (
+    echo Error: src\sprite_atlas.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\frame_animation.py" (
+    echo Error: src\frame_animation.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\outfit_matrix.py" (
+    echo Error: src\outfit_matrix.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\portrait_export.py" (
+    echo Error: src\portrait_export.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\background_export.py" (
+    echo Error: src\background_export.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
+if not exist "src\export_queue.py" (
+    echo Error: src\export_queue.py not found!
+    echo Please redownload the repository and try again.
+    pause
+    exit /b 1
+)
 
 REM Check if required folders exist
 if not exist "src\rawbmps" (
@@ -0,0 +1,103 @@
+import os
+from PIL import Image
+
+from frame_export import decode_export_frame, indexed_frame_palette, merge_palette
+from icon_writer import write_image_atomic
+from portrait_export import compose_portrait
+
+# Background export of frames against several background colors at once.
+#
+# A frame's background is palette index 0, so a background color is only a
+# palette edit: each frame is decoded once, and every color gets the frame's
+# indices with the merged palette and index 0 set to that color. The portrait
+# mask (pixels that differ from the background) comes from the same indices
+# with a 256-entry lookup table instead of comparing rendered pixels.
+
+BACKGROUND_INDEX = 0
+
+
+def background_color_name(color):
+    """Folder / file name part for a background color: rrggbb"""
+    return "".join(f"{c:02x}" for c in color)
+
+
+def background_palette(merged_palette, background_color):
+    """Flat palette of a merged palette with the background index set to background_color."""
+    palette = list(merged_palette)
+    palette[BACKGROUND_INDEX] = tuple(background_color)
+    return [c for rgb in palette for c in rgb]
+
+
+def background_foreground_lut(merged_palette, background_color):
+    """Index -> mask value: 255 for indices that don't show as the background color."""
+    background_color = tuple(background_color)
+    return [0 if i == BACKGROUND_INDEX or tuple(color) == background_color else 255
+            for i, color in enumerate(merged_palette)]
+
+
+def render_background_variants(indexed_img, merged_palette, colors):
+    """Yield (color, RGB frame on that background, foreground mask) for each color."""
+    indices = Image.frombytes("L", indexed_img.size, indexed_img.tobytes())
+    for color in colors:
+        frame = Image.frombytes("P", indices.size, indices.tobytes())
+        frame.putpalette(background_palette(merged_palette, color))
+        yield color, frame.convert("RGB"), indices.point(background_foreground_lut(merged_palette, color))
+
+
+def background_variant_paths(image_paths, colors, output_dir, portraits=None):
+    """Output paths per (frame, color): output_dir/<rrggbb>/<frame>.bmp plus the portrait files.
+
+    portraits is None, "no_cute_bg", "cute_bg" or "both" like the portrait export option.
+    """
+    paths = []
+    for image_path in image_paths:
+        name = os.path.splitext(os.path.basename(image_path))[0]
+        for color in colors:
+            folder = os.path.join(output_dir, background_color_name(color))
+            outputs = [os.path.join(folder, f"{name}.bmp")]
+            if portraits in ("no_cute_bg", "both"):
+                outputs.append(os.path.join(folder, f"{name}_illu.bmp"))
+            if portraits in ("cute_bg", "both"):
+                outputs.append(os.path.join(folder, f"{name}_illu_cute.bmp"))
+            paths.append((image_path, color, outputs))
+    return paths
+
+
+def export_background_variants(template, image_paths, colors, output_dir, portraits=None, myshop_base=None,
+                               load_frame=None, progress=None, cancel_event=None):
+    """Write every frame on every background color; returns (files written, failed) or None when cancelled.
+
+    myshop_base is a portrait_export.MyShopBase, needed for "cute_bg" portraits.
+    progress(done, total) is called per frame.
+    """
+    colors = list(dict.fromkeys(tuple(color) for color in colors))
+    if portraits in ("cute_bg", "both") and myshop_base is None:
+        raise ValueError("MyShop base image not found")
+    written = 0
+    failed = []
+    total = len(image_paths)
+    variants = background_variant_paths(image_paths, colors, output_dir, portraits)
+    for done, image_path in enumerate(image_paths, 1):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        outputs = variants[(done - 1) * len(colors):done * len(colors)]
+        try:
+            if load_frame is not None:
+                original_img = load_frame(image_path)
+                original_palette = indexed_frame_palette(original_img)
+            else:
+                original_img, original_palette = decode_export_frame(image_path)
+            merged_palette = merge_palette(template, original_palette)
+            for (color, img, mask), (_, _, paths) in zip(
+                    render_background_variants(original_img, merged_palette, colors), outputs):
+                write_image_atomic(img, paths[0], "BMP")
+                written += 1
+                for path in paths[1:]:
+                    base = myshop_base if path.endswith("_illu_cute.bmp") else None
+                    write_image_atomic(compose_portrait(img, color, base, mask), path, "BMP")
+                    written += 1
+        except Exception as e:
+            failed.append(f"{image_path}: {e}")
+        if progress:
+            progress(done, total)
+    return written, failed
@@ -0,0 +1,79 @@
+import io
+import json
+import time
+import tarfile
+import zipfile
+import threading
+
+# Streaming archive output for bulk exports.
+#
+# Encoded frames are handed over as bytes and appended to a .zip or .tar(.gz) as
+# soon as they are rendered, so an export of hundreds of frames produces one file
+# and never writes temporary files. A manifest.json describing the export (the
+# palettes used, format, frame list) is added when the archive is closed.
+
+ARCHIVE_FORMATS = ("zip", "tar")
+
+
+def archive_extension(archive_format, compression_level):
+    """File extension of an archive; compressed tars are .tar.gz."""
+    if archive_format == "zip":
+        return ".zip"
+    if archive_format == "tar":
+        return ".tar.gz" if compression_level else ".tar"
+    raise ValueError(f"Unknown archive format: {archive_format}")
+
+
+class ExportArchiveWriter:
+    """Append-only .zip / .tar(.gz) writer fed with in-memory files."""
+
+    def __init__(self, path, archive_format="zip", compression_level=6):
+        self.path = path
+        self.archive_format = archive_format
+        self.compression_level = max(0, min(9, int(compression_level)))
+        self.names = []
+        self._lock = threading.Lock()
+        if archive_format == "zip":
+            compression = zipfile.ZIP_DEFLATED if self.compression_level else zipfile.ZIP_STORED
+            self._archive = zipfile.ZipFile(path, "w", compression=compression,
+                                            compresslevel=self.compression_level or None)
+        elif archive_format == "tar":
+            if self.compression_level:
+                self._archive = tarfile.open(path, "w:gz", compresslevel=self.compression_level)
+            else:
+                self._archive = tarfile.open(path, "w")
+        else:
+            raise ValueError(f"Unknown archive format: {archive_format}")
+
+    @property
+    def closed(self):
+        return self._archive is None
+
+    def write(self, arcname, data):
+        """Add one file to the archive."""
+        with self._lock:
+            if self._archive is None:
+                raise ValueError(f"Archive already closed: {self.path}")
+            self._add(self._archive, arcname, data)
+            self.names.append(arcname)
+
+    def _add(self, archive, arcname, data):
+        if self.archive_format == "zip":
+            archive.writestr(arcname, data)
+        else:
+            info = tarfile.TarInfo(arcname)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            archive.addfile(info, io.BytesIO(data))
+
+    def close(self, manifest=None, manifest_name="manifest.json"):
+        """Write the manifest (if any) and finish the archive."""
+        with self._lock:
+            if self._archive is None:
+                return
+            archive, self._archive = self._archive, None
+        try:
+            if manifest is not None:
+                self._add(archive, manifest_name, json.dumps(manifest, indent=2).encode("utf-8"))
+        finally:
+            archive.close()
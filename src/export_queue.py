@@ -0,0 +1,239 @@
+import json
+import os
+import threading
+import time
+
+# Export queue: exports run in the background, at most max_workers at a time.
+#
+# An export is a task(progress, cancel_event) that returns a summary message
+# (None when it stopped because it was cancelled) and the paths it writes. Paths
+# are checked against the queued and running exports when an export is added, so
+# two exports never write the same file or folder. Finished exports are kept as
+# history (status, duration, outputs, message) in a JSON file; exports that were
+# still queued or running when the app closed are listed as interrupted.
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+INTERRUPTED = "interrupted"
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+STATUS_LABELS = {
+    QUEUED: "Queued",
+    RUNNING: "Running",
+    DONE: "Done",
+    FAILED: "Failed",
+    CANCELLED: "Cancelled",
+    INTERRUPTED: "Interrupted",
+}
+
+# Finished exports kept in the history file
+HISTORY_SIZE = 200
+
+
+def _normalize_path(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _paths_overlap(path, other):
+    """True when two outputs are the same path or one is a folder containing the other."""
+    return path == other or path.startswith(other + os.sep) or other.startswith(path + os.sep)
+
+
+def existing_outputs(paths):
+    """The paths that already exist on disk."""
+    return [path for path in paths if os.path.exists(path)]
+
+
+class ExportEntry:
+    """One export in the queue or its history."""
+
+    def __init__(self, entry_id, title, outputs, task=None, total=0):
+        self.id = entry_id
+        self.title = title
+        self.outputs = list(outputs)
+        self.task = task
+        self.total = total
+        self.done = 0
+        self.status = QUEUED
+        self.message = ""
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+
+    @property
+    def duration(self):
+        """Seconds spent running (so far), or None before it started."""
+        if self.started is None:
+            return None
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "outputs": self.outputs,
+            "status": self.status,
+            "message": self.message,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        entry = cls(data["id"], data.get("title", ""), data.get("outputs", []))
+        entry.status = data.get("status", DONE)
+        entry.message = data.get("message", "")
+        entry.created = data.get("created", entry.created)
+        entry.started = data.get("started")
+        entry.finished = data.get("finished")
+        if entry.status in ACTIVE_STATUSES:
+            entry.status = INTERRUPTED
+            entry.finished = entry.finished or entry.started
+        return entry
+
+
+class ExportQueue:
+    """Runs queued exports on background threads, at most max_workers at a time."""
+
+    def __init__(self, history_path=None, max_workers=2):
+        self.history_path = history_path
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        # Held while the history file is written (by the Tk thread and export threads)
+        self._save_lock = threading.Lock()
+        self._entries = []
+        self._next_id = 1
+        self._load_history()
+
+    def _load_history(self):
+        if not self.history_path or not os.path.exists(self.history_path):
+            return
+        try:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._entries = [ExportEntry.from_dict(item) for item in data.get("exports", [])]
+            self._next_id = max([entry.id for entry in self._entries], default=0) + 1
+        except Exception as e:
+            print(f"CONSOLE ERROR MSG: Error loading export queue history: {e}")
+
+    def save_history(self):
+        """Write the history file (atomically); queued and running exports are included."""
+        if not self.history_path:
+            return
+        tmp_path = f"{self.history_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._save_lock:
+            # Snapshot under the save lock so an older snapshot never replaces a newer one
+            with self._lock:
+                finished = [entry for entry in self._entries if entry.status not in ACTIVE_STATUSES]
+                active = [entry for entry in self._entries if entry.status in ACTIVE_STATUSES]
+                data = {"exports": [entry.to_dict() for entry in finished[-HISTORY_SIZE:] + active]}
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, indent=2)
+                os.replace(tmp_path, self.history_path)
+            except Exception as e:
+                print(f"CONSOLE ERROR MSG: Error saving export queue history: {e}")
+
+    def entries(self):
+        """Snapshot of all exports, oldest first."""
+        with self._lock:
+            return list(self._entries)
+
+    def active_count(self):
+        with self._lock:
+            return sum(1 for entry in self._entries if entry.status in ACTIVE_STATUSES)
+
+    def find_conflicts(self, outputs):
+        """[(path, reason)] for outputs that another queued / running export, or this one twice, writes."""
+        conflicts = []
+        normalized = [_normalize_path(path) for path in outputs]
+        for i, (path, norm) in enumerate(zip(outputs, normalized)):
+            if any(_paths_overlap(norm, other) for other in normalized[:i]):
+                conflicts.append((path, "written twice by this export"))
+        with self._lock:
+            active = [entry for entry in self._entries if entry.status in ACTIVE_STATUSES]
+        for entry in active:
+            for other in entry.outputs:
+                other_norm = _normalize_path(other)
+                for path, norm in zip(outputs, normalized):
+                    if _paths_overlap(norm, other_norm):
+                        conflicts.append((path, f"also written by \"{entry.title}\" ({STATUS_LABELS[entry.status].lower()})"))
+        return conflicts
+
+    def submit(self, title, outputs, task, total=0):
+        """Queue task(progress, cancel_event); raises ValueError when its outputs conflict."""
+        conflicts = self.find_conflicts(outputs)
+        if conflicts:
+            raise ValueError("\n".join(f"{path}: {reason}" for path, reason in conflicts))
+        with self._lock:
+            entry = ExportEntry(self._next_id, title, outputs, task, total)
+            self._next_id += 1
+            self._entries.append(entry)
+        self._dispatch()
+        self.save_history()
+        return entry
+
+    def cancel(self, entry_id):
+        """Cancel a queued export, or ask a running one to stop."""
+        with self._lock:
+            entry = next((entry for entry in self._entries if entry.id == entry_id), None)
+            if entry is None or entry.status not in ACTIVE_STATUSES:
+                return False
+            entry.cancel_event.set()
+            if entry.status == QUEUED:
+                entry.status = CANCELLED
+                entry.message = "Cancelled before it started"
+                entry.task = None
+        self.save_history()
+        return True
+
+    def clear_finished(self):
+        """Drop finished exports from the history."""
+        with self._lock:
+            self._entries = [entry for entry in self._entries if entry.status in ACTIVE_STATUSES]
+        self.save_history()
+
+    def cancel_all(self):
+        """Cancel every queued and running export (e.g. when the app closes)."""
+        for entry in self.entries():
+            self.cancel(entry.id)
+
+    def _dispatch(self):
+        """Start queued exports while fewer than max_workers are running."""
+        with self._lock:
+            running = sum(1 for entry in self._entries if entry.status == RUNNING)
+            to_start = []
+            for entry in self._entries:
+                if running >= max(1, self.max_workers):
+                    break
+                if entry.status == QUEUED:
+                    entry.status = RUNNING
+                    entry.started = time.time()
+                    running += 1
+                    to_start.append(entry)
+        for entry in to_start:
+            threading.Thread(target=self._run, args=(entry,), name=f"Export-{entry.id}", daemon=True).start()
+
+    def _run(self, entry):
+        def progress(done, total):
+            entry.done, entry.total = done, total
+
+        try:
+            message = entry.task(progress, entry.cancel_event)
+            status = CANCELLED if entry.cancel_event.is_set() else DONE
+            message = message or ("Cancelled" if status == CANCELLED else "")
+        except Exception as e:
+            print(f"CONSOLE ERROR MSG: Export \"{entry.title}\" failed: {e}")
+            status, message = FAILED, str(e)
+        with self._lock:
+            entry.status, entry.message = status, message
+            entry.finished = time.time()
+            entry.task = None
+        self.save_history()
+        self._dispatch()
@@ -10,6 +10,7 @@ import time
 import json
 
 PALETTE_SIZE = 256
+LIVE_PREVIEW_MAX_FRAMES = 50  # Custom-mode frames kept updating while the live editor is open
 
 # Fix working directory to the script's location
 def fix_working_directory():
@@ -20,6 +21,19 @@ def fix_working_directory():
 
 # Character mapping based on the provided list
 from icon_handler import IconHandler, CHARACTER_MAPPING
+from render_worker import RenderWorker, RenderRequest, render_indexed_frame
+from palette_buffer import PaletteBuffer, PaletteHistory
+from preview_hitmap import IndexMap, PreviewHitMap
+from frame_usage import FrameUsageIndex
+from sprite_atlas import build_sprite_atlas, save_sprite_atlas, PACKER_LABELS
+from outfit_matrix import OutfitMatrixJob, layer_combinations
+from portrait_export import MyShopBase, foreground_mask, compose_portrait, compose_transparent_portrait
+from background_export import export_background_variants, background_variant_paths
+from export_queue import ExportQueue, STATUS_LABELS, ACTIVE_STATUSES, existing_outputs
+from frame_animation import build_animation_frames, save_animation, ANIMATION_FORMATS, ANIMATION_FORMAT_LABELS
+from frame_export import (FrameExportJob, run_export, run_export_async, decode_export_frame, save_export_frame,
+                          IMAGE_FORMATS, IMAGE_FORMAT_LABELS)
+import keying
 
 class CustomPreviewDialog:
     def __init__(self, parent, max_frames, start_frame=0, end_frame=None, num_frames=3, use_bmp=False, show_labels=True, initial_frame=None):
@@ -137,6 +151,70 @@ class CustomPreviewDialog:
                                                     command=self.toggle_export_button)
         self.show_export_checkbox.pack(side="left", padx=10, pady=2)
         
+        # Image format for frame exports (transparent PNG and export all frames)
+        image_format_frame = tk.LabelFrame(main_frame, text="Image Format")
+        image_format_frame.pack(fill="x", pady=(0,2), padx=5)
+        
+        initial_image_format = parent.image_export_format if isinstance(parent, PaletteTool) else "png32"
+        self.image_format_var = tk.StringVar(value=initial_image_format)
+        for image_format, label in IMAGE_FORMAT_LABELS.items():
+            tk.Radiobutton(image_format_frame, text=label, variable=self.image_format_var,
+                          value=image_format).pack(side="left", padx=10, pady=2)
+        
+        # Where "Export all frames" writes: a folder of files or a single archive
+        archive_frame = tk.LabelFrame(main_frame, text="All Frames Output")
+        archive_frame.pack(fill="x", pady=(0,2), padx=5)
+        
+        self.archive_format_var = tk.StringVar(
+            value=parent.frames_archive_format if isinstance(parent, PaletteTool) else "none")
+        for archive_format, label in (("none", "Folder"), ("zip", "ZIP"), ("tar", "TAR")):
+            tk.Radiobutton(archive_frame, text=label, variable=self.archive_format_var,
+                          value=archive_format).pack(side="left", padx=10, pady=2)
+        tk.Label(archive_frame, text="Compression:").pack(side="left", padx=(10, 2))
+        self.compression_var = tk.IntVar(
+            value=parent.archive_compression_level if isinstance(parent, PaletteTool) else 6)
+        tk.Spinbox(archive_frame, from_=0, to=9, width=3, textvariable=self.compression_var,
+                   state="readonly").pack(side="left", pady=2)
+        
+        # How "Export sprite sheet" packs frames
+        sprite_sheet_frame = tk.LabelFrame(main_frame, text="Sprite Sheet Packer")
+        sprite_sheet_frame.pack(fill="x", pady=(0,2), padx=5)
+        
+        self.sprite_packer_var = tk.StringVar(
+            value=parent.sprite_sheet_packer if isinstance(parent, PaletteTool) else "maxrects")
+        for packer, label in PACKER_LABELS.items():
+            tk.Radiobutton(sprite_sheet_frame, text=label, variable=self.sprite_packer_var,
+                          value=packer).pack(side="left", padx=10, pady=2)
+        
+        # "Export animation" format and frame delay
+        animation_frame = tk.LabelFrame(main_frame, text="Animation")
+        animation_frame.pack(fill="x", pady=(0,2), padx=5)
+        
+        self.animation_format_var = tk.StringVar(
+            value=parent.animation_format if isinstance(parent, PaletteTool) else "gif")
+        for animation_format, label in ANIMATION_FORMAT_LABELS.items():
+            tk.Radiobutton(animation_frame, text=label, variable=self.animation_format_var,
+                          value=animation_format).pack(side="left", padx=10, pady=2)
+        tk.Label(animation_frame, text="Delay (ms):").pack(side="left", padx=(10, 2))
+        self.animation_delay_var = tk.IntVar(
+            value=parent.animation_frame_delay if isinstance(parent, PaletteTool) else 100)
+        tk.Spinbox(animation_frame, from_=10, to=5000, increment=10, width=5,
+                   textvariable=self.animation_delay_var).pack(side="left", pady=2)
+        
+        # Background export queue
+        export_queue_frame = tk.LabelFrame(main_frame, text="Export Queue")
+        export_queue_frame.pack(fill="x", pady=(0,2), padx=5)
+        
+        self.use_export_queue_var = tk.BooleanVar(
+            value=parent.use_export_queue if isinstance(parent, PaletteTool) else False)
+        tk.Checkbutton(export_queue_frame, text="Queue exports in the background",
+                       variable=self.use_export_queue_var).pack(side="left", padx=5, pady=2)
+        tk.Label(export_queue_frame, text="Parallel exports:").pack(side="left", padx=(10, 2))
+        self.export_queue_workers_var = tk.IntVar(
+            value=parent.export_queue_workers if isinstance(parent, PaletteTool) else 2)
+        tk.Spinbox(export_queue_frame, from_=1, to=8, width=3,
+                   textvariable=self.export_queue_workers_var).pack(side="left", pady=2)
+        
         # Initialize variables
         self.format_var = tk.BooleanVar(value=self.use_bmp)
         self.portrait_var = tk.BooleanVar(value=self.use_portrait)
@@ -191,6 +269,20 @@ class CustomPreviewDialog:
                 self.parent.cute_bg_option = self.cute_bg_var.get()
                 self.parent.show_frame_labels = self.labels_var.get()
                 self.parent.palette_format = self.palette_format_var.get()
+                self.parent.image_export_format = self.image_format_var.get()
+                self.parent.frames_archive_format = self.archive_format_var.get()
+                self.parent.archive_compression_level = self.compression_var.get()
+                self.parent.sprite_sheet_packer = self.sprite_packer_var.get()
+                self.parent.animation_format = self.animation_format_var.get()
+                try:
+                    self.parent.animation_frame_delay = self.animation_delay_var.get()
+                except tk.TclError:
+                    pass  # Delay box is empty or mid-edit
+                self.parent.use_export_queue = self.use_export_queue_var.get()
+                try:
+                    self.parent.export_queue_workers = max(1, self.export_queue_workers_var.get())
+                except tk.TclError:
+                    pass  # Workers box is empty or mid-edit
                 self.parent.use_frame_choice = self.user_choice_var.get()
                 new_mode = self.live_pal_ui_var.get()
                 self.parent.live_pal_ui_mode = new_mode
@@ -305,6 +397,14 @@ class CustomPreviewDialog:
         self.labels_var.trace_add("write", update_parent_settings)
         self.cute_bg_var.trace_add("write", update_parent_settings)
         self.palette_format_var.trace_add("write", update_parent_settings)
+        self.image_format_var.trace_add("write", update_parent_settings)
+        self.archive_format_var.trace_add("write", update_parent_settings)
+        self.compression_var.trace_add("write", update_parent_settings)
+        self.sprite_packer_var.trace_add("write", update_parent_settings)
+        self.animation_format_var.trace_add("write", update_parent_settings)
+        self.animation_delay_var.trace_add("write", update_parent_settings)
+        self.use_export_queue_var.trace_add("write", update_parent_settings)
+        self.export_queue_workers_var.trace_add("write", update_parent_settings)
         self.user_choice_var.trace_add("write", update_parent_settings)
         
         # Show Dev Buttons checkbox
@@ -454,15 +554,25 @@ class CustomPreviewDialog:
                 self.parent.export_palette_button.pack_forget()
     
     def toggle_dev_buttons(self):
-        """Toggle visibility of dev buttons (Export All Frames, Debug Info) in parent PaletteTool"""
+        """Toggle visibility of dev buttons (frame exports, Debug Info) in parent PaletteTool"""
         if isinstance(self.parent, PaletteTool):
             if self.show_dev_buttons_var.get():
-                # Show Export All Frames button (insert before Export Palette or Live Edit button)
+                # Show the frame export buttons (insert before Export Palette or Live Edit button)
                 self.parent.export_all_frames_button.pack(side="left", padx=(0, 5), before=self.parent.live_edit_button)
+                self.parent.export_sprite_sheet_button.pack(side="left", padx=(0, 5), before=self.parent.live_edit_button)
+                self.parent.export_animation_button.pack(side="left", padx=(0, 5), before=self.parent.live_edit_button)
+                self.parent.outfit_matrix_button.pack(side="left", padx=(0, 5), before=self.parent.live_edit_button)
+                self.parent.background_batch_button.pack(side="left", padx=(0, 5), before=self.parent.live_edit_button)
+                self.parent.export_queue_button.pack(side="left", padx=(0, 5), before=self.parent.live_edit_button)
                 # Show Debug Info button (insert before Statistics button)
                 self.parent.debug_info_button.pack(side="left", padx=(0, 5), before=self.parent.statistics_button)
             else:
                 self.parent.export_all_frames_button.pack_forget()
+                self.parent.export_sprite_sheet_button.pack_forget()
+                self.parent.export_animation_button.pack_forget()
+                self.parent.outfit_matrix_button.pack_forget()
+                self.parent.background_batch_button.pack_forget()
+                self.parent.export_queue_button.pack_forget()
                 self.parent.debug_info_button.pack_forget()
     
     def toggle_frame_choice(self):
@@ -577,6 +687,20 @@ class CustomPreviewDialog:
                 self.parent.use_portrait_export = self.portrait_var.get()
                 self.parent.cute_bg_option = self.cute_bg_var.get()  # This is handled separately from the result tuple
                 self.parent.palette_format = self.palette_format_var.get()  # Update palette format
+                self.parent.image_export_format = self.image_format_var.get()
+                self.parent.frames_archive_format = self.archive_format_var.get()
+                self.parent.archive_compression_level = self.compression_var.get()
+                self.parent.sprite_sheet_packer = self.sprite_packer_var.get()
+                self.parent.animation_format = self.animation_format_var.get()
+                try:
+                    self.parent.animation_frame_delay = self.animation_delay_var.get()
+                except tk.TclError:
+                    pass
+                self.parent.use_export_queue = self.use_export_queue_var.get()
+                try:
+                    self.parent.export_queue_workers = max(1, self.export_queue_workers_var.get())
+                except tk.TclError:
+                    pass
                 self.parent.show_frame_labels = self.labels_var.get()
                 self.parent.use_frame_choice = self.user_choice_var.get()
                 self.parent.live_pal_ui_mode = self.live_pal_ui_var.get()  # Update live pal editor UI mode
@@ -675,10 +799,19 @@ class CustomPreviewDialog:
 class PaletteLayer:
     def __init__(self, name, colors, palette_type, active=True):
         self.name = name
-        self.colors = colors  # List of (r,g,b)
+        self.colors = colors  # PaletteBuffer of 256 (r,g,b)
         self.palette_type = palette_type  # 'hair', 'gloves', 'fashion', etc.
         self.active = active
 
+    @property
+    def colors(self):
+        return self._colors
+
+    @colors.setter
+    def colors(self, colors):
+        # Always store a compact copy-on-write buffer, whatever was assigned
+        self._colors = colors if isinstance(colors, PaletteBuffer) else PaletteBuffer.from_colors(colors)
+
 class Statistics:
     """Class to track and manage program statistics"""
     def __init__(self):
@@ -1248,6 +1381,16 @@ class PaletteTool:
                 self.use_portrait_export = global_settings.get('use_portrait_export', True)
                 self.cute_bg_option = global_settings.get('cute_bg_option', "both")
                 self.palette_format = global_settings.get('palette_format', "png")
+                self.image_export_format = global_settings.get('image_export_format', "png32")
+                self.frames_archive_format = global_settings.get('frames_archive_format', "none")
+                self.archive_compression_level = global_settings.get('archive_compression_level', 6)
+                self.sprite_sheet_packer = global_settings.get('sprite_sheet_packer', "maxrects")
+                self.animation_format = global_settings.get('animation_format', "gif")
+                self.animation_frame_delay = global_settings.get('animation_frame_delay', 100)
+                self.background_batch_colors = [tuple(color) for color in
+                                                global_settings.get('background_batch_colors', [])]
+                self.use_export_queue = global_settings.get('use_export_queue', False)
+                self.export_queue_workers = global_settings.get('export_queue_workers', 2)
                 self.show_frame_labels = global_settings.get('show_frame_labels', True)
                 self.use_right_click = global_settings.get('use_right_click', True)
                 self.live_pal_ui_mode = global_settings.get('live_pal_ui_mode', "Simple")
@@ -1302,6 +1445,15 @@ class PaletteTool:
                 'use_portrait_export': self.use_portrait_export,
                 'cute_bg_option': self.cute_bg_option,
                 'palette_format': self.palette_format,
+                'image_export_format': getattr(self, 'image_export_format', "png32"),
+                'frames_archive_format': getattr(self, 'frames_archive_format', "none"),
+                'archive_compression_level': getattr(self, 'archive_compression_level', 6),
+                'sprite_sheet_packer': getattr(self, 'sprite_sheet_packer', "maxrects"),
+                'animation_format': getattr(self, 'animation_format', "gif"),
+                'animation_frame_delay': getattr(self, 'animation_frame_delay', 100),
+                'background_batch_colors': [list(color) for color in getattr(self, 'background_batch_colors', [])],
+                'use_export_queue': getattr(self, 'use_export_queue', False),
+                'export_queue_workers': getattr(self, 'export_queue_workers', 2),
                 'show_frame_labels': self.show_frame_labels,
                 'use_right_click': self.use_right_click,
                 'live_pal_ui_mode': self.live_pal_ui_mode,
@@ -1479,6 +1631,16 @@ class PaletteTool:
         self.use_portrait_export = True  # Portrait mode (100x100)
         self.cute_bg_option = "both"  # Options: "no_cute_bg", "cute_bg", "both"
         self.palette_format = "png"  # Options: "pal", "png"
+        self.image_export_format = "png32"  # Options: "png32", "png8", "bmp8"
+        self.frames_archive_format = "none"  # "Export all frames" output: "none" (folder), "zip", "tar"
+        self.archive_compression_level = 6  # 0 (store) - 9
+        self.sprite_sheet_packer = "maxrects"  # Options: "maxrects", "shelf"
+        self.animation_format = "gif"  # Options: "gif", "apng", "webp"
+        self.animation_frame_delay = 100  # Milliseconds per animation frame
+        self.background_batch_colors = []  # Background colors for "Export Backgrounds"
+        self.use_export_queue = False  # Run exports in the background export queue instead of modal progress windows
+        self.export_queue_workers = 2  # Exports the queue runs at the same time
+        self.export_queue = None  # Created on first use (see _get_export_queue)
         self.show_frame_labels = True  # Whether to show frame numbers
         self.use_right_click = True  # True = Right click save (default), False = Left click save
         self.use_frame_choice = False  # Whether to use user-chosen frame for export
@@ -1512,6 +1674,8 @@ class PaletteTool:
             self.myshop_base = Image.open(myshop_base_path)
         except Exception as e:
             self.myshop_base = None
+        # Recolored copies of the MyShop base, one per background color
+        self.myshop_base_cache = MyShopBase(self.myshop_base) if self.myshop_base is not None else None
         
         # Available data
         self.available_characters = []
@@ -1621,6 +1785,12 @@ class PaletteTool:
         # Set up window close handler to save settings and statistics
         def on_app_close():
             """Save settings and statistics before closing"""
+            export_queue = getattr(self, 'export_queue', None)
+            if export_queue is not None and export_queue.active_count():
+                if not messagebox.askyesno("Export Queue", f"{export_queue.active_count()} exports are still "
+                                                           "queued or running. Quit anyway?"):
+                    return
+                export_queue.cancel_all()
             self._save_settings()
             self._save_statistics()
             self.master.destroy()
@@ -1661,10 +1831,18 @@ class PaletteTool:
     
     def _debounced_display_update(self):
         """Debounce main display updates to prevent flickering during live palette editing"""
-        # Skip main display updates if live palette editor is open
+        # While the live palette editor is open, only custom mode keeps updating, and only
+        # the frames that use an edited index are re-rendered
         if (hasattr(self, '_live_editor_window') and 
             self._live_editor_window and 
             self._live_editor_window.winfo_exists()):
+            if self.preview_var.get() == "custom":
+                try:
+                    if getattr(self, "_live_custom_after_id", None):
+                        self.master.after_cancel(self._live_custom_after_id)
+                    self._live_custom_after_id = self.master.after(16, self._live_refresh_custom_frames)
+                except Exception:
+                    pass
             return
         
         # Skip main display updates if icon palette editor is open
@@ -1696,30 +1874,6 @@ class PaletteTool:
         except Exception:
             _update_display()
     
-    def _is_keyed_color(self, rgb_color, palette_index=None):
-        """Check if an RGB color is a keyed/transparency color that should be avoided"""
-        r, g, b = rgb_color
-        
-        # Universal keying colors
-        if self.is_universal_keying_color(rgb_color):
-            return True
-        
-        # Magenta (chroma key)
-        if rgb_color == (255, 0, 255):
-            return True
-        
-        # Black is generally allowed ("Never make black transparent")
-        # Exception: chr004 specifically treats black as keyed
-        if rgb_color == (0, 0, 0):
-            if hasattr(self, 'current_character') and self.current_character:
-                char_num = self.current_character[3:]  # Extract number from chr###
-                if char_num == "004":
-                    return True  # Black is keyed for chr004
-            # Black is allowed for all other characters
-            return False
-        
-        return False
-    
     def _find_nearest_non_keyed_color(self, target_rgb, adjustment_direction='both'):
         """Find the nearest non-keyed color by adjusting RGB values"""
         r, g, b = target_rgb
@@ -2293,6 +2447,8 @@ class PaletteTool:
         # Configure scrollbar
         self.v_scroll.config(command=self.canvas.yview)
         self.canvas.bind("<Configure>", self.on_canvas_configure)
+        # Clicking a frame selects/picks its palette index while the live editor is open
+        self.canvas.bind("<Button-1>", self.on_canvas_click)
         
         # Add mouse wheel support
         def _on_mousewheel(event):
@@ -2429,12 +2585,24 @@ class PaletteTool:
         self.update_export_button_text()
         self.export_all_frames_button = tk.Button(button_frame, text="Export All Frames", command=self.export_all_frames)
         self.export_all_frames_button.pack_forget()  # Hidden by default
+        self.export_sprite_sheet_button = tk.Button(button_frame, text="Export Sprite Sheet", command=self.export_sprite_sheet)
+        self.export_sprite_sheet_button.pack_forget()  # Hidden by default
+        self.export_animation_button = tk.Button(button_frame, text="Export Animation", command=self.export_animation)
+        self.export_animation_button.pack_forget()  # Hidden by default
+        self.outfit_matrix_button = tk.Button(button_frame, text="Outfit Matrix", command=self._open_outfit_matrix_dialog)
+        self.outfit_matrix_button.pack_forget()  # Hidden by default
+        self.background_batch_button = tk.Button(button_frame, text="Export Backgrounds", command=self._open_background_batch_dialog)
+        self.background_batch_button.pack_forget()  # Hidden by default
+        self.export_queue_button = tk.Button(button_frame, text="Export Queue", command=self._open_export_queue_panel)
+        self.export_queue_button.pack_forget()  # Hidden by default
         self.export_palette_button = tk.Button(button_frame, text="Export Palette", command=self.export_pal)
         self.export_palette_button.pack_forget()  # Hidden by default
         self.live_edit_button = tk.Button(button_frame, text="Live Edit Palette", command=self.open_live_palette_editor)
         self.live_edit_button.pack(side="left", padx=(0, 5))
         self.icon_editor_button = tk.Button(button_frame, text="Icon Editor", command=self._open_icon_editor)
         self.icon_editor_button.pack(side="left", padx=(0, 5))
+        self.batch_icons_button = tk.Button(button_frame, text="Batch Icons", command=self._open_batch_icon_dialog)
+        self.batch_icons_button.pack(side="left", padx=(0, 5))
         tk.Button(button_frame, text="Reset to Original", command=self.reset_to_original).pack(side="left", padx=(0, 5))
         self.debug_info_button = tk.Button(button_frame, text="Debug Info", command=self.debug_info)
         self.debug_info_button.pack_forget()  # Hidden by default
@@ -2504,6 +2672,9 @@ class PaletteTool:
             # Load per-character settings for this character
             self._load_character_settings(char_id)
             
+            # Index which palette indices each frame uses (only new/changed frames are scanned)
+            self._get_frame_usage_index().build_async(self.character_images.get(char_id, []))
+            
             # Track character view
             self.statistics.add_character_view(char_id, char_info["job"])
             self._save_statistics()
@@ -2803,6 +2974,9 @@ class PaletteTool:
             # Load per-character settings for this character
             self._load_character_settings(char_id)
             
+            # Index which palette indices each frame uses (only new/changed frames are scanned)
+            self._get_frame_usage_index().build_async(self.character_images.get(char_id, []))
+            
             # Clear current image display first
             self.canvas.delete("all")
             self.original_image = None
@@ -3431,12 +3605,7 @@ class PaletteTool:
             if len(data) != PALETTE_SIZE * 3:
                 raise ValueError(f"Palette file size incorrect: {len(data)} bytes")
             
-            colors = []
-            for i in range(PALETTE_SIZE):
-                r = data[i*3]
-                g = data[i*3+1]
-                b = data[i*3+2]
-                colors.append((r, g, b))
+            colors = PaletteBuffer(data)
             
             filename = os.path.basename(file_path)
             palette_type = self.categorize_palette(filename)
@@ -3797,6 +3966,26 @@ class PaletteTool:
                     # Enable zoom for all frame counts
                     self.zoom_combo.config(state="readonly")
 
+    def on_canvas_click(self, event):
+        """Resolve a click on any preview frame to its palette index for the live editor"""
+        if not (hasattr(self, '_live_editor_window') and self._live_editor_window and
+                self._live_editor_window.winfo_exists()):
+            return
+        hitmap = getattr(self, '_canvas_hitmap', None)
+        if hitmap is None:
+            return
+        try:
+            # Event coordinates are relative to the viewport; the hit map uses canvas space
+            hit = hitmap.lookup(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y))
+            if hit is None or hit.index is None:
+                return
+            if getattr(self, 'colorpicker_active', False):
+                self._live_colorpick_index(hit.index)
+            else:
+                self._live_select_index_from_preview(hit.index)
+        except Exception as e:
+            print(f"CONSOLE ERROR MSG: Error handling preview click: {e}")
+
     def on_canvas_configure(self, event):
         # Configure scroll region for single frame mode and custom preview mode (up to 50 frames)
         preview_mode = self.preview_var.get()
@@ -4001,6 +4190,11 @@ class PaletteTool:
         
         self.img_id = self.canvas.create_image(img_x, img_y, anchor=anchor, image=self.tk_image)
         
+        # Record the screen-to-source transform for click lookups
+        self._canvas_hitmap = PreviewHitMap()
+        self._canvas_hitmap.add(self.current_image_index, IndexMap.from_image(self.original_image),
+                                img_x, img_y, display_w, display_h, anchor=anchor)
+        
         # Add frame number text below the image
         if self.show_frame_labels:
             frame_number = self.current_image_index + 1
@@ -4070,6 +4264,8 @@ class PaletteTool:
         
         # Process all images and calculate total height needed
         processed_images = []
+        processed_index_maps = []  # (frame index, IndexMap) parallel to processed_images
+        frame_indices_shown = range(len(images))
         max_width = 0
         max_height = 0
         
@@ -4112,93 +4308,10 @@ class PaletteTool:
                     
                     original_img = img_palette
                 
-                # Apply current palette layers using the same logic as single frame
-                # Temporarily set the original_palette for this image
-                original_original_palette = self.original_palette
-                self.original_palette = original_palette
-                
-                # Get the merged palette using the same method as single frame
-                result_palette = self.get_merged_palette()
-                
-                # Restore the original palette
-                self.original_palette = original_original_palette
-                
-                # Create display image
+                # Apply current palette layers and character keying as one palette substitution
                 w, h = original_img.size
-                display_img = Image.new("P", (w, h))
-                display_img.putpalette([color for palette_color in result_palette for color in palette_color])
-                display_img.putdata(original_img.getdata())
-                
-                # Convert to RGBA and apply transparency
-                rgba_img = display_img.convert("RGBA")
-                pixels = rgba_img.load()
-                
-                # Apply character-specific transparency based on original palette colors
-                char_num = self.current_character[3:]
-                
-                # Debug: Count transparent pixels for this frame
-                transparent_count = 0
-                total_pixels = w * h
-                
-                # Debug: Track unique colors in this frame
-                unique_colors = set()
-                
-                # Get original image pixel data to check original palette indices
-                original_pixel_data = list(original_img.getdata())
-                
-                for y in range(h):
-                    for x in range(w):
-                        r, g, b, a = pixels[x, y]
-                        color = (r, g, b)
-                        unique_colors.add(color)
-                        
-                        should_make_transparent = False
-                        
-                        # Get the original palette index for this pixel
-                        pixel_index = y * w + x
-                        if pixel_index < len(original_pixel_data):
-                            palette_index = original_pixel_data[pixel_index]
-                            if palette_index < len(original_palette):
-                                original_color = original_palette[palette_index]
-                                
-                                # Check if the original color was a keying color
-                                # Never make black transparent
-                                if original_color != (0, 0, 0):
-                                    # Use character-specific keying logic
-                                    if char_num == "014":
-                                        # chr014 uses more selective keying
-                                        if self.is_chr014_keying_color(original_color):
-                                            should_make_transparent = True
-                                    else:
-                                        # Universal keying colors for other characters
-                                        if self.is_universal_keying_color(original_color) or original_color == (255, 0, 255):  # Magenta
-                                            should_make_transparent = True
-                        
-                        if should_make_transparent:
-                            pixels[x, y] = (0, 0, 0, 0)
-                            transparent_count += 1
-                    
-                    # Debug: Show transparency info for this frame
-                    transparency_percentage = (transparent_count / total_pixels) * 100
-    
-                    
-                    # Debug: Show unique colors if transparency is very low (might indicate issue)
-                    if transparency_percentage < 1.0:
-    
-                        # Check for potential transparency colors that weren't detected
-                        potential_transparency_colors = []
-                        for color in unique_colors:
-                            r, g, b = color
-                            if g > 250 and r < 10 and b < 10:  # Very green colors
-                                potential_transparency_colors.append(color)
-                            elif r > 250 and g < 10 and b > 250:  # Very magenta colors
-                                potential_transparency_colors.append(color)
-                        if potential_transparency_colors:
-                            # print(f"Debug: Potential transparency colors found: {potential_transparency_colors}")
-                            pass
-                
-                # Convert to RGB (transparent pixels become background color)
-                rgb_img = self.convert_rgba_to_rgb_with_green_transparency(rgba_img, self.background_color)
+                display_palette = self._get_frame_display_palette(original_palette)
+                rgb_img = render_indexed_frame(original_img, [c for rgb in display_palette for c in rgb])
                 
                 # Store original dimensions for this image
                 original_w, original_h = w, h
@@ -4227,6 +4340,7 @@ class PaletteTool:
                         rgb_img = rgb_img.resize((new_width, new_height), Image.Resampling.NEAREST)
                 
                 processed_images.append((rgb_img, new_width, new_height))
+                processed_index_maps.append((frame_indices_shown[i], self._get_frame_index_map(image_path, original_img)))
                 max_width = max(max_width, new_width)
                 max_height = max(max_height, new_height)
                 
@@ -4317,6 +4431,7 @@ class PaletteTool:
             rows = positioned_items
         
         # Create PhotoImage objects and place them
+        self._canvas_hitmap = PreviewHitMap()
         for item in rows:
             if zoom_level == "Fit":
                 img_index, x_pos, y_pos, img_width, img_height = item
@@ -4329,6 +4444,8 @@ class PaletteTool:
             photo_img = ImageTk.PhotoImage(rgb_img)
             # Create the image
             self.canvas.create_image(x_pos, y_pos, anchor="nw", image=photo_img)
+            frame_key, index_map = processed_index_maps[img_index]
+            self._canvas_hitmap.add(frame_key, index_map, x_pos, y_pos, img_width, img_height)
             
             # Add frame number text below the image
             frame_number = img_index + 1  # Add 1 since frame numbers are 0-based internally
@@ -4443,6 +4560,9 @@ class PaletteTool:
         
         # Process custom images and calculate total height needed
         processed_images = []
+        processed_index_maps = []  # (frame index, IndexMap) parallel to processed_images
+        processed_sources = []  # Render inputs kept for live re-rendering, parallel to processed_images
+        frame_indices_shown = self.custom_frames
         max_width = 0
         max_height = 0
         
@@ -4486,93 +4606,10 @@ class PaletteTool:
                     
                     original_img = img_palette
                 
-                # Apply current palette layers using the same logic as single frame
-                # Temporarily set the original_palette for this image
-                original_original_palette = self.original_palette
-                self.original_palette = original_palette
-                
-                # Get the merged palette using the same method as single frame
-                result_palette = self.get_merged_palette()
-                
-                # Restore the original palette
-                self.original_palette = original_original_palette
-                
-                # Create display image
+                # Apply current palette layers and character keying as one palette substitution
                 w, h = original_img.size
-                display_img = Image.new("P", (w, h))
-                display_img.putpalette([color for palette_color in result_palette for color in palette_color])
-                display_img.putdata(original_img.getdata())
-                
-                # Convert to RGBA and apply transparency
-                rgba_img = display_img.convert("RGBA")
-                pixels = rgba_img.load()
-                
-                # Apply character-specific transparency based on original palette colors
-                char_num = self.current_character[3:]
-                
-                # Debug: Count transparent pixels for this frame
-                transparent_count = 0
-                total_pixels = w * h
-                
-                # Debug: Track unique colors in this frame
-                unique_colors = set()
-                
-                # Get original image pixel data to check original palette indices
-                original_pixel_data = list(original_img.getdata())
-                
-                for y in range(h):
-                    for x in range(w):
-                        r, g, b, a = pixels[x, y]
-                        color = (r, g, b)
-                        unique_colors.add(color)
-                        
-                        should_make_transparent = False
-                        
-                        # Get the original palette index for this pixel
-                        pixel_index = y * w + x
-                        if pixel_index < len(original_pixel_data):
-                            palette_index = original_pixel_data[pixel_index]
-                            if palette_index < len(original_palette):
-                                original_color = original_palette[palette_index]
-                                
-                                # Check if the original color was a keying color
-                                # Never make black transparent
-                                if original_color != (0, 0, 0):
-                                    # Use character-specific keying logic
-                                    if char_num == "014":
-                                        # chr014 uses more selective keying
-                                        if self.is_chr014_keying_color(original_color):
-                                            should_make_transparent = True
-                                    else:
-                                        # Universal keying colors for other characters
-                                        if self.is_universal_keying_color(original_color) or original_color == (255, 0, 255):  # Magenta
-                                            should_make_transparent = True
-                        
-                        if should_make_transparent:
-                            pixels[x, y] = (0, 0, 0, 0)
-                            transparent_count += 1
-                    
-                    # Debug: Show transparency info for this frame
-                    transparency_percentage = (transparent_count / total_pixels) * 100
-    
-                    
-                    # Debug: Show unique colors if transparency is very low (might indicate issue)
-                    if transparency_percentage < 1.0:
-    
-                        # Check for potential transparency colors that weren't detected
-                        potential_transparency_colors = []
-                        for color in unique_colors:
-                            r, g, b = color
-                            if g > 250 and r < 10 and b < 10:  # Very green colors
-                                potential_transparency_colors.append(color)
-                            elif r > 250 and g < 10 and b > 250:  # Very magenta colors
-                                potential_transparency_colors.append(color)
-                        if potential_transparency_colors:
-                            # print(f"Debug: Potential transparency colors found: {potential_transparency_colors}")
-                            pass
-                
-                # Convert to RGB (transparent pixels become background color)
-                rgb_img = self.convert_rgba_to_rgb_with_green_transparency(rgba_img, self.background_color)
+                display_palette = self._get_frame_display_palette(original_palette)
+                rgb_img = render_indexed_frame(original_img, [c for rgb in display_palette for c in rgb])
                 
                 # Store original dimensions for this image
                 original_w, original_h = w, h
@@ -4590,17 +4627,29 @@ class PaletteTool:
                     
                     new_width = int(w * scale)
                     new_height = int(h * scale)
+                    resample = Image.Resampling.LANCZOS
                     if scale != 1.0:
-                        rgb_img = rgb_img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+                        rgb_img = rgb_img.resize((new_width, new_height), resample)
                 else:
                     # Apply zoom scaling based on original image size
                     new_width = int(w * zoom_scale)
                     new_height = int(h * zoom_scale)
+                    resample = Image.Resampling.NEAREST
                     
                     if zoom_scale != 1.0:
-                        rgb_img = rgb_img.resize((new_width, new_height), Image.Resampling.NEAREST)
+                        rgb_img = rgb_img.resize((new_width, new_height), resample)
                 
                 processed_images.append((rgb_img, new_width, new_height))
+                processed_index_maps.append((frame_indices_shown[i], self._get_frame_index_map(image_path, original_img)))
+                processed_sources.append({
+                    'path': image_path,
+                    'source': original_img,
+                    'original_palette': tuple(original_palette),
+                    'display_palette': tuple(display_palette),
+                    'size': (new_width, new_height),
+                    'resample': resample,
+                    'usage_mask': self._get_frame_usage_index().get_mask(image_path, original_img),
+                })
                 max_width = max(max_width, new_width)
                 max_height = max(max_height, new_height)
                 
@@ -4698,6 +4747,8 @@ class PaletteTool:
             rows = positioned_items
         
         # Create PhotoImage objects and place them
+        self._canvas_hitmap = PreviewHitMap()
+        live_frames = []
         for item in rows:
             if zoom_level == "Fit":
                 img_index, x_pos, y_pos, img_width, img_height = item
@@ -4709,7 +4760,13 @@ class PaletteTool:
             # Create PhotoImage and store reference
             photo_img = ImageTk.PhotoImage(rgb_img)
             # Create the image
-            self.canvas.create_image(x_pos, y_pos, anchor="nw", image=photo_img)
+            item_id = self.canvas.create_image(x_pos, y_pos, anchor="nw", image=photo_img)
+            frame_key, index_map = processed_index_maps[img_index]
+            live_frame = dict(processed_sources[img_index])
+            live_frame['item'] = item_id
+            live_frame['photo_slot'] = len(self.custom_frame_images)
+            live_frames.append(live_frame)
+            self._canvas_hitmap.add(frame_key, index_map, x_pos, y_pos, img_width, img_height)
             
             # Add frame number text below the image if enabled
             if self.show_frame_labels:
@@ -4722,6 +4779,10 @@ class PaletteTool:
             # Store reference to prevent garbage collection
             self.custom_frame_images.append(photo_img)
         
+        # Remember what each canvas item shows so live edits can re-render single frames
+        self._custom_live_frames = live_frames
+        self._get_frame_usage_index().save()
+        
         # Set vertical scroll region only - width matches canvas width
         self.canvas.config(scrollregion=(0, 0, canvas_width, total_height))
         
@@ -4733,6 +4794,62 @@ class PaletteTool:
         # Update navigation buttons to ensure they're properly enabled
         self.update_navigation_buttons()
 
+    def _get_frame_usage_index(self):
+        """Return the persisted per-frame palette-index usage index, loading it on first use"""
+        if not hasattr(self, '_frame_usage_index') or self._frame_usage_index is None:
+            cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frame_usage.json")
+            self._frame_usage_index = FrameUsageIndex(cache_path)
+        return self._frame_usage_index
+
+    def _live_refresh_custom_frames(self):
+        """Re-render only the custom-mode frames that contain palette indices changed by a live edit"""
+        self._live_custom_after_id = None
+        frames = getattr(self, '_custom_live_frames', None)
+        if not frames or len(frames) > LIVE_PREVIEW_MAX_FRAMES:
+            return
+        if not hasattr(self, 'canvas') or not self.canvas.winfo_exists():
+            return
+        
+        worker = self._get_render_worker()
+        palettes = {}  # original palette -> display palette, frames of a character usually share one
+        for slot, frame in enumerate(frames):
+            display_palette = palettes.get(frame['original_palette'])
+            if display_palette is None:
+                display_palette = tuple(self._get_frame_display_palette(list(frame['original_palette'])))
+                palettes[frame['original_palette']] = display_palette
+            
+            previous = frame['display_palette']
+            if display_palette == previous:
+                continue
+            changed_mask = 0
+            for i in range(PALETTE_SIZE):
+                if display_palette[i] != previous[i]:
+                    changed_mask |= 1 << i
+            frame['display_palette'] = display_palette
+            if not changed_mask & frame['usage_mask']:
+                continue  # The edit only touched indices this frame doesn't use
+            
+            request = RenderRequest(frame['path'], display_palette, frame['size'],
+                                    frame['resample'], indexed_img=frame['source'])
+            worker.submit(("custom_frame", slot), request,
+                          lambda img, s=slot, token=frames: self._show_live_custom_frame(token, s, img))
+
+    def _show_live_custom_frame(self, token, slot, rgb_img):
+        """Swap a re-rendered frame into its existing canvas item"""
+        # Ignore renders for a layout that has since been redrawn
+        if token is not getattr(self, '_custom_live_frames', None):
+            return
+        if not hasattr(self, 'canvas') or not self.canvas.winfo_exists():
+            return
+        frame = token[slot]
+        photo_img = ImageTk.PhotoImage(rgb_img)
+        self.canvas.itemconfigure(frame['item'], image=photo_img)
+        # Store reference to prevent garbage collection
+        if frame['photo_slot'] < len(self.custom_frame_images):
+            self.custom_frame_images[frame['photo_slot']] = photo_img
+        else:
+            self.custom_frame_images.append(photo_img)
+
     def get_merged_palette(self):
         """Get the merged palette, respecting keying colors and transparency"""
         if not self.original_palette:
@@ -5220,23 +5337,29 @@ class PaletteTool:
 
     def is_universal_keying_color(self, color):
         """Check if a color is a universal keying color for ALL characters"""
-        r, g, b = color
-        
-        # Pure green (0, 255, 0) - used by ALL characters including chr010
-        if color == (0, 255, 0):
-            return True
-        
-        # (0~25, 255, 0) pattern - used by chr002, chr008, chr024, and others
-        # Analysis found: (5, 255, 0), (10, 255, 0), (14, 255, 0), (19, 255, 0), (23, 255, 0)
-        if g == 255 and b == 0 and 0 <= r <= 25:
-            return True
-        
-        # (0, 255, 0~21) pattern - used by chr003, chr011, chr019, and others
-        # Analysis found: (0, 255, 21)
-        if g == 255 and r == 0 and 0 <= b <= 21:
-            return True
+        # Pure green, (0~25, 255, 0) and (0, 255, 0~21); see keying.py
+        return keying.is_universal_keying_color(color)
+
+    def _get_frame_display_palette(self, original_palette):
+        """Merged palette for a frame with its keyed original colors replaced by the background.
+
+        Equivalent to compositing the RGBA transparency pass over the frame, but done on the
+        256 palette entries: an index is keyed when its original color is a keying color
+        (chr014 only keys pure green/magenta) and never when it is black.
+        """
+        # Temporarily set the original_palette for this image
+        original_original_palette = self.original_palette
+        self.original_palette = original_palette
+        try:
+            # Get the merged palette using the same method as single frame
+            result_palette = self.get_merged_palette()
+        finally:
+            # Restore the original palette
+            self.original_palette = original_original_palette
         
-        return False
+        mask = keying.keyed_index_mask("display", getattr(self, 'current_character', None), original_palette)
+        background = self.background_color
+        return [background if mask[j] else color for j, color in enumerate(result_palette)]
 
     def convert_rgba_to_rgb_with_green_transparency(self, rgba_img, background_color=None):
         """Convert RGBA image to RGB, making transparent pixels use the specified background color (defaults to green)"""
@@ -5264,41 +5387,29 @@ class PaletteTool:
 
     def is_palette_keying_color(self, color, index, char_num):
         """Check if a color at a specific index is a keying color for the character"""
-        # Universal keying colors for ALL characters
-        if self.is_universal_keying_color(color) or color == (255, 0, 255):  # Magenta
-            return True
-        
-        # Character-specific keying rules
-        if char_num == "004":  # chr004 specific rules
-            if color == (0, 0, 0):  # Black
-                return True
-            if index == 255:  # Last color in palette
-                return True
-        
-        return False
+        # Universal keying colors and magenta; chr004 also keys black and index 255
+        return keying.is_keyed("palette", char_num, color, index)
 
     def is_chr003_keying_color(self, color):
         """Check if a color is a keying color for chr003 (Sheep)"""
         # chr003 uses universal keying colors
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr008_keying_color(self, color):
         """Check if a color is a keying color for chr008 (Raccoon)"""
         # chr008 uses universal keying colors
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr011_keying_color(self, color):
         """Check if a color is a keying color for chr011 (Sheep 2nd Job)"""
         # chr011 uses the same keying patterns as chr003
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr014_keying_color(self, color):
         """Check if a color is a keying color for chr014 (Lion 2nd Job)"""
         # chr014 uses more selective keying to avoid over-transparency
         # Only key out pure green and magenta, not green variants
-        if color == (0, 255, 0) or color == (255, 0, 255):  # Pure green and magenta
-            return True
-        return False
+        return keying.is_selective_keying_color(color)
 
 
 
@@ -5324,44 +5435,15 @@ class PaletteTool:
         """Check if a color is the keying color for a specific hair palette"""
         if layer.palette_type != "hair":
             return False
-        
-        # For chr001 hair palettes, always ignore 00FF00 (pure green)
-        if self.current_character == "chr001" and color == (0, 255, 0):
-            return True
-        
-        # For chr014 hair palettes, be more selective to avoid over-transparency
-        if self.current_character == "chr014":
-            # Only key out pure green and magenta, not green variants
-            if color == (0, 255, 0) or color == (255, 0, 255):  # Pure green and magenta
-                return True
-            return False
-        
-        # Universal keying colors for other characters
-        if self.is_universal_keying_color(color) or color == (255, 0, 255):  # Magenta
-            return True
-    
-        return False
+        # chr014 hair palettes only key pure green and magenta to avoid over-transparency
+        return keying.is_keyed("hair", self.current_character, color)
 
     def is_fashion_palette_keying_color(self, layer, color, index):
         """Check if a color is a keying color for a fashion palette"""
         if not layer.palette_type.startswith("fashion_"):
             return False
-        
-        # For chr004 fashion palettes, ignore 00FF00 and the last color (index 255) no matter what
-        if self.current_character == "chr004":
-            if color == (0, 255, 0):  # Pure green
-                return True
-            if index == 255:  # Last color in palette - always ignore
-                return True
-            return False
-        
-        # Universal keying colors for ALL characters
-        if self.is_universal_keying_color(color) or color == (255, 0, 255):  # Magenta
-            return True
-        
-        # For other characters, use standard keying colors
-        return (self.is_green_padding(color) or 
-                self.is_magenta_transparency(color))
+        # chr004 fashion palettes key only 00FF00 and the last color (index 255)
+        return keying.is_keyed("fashion", self.current_character, color, index)
 
     def get_character_palette_ranges(self, char_num, palette_type):
         """Get the allowed index ranges for a specific character and palette type"""
@@ -5638,23 +5720,20 @@ class PaletteTool:
         except Exception:
             return None
             
-        # Load original image and get its data
+        # Load original image and get its palette indices
         with Image.open(original_img) as img:
-            pixel_data = list(img.getdata())
+            indices = img.tobytes() if img.mode == "P" else img.convert("P").tobytes()
             w, h = img.size
 
         # Create new image with background color
         bg_img = Image.new("RGB", (w, h), self.background_color)
         
         # Create a mask for non-transparent pixels (index 0 is transparent)
-        mask_img = Image.new("L", (w, h), 0)  # L mode for single channel
-        mask_data = [255 if p != 0 else 0 for p in pixel_data]
-        mask_img.putdata(mask_data)
+        mask_img = Image.frombytes("L", (w, h), indices).point([0] + [255] * 255)
         
         # Create foreground image with current palettes
-        fg_img = Image.new("P", (w, h))
+        fg_img = Image.frombytes("P", (w, h), indices)
         fg_img.putpalette([color for palette_color in self.get_merged_palette() for color in palette_color])
-        fg_img.putdata(pixel_data)
         fg_img = fg_img.convert("RGB")
         
         # Composite foreground onto background using mask
@@ -5729,47 +5808,33 @@ class PaletteTool:
                 return "Regular BMP"
             export_ops.append(save_regular)
             
+            # Settings the portrait uses are read now, it may run in the export queue
+            background_color = self.background_color
+            cute_bg_option = self.cute_bg_option
+            myshop_base = self.myshop_base_cache
+            
             # Portrait export (if selected)
             if self.use_portrait_export:
                 def save_portrait():
-                    # Create a 105x105 image
-                    x = (105 - img.width) // 2
-                    y = (105 - img.height) // 2
-                    
-                    # Create mask for non-background pixels in the frame
-                    mask = Image.new("L", img.size, 0)
-                    for i, pixel in enumerate(img.getdata()):
-                        if pixel != self.background_color:
-                            mask.putpixel((i % img.width, i // img.width), 255)
+                    # Mask of the non-background pixels in the frame
+                    mask = foreground_mask(img, background_color)
                     
                     outputs = []
                     
                     # Handle regular background color output
-                    if self.cute_bg_option in ["no_cute_bg", "both"]:
-                        # Create image with user's background color
-                        regular_img = Image.new("RGB", (105, 105), self.background_color)
-                        regular_img.paste(img, (x, y), mask)
+                    if cute_bg_option in ["no_cute_bg", "both"]:
+                        # 105x105 image with user's background color
+                        regular_img = compose_portrait(img, background_color, mask=mask)
                         regular_img.save(portrait_path.replace(".bmp", "_illu.bmp"), "BMP", quality=24)
                         outputs.append("Portrait (105x105) with Background Color")
                     
                     # Handle cute background output
-                    if self.cute_bg_option in ["cute_bg", "both"]:
-                        if self.myshop_base is None:
-                            messagebox.showerror("Error", "MyShop base image not found. Please ensure myshop_base.bmp exists in the nonremovable_assets folder.")
-                            return "Failed: MyShop base image not found"
-                        
-                        # Create a copy of the base image and convert to RGB
-                        cute_img = self.myshop_base.copy().convert("RGB")
+                    if cute_bg_option in ["cute_bg", "both"]:
+                        if myshop_base is None:
+                            return "Failed: MyShop base image not found. Please ensure myshop_base.bmp exists in the nonremovable_assets folder."
                         
-                        # Replace magenta (255, 0, 255) with user's background color
-                        data = list(cute_img.getdata())
-                        for i, pixel in enumerate(data):
-                            if pixel == (255, 0, 255):  # Magenta
-                                data[i] = self.background_color
-                        cute_img.putdata(data)
-                        
-                        # Paste the frame onto the base image
-                        cute_img.paste(img, (x, y), mask)
+                        # Paste the frame onto the base image with magenta replaced by the background color
+                        cute_img = compose_portrait(img, background_color, myshop_base, mask)
                         cute_img.save(portrait_path.replace(".bmp", "_illu_cute.bmp"), "BMP", quality=24)
                         outputs.append("Portrait (105x105) with Cute BG")
                     
@@ -5777,25 +5842,13 @@ class PaletteTool:
                 export_ops.append(save_portrait)
             
             
-            # Execute all export operations
-            exported = []
-            errors = []
-            for export_op in export_ops:
-                try:
-                    result = export_op()
-                    exported.append(result)
-                except Exception as e:
-                    errors.append(str(e))
-            
-            # Show results
-            if exported:
-                success_msg = "Exported:\n- " + "\n- ".join(exported)
-                if errors:
-                    success_msg += "\n\nErrors:\n- " + "\n- ".join(errors)
-                messagebox.showinfo("Export Complete", success_msg)
-            else:
-                error_msg = "Failed to export any files:\n- " + "\n- ".join(errors)
-                messagebox.showerror("Export Failed", error_msg)
+            # Execute all export operations (in the export queue if it's enabled)
+            outputs = [regular_path]
+            if self.use_portrait_export and cute_bg_option in ["no_cute_bg", "both"]:
+                outputs.append(portrait_path.replace(".bmp", "_illu.bmp"))
+            if self.use_portrait_export and cute_bg_option in ["cute_bg", "both"]:
+                outputs.append(portrait_path.replace(".bmp", "_illu_cute.bmp"))
+            self._run_export_ops("Background BMP", outputs, export_ops)
                 
             # Restore layer state
             for layer, was_active in zip(self.palette_layers, current_layers):
@@ -5837,11 +5890,13 @@ class PaletteTool:
         view_count = self.statistics.character_edits.get(key, {'views': 0})['views']
         base_name = f"{self.current_character}_view{view_count}"
         
-        # Get save path for regular PNG
-        default_path = os.path.join(export_dir, f"{base_name}.png")
+        # Get save path for regular PNG (or 8-bit BMP)
+        image_format = getattr(self, 'image_export_format', "png32")
+        extension = IMAGE_FORMATS.get(image_format, IMAGE_FORMATS["png32"])[0]
+        default_path = os.path.join(export_dir, f"{base_name}{extension}")
         file_path = filedialog.asksaveasfilename(
-            defaultextension=".png",
-            filetypes=[("PNG Images", "*.png")],
+            defaultextension=extension,
+            filetypes=[("BMP Images", "*.bmp")] if extension == ".bmp" else [("PNG Images", "*.png")],
             initialfile=os.path.basename(default_path),
             initialdir=os.path.dirname(default_path)
         )
@@ -5865,35 +5920,26 @@ class PaletteTool:
             # Prepare export operations
             export_ops = []
             
-            # Regular PNG export
+            # Regular PNG export (the state it needs is read now, it may run in the export queue)
+            char_id = self.current_character
+            frame_path = self.character_images[char_id][frame_index]
+            template = self._get_merged_palette_template()
+            
             def save_regular():
+                if image_format in ("png8", "bmp8"):
+                    # 8-bit output straight from the frame's indices and the merged palette
+                    original_img, original_palette = decode_export_frame(frame_path)
+                    save_export_frame(original_img, original_palette, template, char_id, file_path, image_format)
+                    return IMAGE_FORMAT_LABELS[image_format]
+                
                 # Convert to RGBA to handle transparency
                 rgba_img = img.convert("RGBA")
-                pixels = rgba_img.load()
                 
-                # Apply character-specific transparency
-                if hasattr(self, 'current_character') and self.current_character:
-                    char_num = self.current_character[3:]
-                    transparent_count = 0
-                    total_pixels = img.width * img.height
-                    
-                    for y in range(img.height):
-                        for x in range(img.width):
-                            pixel = img.getpixel((x, y))
-                            should_make_transparent = False
-                            
-                            # Check if the pixel should be transparent
-                            if pixel != (0, 0, 0):  # Never make black transparent
-                                if char_num == "014":
-                                    if self.is_chr014_keying_color(pixel):
-                                        should_make_transparent = True
-                                else:
-                                    if self.is_universal_keying_color(pixel) or pixel == (255, 0, 255):  # Magenta
-                                        should_make_transparent = True
-                            
-                            if should_make_transparent:
-                                pixels[x, y] = (0, 0, 0, 0)  # Transparent
-                                transparent_count += 1
+                # Apply character-specific transparency (black is never made transparent)
+                if char_id:
+                    keyed_alpha = keying.color_keying_alpha(img, "display", char_id)
+                    if keyed_alpha is not None:
+                        rgba_img.paste((0, 0, 0, 0), mask=keyed_alpha)
                 
                 # Save regular PNG
                 rgba_img.save(file_path, "PNG")
@@ -5901,66 +5947,35 @@ class PaletteTool:
             
             export_ops.append(save_regular)
             
+            # Settings the portrait uses are read now, it may run in the export queue
+            background_color = self.background_color
+            cute_bg_option = self.cute_bg_option
+            myshop_base = self.myshop_base_cache
+            
             # Portrait export (if selected)
             if self.use_portrait_export:
                 def save_portrait():
-                    # Create a 105x105 image
-                    x = (105 - img.width) // 2
-                    y = (105 - img.height) // 2
-                    
-                    # Create mask for non-background pixels in the frame
-                    mask = Image.new("L", img.size, 0)
-                    for i, pixel in enumerate(img.getdata()):
-                        if pixel != self.background_color:
-                            mask.putpixel((i % img.width, i // img.width), 255)
+                    # Mask of the non-background pixels in the frame
+                    mask = foreground_mask(img, background_color)
                     
                     outputs = []
                     
                     # Handle regular portrait output with transparency
-                    if self.cute_bg_option in ["no_cute_bg", "both"]:
-                        # Create transparent base image
-                        portrait_img = Image.new("RGBA", (105, 105), (0, 0, 0, 0))
-                        # Convert frame to RGBA for transparency
-                        frame_rgba = img.convert("RGBA")
-                        # Make background color transparent
-                        frame_data = list(frame_rgba.getdata())
-                        for i, pixel in enumerate(frame_data):
-                            if pixel[:3] == self.background_color:
-                                frame_data[i] = (0, 0, 0, 0)
-                        frame_rgba.putdata(frame_data)
-                        # Paste the frame onto the transparent base
-                        portrait_img.paste(frame_rgba, (x, y), mask)
+                    if cute_bg_option in ["no_cute_bg", "both"]:
+                        # Frame on a transparent 105x105 image; background pixels stay transparent
+                        portrait_img = compose_transparent_portrait(img, background_color, mask=mask)
                         # Save as PNG with _illu suffix (no "regular" suffix)
                         portrait_path = os.path.join(target_dir, f"{base_filename}_illu.png")
                         portrait_img.save(portrait_path, "PNG")
                         outputs.append("Portrait (105x105) with Transparency")
                     
                     # Handle cute background output
-                    if self.cute_bg_option in ["cute_bg", "both"]:
-                        if self.myshop_base is None:
-                            messagebox.showerror("Error", "MyShop base image not found. Please ensure myshop_base.bmp exists in the nonremovable_assets folder.")
-                            return "Failed: MyShop base image not found"
+                    if cute_bg_option in ["cute_bg", "both"]:
+                        if myshop_base is None:
+                            return "Failed: MyShop base image not found. Please ensure myshop_base.bmp exists in the nonremovable_assets folder."
                         
-                        # Create a copy of the base image and convert to RGBA
-                        cute_img = self.myshop_base.copy().convert("RGBA")
-                        
-                        # Replace magenta with transparency
-                        data = list(cute_img.getdata())
-                        for i, pixel in enumerate(data):
-                            if pixel[:3] == (255, 0, 255):  # Magenta
-                                data[i] = (0, 0, 0, 0)  # Transparent
-                        cute_img.putdata(data)
-                        
-                        # Convert frame to RGBA and make background transparent
-                        frame_rgba = img.convert("RGBA")
-                        frame_data = list(frame_rgba.getdata())
-                        for i, pixel in enumerate(frame_data):
-                            if pixel[:3] == self.background_color:
-                                frame_data[i] = (0, 0, 0, 0)
-                        frame_rgba.putdata(frame_data)
-                        
-                        # Paste the frame onto the base image
-                        cute_img.paste(frame_rgba, (x, y), mask)
+                        # Paste the frame onto the base image with magenta made transparent
+                        cute_img = compose_transparent_portrait(img, background_color, myshop_base, mask)
                         # Save as PNG with _illu_cute suffix
                         cute_path = os.path.join(target_dir, f"{base_filename}_illu_cute.png")
                         cute_img.save(cute_path, "PNG")
@@ -5970,25 +5985,13 @@ class PaletteTool:
                 
                 export_ops.append(save_portrait)
             
-            # Execute all export operations
-            exported = []
-            errors = []
-            for export_op in export_ops:
-                try:
-                    result = export_op()
-                    exported.append(result)
-                except Exception as e:
-                    errors.append(str(e))
-            
-            # Show results
-            if exported:
-                success_msg = "Exported:\n- " + "\n- ".join(exported)
-                if errors:
-                    success_msg += "\n\nErrors:\n- " + "\n- ".join(errors)
-                messagebox.showinfo("Export Complete", success_msg)
-            else:
-                error_msg = "Failed to export any files:\n- " + "\n- ".join(errors)
-                messagebox.showerror("Export Failed", error_msg)
+            # Execute all export operations (in the export queue if it's enabled)
+            outputs = [file_path]
+            if self.use_portrait_export and cute_bg_option in ["no_cute_bg", "both"]:
+                outputs.append(os.path.join(target_dir, f"{base_filename}_illu.png"))
+            if self.use_portrait_export and cute_bg_option in ["cute_bg", "both"]:
+                outputs.append(os.path.join(target_dir, f"{base_filename}_illu_cute.png"))
+            self._run_export_ops("Transparent PNG", outputs, export_ops)
                 
             # Restore layer state
             for layer, was_active in zip(self.palette_layers, current_layers):
@@ -6000,19 +6003,92 @@ class PaletteTool:
                 layer.active = was_active
             messagebox.showerror("Error", f"Export failed: {e}")
 
+    def _run_export_ops(self, title, outputs, export_ops):
+        """Run single export operations (each saves files and returns what it wrote) and report them.
+        
+        With the export queue enabled they run there as one export writing outputs.
+        """
+        def run_ops():
+            exported = []
+            errors = []
+            for export_op in export_ops:
+                try:
+                    result = export_op()
+                    exported.append(result)
+                except Exception as e:
+                    errors.append(str(e))
+            return exported, errors
+        
+        if getattr(self, 'use_export_queue', False):
+            def task(progress, cancel_event):
+                exported, errors = run_ops()
+                if not exported:
+                    raise RuntimeError("Failed to export any files: " + "; ".join(errors))
+                message = "Exported: " + ", ".join(exported)
+                if errors:
+                    message += "\nErrors: " + "; ".join(errors)
+                return message
+            self._queue_export(title, outputs, task)
+            return
+        
+        exported, errors = run_ops()
+        # Show results
+        if exported:
+            success_msg = "Exported:\n- " + "\n- ".join(exported)
+            if errors:
+                success_msg += "\n\nErrors:\n- " + "\n- ".join(errors)
+            messagebox.showinfo("Export Complete", success_msg)
+        else:
+            error_msg = "Failed to export any files:\n- " + "\n- ".join(errors)
+            messagebox.showerror("Export Failed", error_msg)
+
     def export_all_frames(self):
         """Export all frames in the current character's folder with current palettes applied"""
         if not hasattr(self, 'current_character') or not self.current_character:
             messagebox.showinfo("Notice", "Please select a character first.")
             return
             
-        # Save current state
-        current_layers = [layer.active for layer in self.palette_layers]
-        
         if not self.character_images or self.current_character not in self.character_images:
             messagebox.showinfo("Notice", "No images found for this character.")
             return
         
+        folder_name = self._get_export_name()
+        
+        # Ask user for base output directory (default to exports/images)
+        default_export_dir = os.path.join(self.root_dir, "exports", "images")
+        base_output_dir = filedialog.askdirectory(
+            title="Select base directory for export",
+            initialdir=default_export_dir
+        )
+        if not base_output_dir:
+            return
+        
+        # Create the specific folder (or name the archive after it)
+        output_dir = os.path.join(base_output_dir, folder_name)
+        archive_format = getattr(self, 'frames_archive_format', "none")
+        if archive_format not in ("zip", "tar"):
+            archive_format = None
+            try:
+                os.makedirs(output_dir, exist_ok=True)
+                print(f"Export directory created: {output_dir}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to create export directory: {e}")
+                return
+        
+        images = self.character_images[self.current_character]
+        try:
+            job = FrameExportJob(self.current_character, self._get_merged_palette_template(),
+                                 images, output_dir, getattr(self, 'image_export_format', "png32"),
+                                 archive_format=archive_format,
+                                 compression_level=getattr(self, 'archive_compression_level', 6),
+                                 manifest=self._get_export_manifest())
+        except Exception as e:
+            messagebox.showerror("Error", f"Export failed: {e}")
+            return
+        self._start_frame_export(job)
+
+    def _get_export_name(self):
+        """Name for bulk exports: character, job and the selected palettes (file-system safe)."""
         # Create a folder name based on character and current palettes
         char_name = self.character_var.get()
         job_name = self.job_var.get()
@@ -6026,23 +6102,12 @@ class PaletteTool:
         
         # Add hair palette (h# format)
         if self.hair_var.get() != "NONE":
-            hair_name = os.path.basename(self.hair_var.get())
-            hair_name = hair_name.replace('.pal', '')
-            if hair_name.startswith('chr') and '_' in hair_name:
-                hair_name = hair_name.split('_', 1)[1]  # Remove chr###_ prefix
-            palette_parts.append(f"h{hair_name}")
+            palette_parts.append(self._export_name_part("hair", self.hair_var.get()))
         
         # Add fashion palettes (f1w##, f2w##, etc.)
         for fashion_type, var in self.fashion_vars.items():
             if var.get() != "NONE":
-                fashion_name = os.path.basename(var.get())
-                fashion_name = fashion_name.replace('.pal', '')
-                if fashion_name.startswith('chr') and '_' in fashion_name:
-                    fashion_name = fashion_name.split('_', 1)[1]  # Remove chr###_ prefix
-                
-                # Extract fashion type number (fashion_1 -> f1, fashion_2 -> f2, etc.)
-                fashion_num = fashion_type.split('_')[1]
-                palette_parts.append(f"f{fashion_num}{fashion_name}")
+                palette_parts.append(self._export_name_part(fashion_type, var.get()))
         
         # Add 3rd job base fashion (just the number)
         if hasattr(self, 'third_job_var') and self.third_job_var.get() != "NONE":
@@ -6061,190 +6126,826 @@ class PaletteTool:
         folder_name = folder_name.replace(' ', '_')
         folder_name = folder_name.replace('\\', '_')  # Replace backslashes with underscores
         folder_name = folder_name.replace('/', '_')   # Replace forward slashes with underscores
+        return folder_name
+
+    def _open_outfit_matrix_dialog(self):
+        """Export every combination of the chosen hair / fashion palettes for the chosen frames"""
+        if not hasattr(self, 'current_character') or not self.current_character:
+            messagebox.showinfo("Notice", "Please select a character first.")
+            return
         
-        # Ask user for base output directory (default to exports/images)
-        default_export_dir = os.path.join(self.root_dir, "exports", "images")
-        base_output_dir = filedialog.askdirectory(
-            title="Select base directory for export",
-            initialdir=default_export_dir
-        )
-        if not base_output_dir:
+        if not self.character_images or self.current_character not in self.character_images:
+            messagebox.showinfo("Notice", "No images found for this character.")
             return
         
-        # Create the specific folder
-        output_dir = os.path.join(base_output_dir, folder_name)
-        try:
-            os.makedirs(output_dir, exist_ok=True)
-            print(f"Export directory created: {output_dir}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create export directory: {e}")
+        char_id = self.current_character
+        palette_char_id = self.get_palette_character_id(char_id)
+        
+        # Palette choices per layer, in the order load_palettes stacks them
+        layer_options = []
+        hair_paths = sorted(self.hair_palettes.get(palette_char_id, []))
+        if hair_paths:
+            layer_options.append(("hair", "Hair", self.hair_var.get(), hair_paths))
+        fashion_paths = self.fashion_palettes.get(palette_char_id, [])
+        for fashion_type, var in self.fashion_vars.items():
+            paths = sorted(path for path in fashion_paths
+                           if self.categorize_palette(os.path.basename(path)) == fashion_type)
+            if paths:
+                layer_options.append((fashion_type, self.get_fashion_type_name(char_id, fashion_type),
+                                      var.get(), paths))
+        if not layer_options:
+            messagebox.showinfo("Notice", "No hair or fashion palettes found for this character.")
             return
         
-        try:
-            images = self.character_images[self.current_character]
-            total_images = len(images)
-            
-            # Show progress dialog
-            progress_window = tk.Toplevel(self.master)
-            progress_window.title("Exporting Frames")
-            progress_window.transient(self.master)
-            progress_window.grab_set()
+        window = tk.Toplevel(self.master)
+        window.title("Outfit Matrix Export")
+        window.transient(self.master)
+        window.resizable(False, False)
+        
+        tk.Label(window, text="Select the palettes to combine for each layer (Ctrl/Shift-click for several):",
+                 justify="left").pack(padx=10, pady=(10, 5), anchor="w")
+        
+        lists_frame = tk.Frame(window)
+        lists_frame.pack(padx=10, pady=5)
+        listboxes = []
+        for column, (palette_type, label, current_path, paths) in enumerate(layer_options):
+            layer_frame = tk.LabelFrame(lists_frame, text=label)
+            layer_frame.grid(row=column // 4, column=column % 4, padx=3, pady=3, sticky="n")
+            listbox = tk.Listbox(layer_frame, selectmode="extended", exportselection=False,
+                                 height=8, width=18)
+            listbox.pack(side="left")
+            scrollbar = tk.Scrollbar(layer_frame, orient="vertical", command=listbox.yview)
+            scrollbar.pack(side="left", fill="y")
+            listbox.config(yscrollcommand=scrollbar.set)
+            values = ["NONE"] + paths
+            for value in values:
+                listbox.insert("end", os.path.basename(value))
+            # Start from the current selection
+            listbox.selection_set(values.index(current_path) if current_path in values else 0)
+            listboxes.append((palette_type, listbox, values))
+        
+        frames_frame = tk.LabelFrame(window, text="Frames")
+        frames_frame.pack(fill="x", padx=10, pady=5)
+        frames_var = tk.StringVar(value="current")
+        for value, label in (("current", "Current frame"), ("custom", "Custom range"), ("all", "All frames")):
+            tk.Radiobutton(frames_frame, text=label, variable=frames_var, value=value,
+                           command=lambda: update_count()).pack(side="left", padx=10, pady=2)
+        
+        count_label = tk.Label(window, text="")
+        count_label.pack(padx=10, pady=5, anchor="w")
+        
+        def get_images():
+            return self._get_export_frame_images(frames_var.get())
+        
+        def get_choices():
+            return [(palette_type, [(values[i], values[i]) for i in listbox.curselection()])
+                    for palette_type, listbox, values in listboxes]
+        
+        def update_count(*args):
+            combination_count = 1
+            for _, options in get_choices():
+                combination_count *= max(1, len(options))
+            frame_count = len(get_images())
+            count_label.config(text=f"{combination_count} combinations x {frame_count} frames = "
+                                    f"{combination_count * frame_count} images")
+        
+        for _, listbox, _ in listboxes:
+            listbox.bind("<<ListboxSelect>>", update_count)
+        update_count()
+        
+        def export():
+            images = get_images()
+            combinations = layer_combinations(get_choices())
+            total = len(images) * len(combinations)
+            if not total:
+                messagebox.showinfo("Notice", "Nothing to export.", parent=window)
+                return
+            if total > 5000 and not messagebox.askyesno(
+                    "Outfit Matrix Export", f"This writes {total} images. Continue?", parent=window):
+                return
             
-            progress_label = tk.Label(progress_window, text="Exporting frames...")
-            progress_label.pack(pady=10)
+            default_export_dir = os.path.join(self.root_dir, "exports", "images")
+            base_output_dir = filedialog.askdirectory(title="Select base directory for export",
+                                                      initialdir=default_export_dir, parent=window)
+            if not base_output_dir:
+                return
             
-            progress_bar = ttk.Progressbar(progress_window, length=250, mode='determinate')
-            progress_bar.pack(pady=5)
+            # Merged palette template per combination; palette files are read once
+            palette_cache = {}
+            combination_templates = []
+            try:
+                for combination in combinations:
+                    selection = [(palette_type, path) for palette_type, _, path in combination]
+                    parts = [self._export_name_part(palette_type, path)
+                             for palette_type, path in selection if path != "NONE"]
+                    combination_templates.append(("_".join(parts) or "original",
+                                                  self._get_outfit_template(selection, palette_cache)))
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to load palettes: {e}", parent=window)
+                return
             
-            # Center the progress window after content is created
-            progress_window.update_idletasks()
-            self._center_window_on_parent(progress_window, self.master)
+            char_name = self.character_var.get()
+            job_name = self.job_var.get()
+            if job_name.endswith(" Job"):
+                job_name = job_name[:-4]
+            folder_name = "".join(c for c in f"{char_name}_{job_name}_matrix"
+                                  if c.isalnum() or c in (' ', '-', '_')).rstrip().replace(' ', '_')
+            output_dir = os.path.join(base_output_dir, folder_name)
+            archive_format = getattr(self, 'frames_archive_format', "none")
+            if archive_format not in ("zip", "tar"):
+                archive_format = None
+            
+            manifest = self._get_export_manifest()
+            manifest.pop("palettes", None)
+            manifest["layers"] = {palette_type: [os.path.basename(path) for _, path in options]
+                                  for palette_type, options in get_choices()}
+            try:
+                job = OutfitMatrixJob(char_id, combination_templates, images, output_dir,
+                                      getattr(self, 'image_export_format', "png32"),
+                                      archive_format=archive_format,
+                                      compression_level=getattr(self, 'archive_compression_level', 6),
+                                      manifest=manifest)
+            except Exception as e:
+                messagebox.showerror("Error", f"Export failed: {e}", parent=window)
+                return
+            window.destroy()
+            self._start_frame_export(job)
+        
+        button_row = tk.Frame(window)
+        button_row.pack(pady=10)
+        tk.Button(button_row, text="Export", width=10, command=export).pack(side="left", padx=5)
+        tk.Button(button_row, text="Close", width=10, command=window.destroy).pack(side="left", padx=5)
+        
+        window.update_idletasks()
+        self._center_window_on_parent(window, self.master)
+
+    def _get_export_frame_images(self, frames):
+        """Frame image paths of the current character for a frames choice ("current", "custom" or "all")"""
+        images = self.character_images[self.current_character]
+        if frames == "all":
+            return list(images)
+        if frames == "custom":
+            return [images[i] for i in self._get_custom_range_indices()]
+        index = self.current_image_index if 0 <= self.current_image_index < len(images) else 0
+        return [images[index]]
+
+    def _open_background_batch_dialog(self):
+        """Export the chosen frames on several background colors in one pass"""
+        from tkinter import colorchooser
+        
+        if not hasattr(self, 'current_character') or not self.current_character:
+            messagebox.showinfo("Notice", "Please select a character first.")
+            return
+        
+        if not self.character_images or self.current_character not in self.character_images:
+            messagebox.showinfo("Notice", "No images found for this character.")
+            return
+        
+        window = tk.Toplevel(self.master)
+        window.title("Export Backgrounds")
+        window.transient(self.master)
+        window.resizable(False, False)
+        
+        colors = list(dict.fromkeys(getattr(self, 'background_batch_colors', [])))
+        if not colors:
+            colors = [tuple(self.background_color)]
+        
+        colors_frame = tk.LabelFrame(window, text="Background Colors")
+        colors_frame.pack(fill="x", padx=10, pady=(10, 5))
+        colors_listbox = tk.Listbox(colors_frame, height=6, width=24, exportselection=False)
+        colors_listbox.pack(side="left", padx=5, pady=5)
+        colors_buttons = tk.Frame(colors_frame)
+        colors_buttons.pack(side="left", padx=5, pady=5, anchor="n")
+        
+        def refresh_colors():
+            colors_listbox.delete(0, "end")
+            for color in colors:
+                hex_color = f"#{color[0]:02x}{color[1]:02x}{color[2]:02x}"
+                colors_listbox.insert("end", hex_color)
+                # Readable text on light and dark swatches
+                text_color = "black" if sum(color) > 382 else "white"
+                colors_listbox.itemconfig("end", bg=hex_color, fg=text_color,
+                                          selectbackground=hex_color, selectforeground=text_color)
+            update_count()
+        
+        def add_color(color):
+            color = tuple(color)
+            if color not in colors:
+                colors.append(color)
+                refresh_colors()
+        
+        def pick_color():
+            color = colorchooser.askcolor(title="Choose Background Color", color=self.background_color,
+                                          parent=window)
+            if color[1]:
+                hex_color = color[1]
+                add_color((int(hex_color[1:3], 16), int(hex_color[3:5], 16), int(hex_color[5:7], 16)))
+        
+        def remove_color():
+            for i in reversed(colors_listbox.curselection()):
+                del colors[i]
+            refresh_colors()
+        
+        tk.Button(colors_buttons, text="Add Color...", width=18, command=pick_color).pack(pady=2)
+        tk.Button(colors_buttons, text="Add Current Background", width=18,
+                  command=lambda: add_color(self.background_color)).pack(pady=2)
+        tk.Button(colors_buttons, text="Remove", width=18, command=remove_color).pack(pady=2)
+        
+        frames_frame = tk.LabelFrame(window, text="Frames")
+        frames_frame.pack(fill="x", padx=10, pady=5)
+        frames_var = tk.StringVar(value="current")
+        for value, label in (("current", "Current frame"), ("custom", "Custom range"), ("all", "All frames")):
+            tk.Radiobutton(frames_frame, text=label, variable=frames_var, value=value,
+                           command=lambda: update_count()).pack(side="left", padx=10, pady=2)
+        
+        portraits_var = tk.BooleanVar(value=self.use_portrait_export)
+        tk.Checkbutton(window, text="Include portraits (105x105, uses the Cute BG setting)",
+                       variable=portraits_var, command=lambda: update_count()).pack(padx=10, anchor="w")
+        
+        count_label = tk.Label(window, text="")
+        count_label.pack(padx=10, pady=5, anchor="w")
+        
+        def get_portraits():
+            return self.cute_bg_option if portraits_var.get() else None
+        
+        def update_count():
+            frame_count = len(self._get_export_frame_images(frames_var.get()))
+            per_color = 1 + {"no_cute_bg": 1, "cute_bg": 1, "both": 2}.get(get_portraits(), 0)
+            count_label.config(text=f"{len(colors)} colors x {frame_count} frames = "
+                                    f"{len(colors) * frame_count * per_color} images")
+        
+        refresh_colors()
+        
+        def export():
+            images = self._get_export_frame_images(frames_var.get())
+            if not colors or not images:
+                messagebox.showinfo("Notice", "Nothing to export.", parent=window)
+                return
+            portraits = get_portraits()
+            if portraits in ("cute_bg", "both") and self.myshop_base is None:
+                messagebox.showerror("Error", "MyShop base image not found. Please ensure myshop_base.bmp exists in the nonremovable_assets folder.", parent=window)
+                return
             
-            exported_count = 0
-            
-            for i, image_path in enumerate(images):
-                # Update progress
-                progress_bar['value'] = (i / total_images) * 100
-                progress_label.config(text=f"Exporting frame {i+1}/{total_images}")
-                progress_window.update()
-                
-                try:
-                    # Load the image
-                    img = Image.open(image_path)
-                    
-                    # Apply the same processing as the current frame
-                    if img.mode == 'P':
-                        # Already palette mode - preserve original structure
-                        original_img = img.copy()
-                        raw_palette = img.getpalette()
-                        original_palette = [
-                            (raw_palette[j*3], raw_palette[j*3+1], raw_palette[j*3+2])
-                            for j in range(PALETTE_SIZE)
-                        ]
-                    else:
-                        # For non-palette images, convert more carefully to preserve transparency
-                        if img.mode in ['RGBA', 'LA', 'PA']:
-                            # Handle alpha channel properly
-                            if img.mode == 'RGBA':
-                                # Create a new image with transparent background
-                                new_img = Image.new('RGBA', img.size, (0, 0, 0, 0))
-                                new_img.paste(img, mask=img.split()[-1])
-                                img = new_img
-                            else:
-                                # Convert to RGBA first
-                                img = img.convert('RGBA')
-                        
-                        # Convert to RGB if needed, but preserve transparency info
-                        if img.mode == 'RGBA':
-                            # Create a palette that preserves transparency
-                            background = Image.new('RGB', img.size, (0, 255, 0))  # Use green as background
-                            background.paste(img, mask=img.split()[-1])
-                            img = background
-                        elif img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        
-                        # Use a more careful quantization that preserves keying colors
-                        img_palette = img.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
-                        raw_palette = img_palette.getpalette()
-                        if raw_palette:
-                            original_palette = [
-                                (raw_palette[j*3], raw_palette[j*3+1], raw_palette[j*3+2])
-                                for j in range(min(len(raw_palette)//3, PALETTE_SIZE))
-                            ]
-                            while len(original_palette) < PALETTE_SIZE:
-                                original_palette.append((0, 255, 0))  # Fill with green instead of black
-                        else:
-                            original_palette = [(0, 255, 0)] * PALETTE_SIZE  # Use green instead of black
-                        
-                        original_img = img_palette
-                    
-                    # Apply current palette layers using the same logic as single frame
-                    # Temporarily set the original_palette for this image
-                    original_original_palette = self.original_palette
-                    self.original_palette = original_palette
-                    
-                    # Get the merged palette using the same method as single frame
-                    result_palette = self.get_merged_palette()
-                    
-                    # Restore the original palette
-                    self.original_palette = original_original_palette
-                    
-                    # Create output image
-                    w, h = original_img.size
-                    display_img = Image.new("P", (w, h))
-                    display_img.putpalette([color for palette_color in result_palette for color in palette_color])
-                    display_img.putdata(original_img.getdata())
-                    
-                    # Convert to RGBA and apply transparency
-                    rgba_img = display_img.convert("RGBA")
-                    pixels = rgba_img.load()
-                    
-                    # Apply character-specific transparency based on original palette colors
-                    char_num = self.current_character[3:]
-                    
-                    # Debug: Count transparent pixels for this frame
-                    transparent_count = 0
-                    total_pixels = w * h
-                    
-                    # Get original image pixel data to check original palette indices
-                    original_pixel_data = list(original_img.getdata())
-                    
-                    for y in range(h):
-                        for x in range(w):
-                            should_make_transparent = False
-                            
-                            # Get the original palette index for this pixel
-                            pixel_index = y * w + x
-                            if pixel_index < len(original_pixel_data):
-                                palette_index = original_pixel_data[pixel_index]
-                                if palette_index < len(original_palette):
-                                    original_color = original_palette[palette_index]
-                                    
-                                    # Check if the original color was a keying color
-                                    # Never make black transparent
-                                    if original_color != (0, 0, 0):
-                                        # Use character-specific keying logic
-                                        if char_num == "014":
-                                            # chr014 uses more selective keying
-                                            if self.is_chr014_keying_color(original_color):
-                                                should_make_transparent = True
-                                        else:
-                                            # Universal keying colors for other characters
-                                            if self.is_universal_keying_color(original_color) or original_color == (255, 0, 255):  # Magenta
-                                                should_make_transparent = True
-                            
-                            if should_make_transparent:
-                                pixels[x, y] = (0, 0, 0, 0)
-                                transparent_count += 1
-                    
-                    # Debug: Show transparency info for this frame
-                    transparency_percentage = (transparent_count / total_pixels) * 100
-    
-                    
-                    # Save the image
-                    filename = os.path.basename(image_path)
-                    name, ext = os.path.splitext(filename)
-                    output_path = os.path.join(output_dir, f"{name}.png")
-                    rgba_img.save(output_path, "PNG")
-                    
-                    exported_count += 1
-                    
-                except Exception as e:
-                    print(f"CONSOLE ERROR MSG: Error processing {image_path}: {e}")
-                    continue
+            default_export_dir = os.path.join(self.root_dir, "exports", "images")
+            base_output_dir = filedialog.askdirectory(title="Select base directory for export",
+                                                      initialdir=default_export_dir, parent=window)
+            if not base_output_dir:
+                return
+            output_dir = os.path.join(base_output_dir, f"{self._get_export_name()}_backgrounds")
+            
+            # Check the output files up front
+            existing = existing_outputs([path for _, _, paths in
+                                         background_variant_paths(images, colors, output_dir, portraits)
+                                         for path in paths])
+            if existing and not messagebox.askyesno(
+                    "Export Backgrounds", f"{len(existing)} files already exist in\n{output_dir}\n"
+                                          "and will be overwritten. Continue?", parent=window):
+                return
             
+            self.background_batch_colors = list(colors)
+            self._save_settings()
+            window.destroy()
+            
+            template = self._get_merged_palette_template()
+            worker = self._get_render_worker()
+            export_colors = list(colors)
+            myshop_base = self.myshop_base_cache
+            
+            def task(progress, cancel_event):
+                return export_background_variants(template, images, export_colors, output_dir, portraits,
+                                                  myshop_base,
+                                                  load_frame=lambda path: worker.load_frame(path, cache=False),
+                                                  progress=progress, cancel_event=cancel_event)
+            
+            def summary(result, elapsed):
+                written, failed = result
+                message = (f"Exported {written} images ({len(images)} frames on {len(export_colors)} "
+                           f"backgrounds) in {elapsed:.1f}s:\n{output_dir}")
+                if failed:
+                    print(f"CONSOLE ERROR MSG: Background export failed for {len(failed)} frames: {failed[:5]}")
+                    message += f"\n\n{len(failed)} frames failed."
+                return message
+            
+            self._run_export_task("Exporting Backgrounds", len(images), task, summary, "Finishing...",
+                                  outputs=[output_dir])
+        
+        button_row = tk.Frame(window)
+        button_row.pack(pady=10)
+        tk.Button(button_row, text="Export", width=10, command=export).pack(side="left", padx=5)
+        tk.Button(button_row, text="Close", width=10, command=window.destroy).pack(side="left", padx=5)
+        
+        window.update_idletasks()
+        self._center_window_on_parent(window, self.master)
+
+    def _get_outfit_template(self, selection, palette_cache):
+        """Merged palette template with the hair / fashion layers set to [(palette type, path or "NONE")].
+        
+        The 3rd job base stays as it is, and a layer already loaded from the same file is reused
+        so unsaved live edits are exported too.
+        """
+        current_layers = {}
+        current_paths = {"hair": self.hair_var.get()}
+        current_paths.update((fashion_type, var.get()) for fashion_type, var in self.fashion_vars.items())
+        for layer in self.palette_layers:
+            current_layers.setdefault(layer.palette_type, layer)
+        
+        layers = [layer for layer in self.palette_layers if layer.palette_type == "3rd_job_base"]
+        for palette_type, path in selection:
+            if path == "NONE":
+                continue
+            if current_paths.get(palette_type) == path and palette_type in current_layers:
+                layers.append(current_layers[palette_type])
+                continue
+            colors = palette_cache.get(path)
+            if colors is None:
+                with open(path, "rb") as f:
+                    data = f.read()
+                if len(data) != PALETTE_SIZE * 3:
+                    raise ValueError(f"Palette file size incorrect: {os.path.basename(path)}")
+                colors = palette_cache[path] = PaletteBuffer(data)
+            layers.append(PaletteLayer(os.path.basename(path), colors, palette_type, True))
+        
+        palette_layers = self.palette_layers
+        self.palette_layers = layers
+        try:
+            return self._get_merged_palette_template()
+        finally:
+            self.palette_layers = palette_layers
+
+    def _export_name_part(self, palette_type, palette_path):
+        """Short name of a palette in export names: h<hair> or f<fashion type number><fashion>"""
+        name = os.path.basename(palette_path).replace('.pal', '')
+        if name.startswith('chr') and '_' in name:
+            name = name.split('_', 1)[1]  # Remove chr###_ prefix
+        if palette_type == "hair":
+            return f"h{name}"
+        # Extract fashion type number (fashion_1 -> f1, fashion_2 -> f2, etc.)
+        return f"f{palette_type.split('_')[1]}{name}"
+
+    def _get_export_manifest(self):
+        """Describe the palettes behind an export (stored as manifest.json in export archives)."""
+        palettes = []
+        for layer in self.palette_layers:
+            if not layer.active:
+                continue
+            palettes.append({
+                "name": layer.name,
+                "type": layer.palette_type,
+                "colors": [f"#{c[0]:02x}{c[1]:02x}{c[2]:02x}" if c is not None else None
+                           for c in layer.colors],
+            })
+        return {
+            "character": self.current_character,
+            "job": self.job_var.get() if hasattr(self, 'job_var') else None,
+            "background_color": list(self.background_color),
+            "palettes": palettes,
+        }
+
+    def _get_merged_palette_template(self):
+        """Merged palette with None wherever a frame keeps its own original color.
+
+        get_merged_palette only copies or overrides original_palette entries by index, so
+        running it on a palette of None markers captures the current layers once for any frame.
+        """
+        original_palette = self.original_palette
+        self.original_palette = [None] * PALETTE_SIZE
+        try:
+            return self.get_merged_palette()
+        finally:
+            self.original_palette = original_palette
+
+    def _start_frame_export(self, job):
+        """Run a frame export job in the background with a progress window (cancel / resume)."""
+        import threading
+        
+        if getattr(self, 'use_export_queue', False):
+            # Share the CPU cores between the exports the queue runs at the same time
+            workers = max(1, (os.cpu_count() or 1) // max(1, int(getattr(self, 'export_queue_workers', 2))))
+            
+            def task(progress, cancel_event):
+                result = run_export(job, workers=workers, progress=progress, cancel_event=cancel_event)
+                # A cancelled job can't be resumed from the queue; finish a partial archive
+                job.close()
+                for error in result.failed:
+                    print(f"CONSOLE ERROR MSG: Error processing {error}")
+                written = f"Exported {job.exported}/{job.total} frames"
+                if job.skipped:
+                    written += f" ({job.skipped} unchanged, skipped)"
+                return f"{written} to:\n{job.destination}\n\n{result.summary()}"
+            title = "Export Frames" if type(job) is FrameExportJob else "Outfit Matrix"
+            self._queue_export(title, [job.destination], task, job.total)
+            return
+        
+        progress_window = tk.Toplevel(self.master)
+        progress_window.title("Exporting Frames")
+        progress_window.transient(self.master)
+        progress_window.resizable(False, False)
+        
+        progress_label = tk.Label(progress_window, text=f"Exporting frames 0/{job.total}...")
+        progress_label.pack(padx=10, pady=10)
+        
+        progress_bar = ttk.Progressbar(progress_window, length=250, mode='determinate')
+        progress_bar.pack(padx=10, pady=5)
+        
+        button_row = tk.Frame(progress_window)
+        button_row.pack(pady=10)
+        
+        # Shared between the export thread and the Tk poll below
+        state = {"done": len(job.completed), "result": None}
+        cancel_event = threading.Event()
+        
+        def poll():
+            if not progress_window.winfo_exists():
+                return
+            progress_bar['value'] = state["done"] / job.total * 100 if job.total else 100
+            if state["result"] is None:
+                progress_label.config(text=f"Exporting frame {state['done']}/{job.total}...")
+                progress_window.after(100, poll)
+                return
+            result = state["result"]
+            for error in result.failed:
+                print(f"CONSOLE ERROR MSG: Error processing {error}")
+            if result.cancelled and not job.is_finished():
+                progress_label.config(text=f"{result.summary()}\n{job.total - len(job.completed)} frames left")
+                action_button.config(text="Resume", state="normal", command=start)
+                return
             progress_window.destroy()
-            messagebox.showinfo("Success", f"Exported {exported_count}/{total_images} frames to:\n{output_dir}")
-            
-            # Restore layer state
-            for layer, was_active in zip(self.palette_layers, current_layers):
-                layer.active = was_active
-            
-        except Exception as e:
-            # Restore layer state even on error
-            for layer, was_active in zip(self.palette_layers, current_layers):
-                layer.active = was_active
-            messagebox.showerror("Error", f"Export failed: {e}")
+            written = f"Exported {job.exported}/{job.total} frames"
+            if job.skipped:
+                written += f" ({job.skipped} unchanged, skipped)"
+            messagebox.showinfo("Success", f"{written} to:\n{job.destination}\n\n{result.summary()}")
+        
+        def progress(done, total):
+            state["done"] = done
+        
+        def on_done(result):
+            state["result"] = result
+            if state.get("close_requested"):
+                job.close()
+        
+        def start():
+            state["result"] = None
+            cancel_event.clear()
+            action_button.config(text="Cancel", command=cancel, state="normal")
+            run_export_async(job, progress=progress, cancel_event=cancel_event, on_done=on_done)
+            poll()
+        
+        def cancel():
+            cancel_event.set()
+            action_button.config(state="disabled")
+        
+        def close():
+            cancel_event.set()
+            # A partial archive is finished now, or by the export thread once its running chunks are done
+            state["close_requested"] = True
+            if state["result"] is not None:
+                job.close()
+            progress_window.destroy()
+        
+        action_button = tk.Button(button_row, text="Cancel", width=10, command=cancel)
+        action_button.pack(side="left", padx=5)
+        tk.Button(button_row, text="Close", width=10, command=close).pack(side="left", padx=5)
+        progress_window.protocol("WM_DELETE_WINDOW", close)
+        
+        # Center the progress window after content is created
+        progress_window.update_idletasks()
+        self._center_window_on_parent(progress_window, self.master)
+        start()
+
+    def export_sprite_sheet(self):
+        """Render the character's frames (or the custom frame range) into one packed sprite sheet"""
+        if not hasattr(self, 'current_character') or not self.current_character:
+            messagebox.showinfo("Notice", "Please select a character first.")
+            return
+        
+        if not self.character_images or self.current_character not in self.character_images:
+            messagebox.showinfo("Notice", "No images found for this character.")
+            return
+        
+        images = self.character_images[self.current_character]
+        sheet_name = self._get_export_name()
+        # The custom preview mode exports just its frame range
+        if self.preview_var.get() == "custom":
+            frame_indices = self._get_custom_range_indices()
+            if frame_indices:
+                images = [images[i] for i in frame_indices]
+                sheet_name += f"_frames{frame_indices[0] + 1}-{frame_indices[-1] + 1}"
+        
+        default_export_dir = os.path.join(self.root_dir, "exports", "images")
+        output_path = filedialog.asksaveasfilename(
+            title="Save sprite sheet",
+            initialdir=default_export_dir,
+            initialfile=f"{sheet_name}_sheet.png",
+            defaultextension=".png",
+            filetypes=[("PNG files", "*.png")]
+        )
+        if not output_path:
+            return
+        
+        char_id = self.current_character
+        template = self._get_merged_palette_template()
+        packer = getattr(self, 'sprite_sheet_packer', "maxrects")
+        meta = self._get_export_manifest()
+        meta["packer"] = packer
+        # Frames come from the preview's decoded frame cache without evicting what it holds
+        worker = self._get_render_worker()
+        
+        def task(progress, cancel_event):
+            atlas = build_sprite_atlas(char_id, template, images, packer,
+                                       load_frame=lambda path: worker.load_frame(path, cache=False),
+                                       progress=progress, cancel_event=cancel_event)
+            if atlas is None:
+                return None
+            sheet, entries, failed = atlas
+            json_path = save_sprite_atlas(sheet, entries, output_path, meta)
+            return sheet.size, len(entries), failed, json_path
+        
+        def summary(result, elapsed):
+            size, frame_count, failed, json_path = result
+            for error in failed:
+                print(f"CONSOLE ERROR MSG: Error processing {error}")
+            message = (f"Packed {frame_count} frames into a {size[0]}x{size[1]} sheet in {elapsed:.1f}s:\n"
+                       f"{output_path}\n\nFrame data:\n{json_path}")
+            if failed:
+                message += f"\n\n{len(failed)} frames failed"
+            return message
+        
+        self._run_export_task("Exporting Sprite Sheet", len(images), task, summary,
+                              "Packing and writing sprite sheet...",
+                              outputs=[output_path, os.path.splitext(output_path)[0] + ".json"])
+
+    def export_animation(self):
+        """Export the custom frame range as an animated GIF / APNG / WebP with the current palettes"""
+        if not hasattr(self, 'current_character') or not self.current_character:
+            messagebox.showinfo("Notice", "Please select a character first.")
+            return
+        
+        if not self.character_images or self.current_character not in self.character_images:
+            messagebox.showinfo("Notice", "No images found for this character.")
+            return
+        
+        frame_indices = self._get_custom_range_indices()
+        if not frame_indices:
+            messagebox.showinfo("Notice", "No frames in the custom frame range.")
+            return
+        images = [self.character_images[self.current_character][i] for i in frame_indices]
+        
+        animation_format = getattr(self, 'animation_format', "gif")
+        if animation_format not in ANIMATION_FORMATS:
+            animation_format = "gif"
+        delay = max(10, int(getattr(self, 'animation_frame_delay', 100)))
+        extension = ANIMATION_FORMATS[animation_format][0]
+        label = ANIMATION_FORMAT_LABELS[animation_format]
+        
+        default_export_dir = os.path.join(self.root_dir, "exports", "images")
+        output_path = filedialog.asksaveasfilename(
+            title=f"Save {label} animation",
+            initialdir=default_export_dir,
+            initialfile=f"{self._get_export_name()}_frames{frame_indices[0] + 1}-{frame_indices[-1] + 1}{extension}",
+            defaultextension=extension,
+            filetypes=[(f"{label} files", f"*{extension}")]
+        )
+        if not output_path:
+            return
+        
+        char_id = self.current_character
+        template = self._get_merged_palette_template()
+        worker = self._get_render_worker()
+        
+        def task(progress, cancel_event):
+            animation = build_animation_frames(char_id, template, images,
+                                               load_frame=lambda path: worker.load_frame(path, cache=False),
+                                               progress=progress, cancel_event=cancel_event)
+            if animation is None:
+                return None
+            frames, _, transparent = animation
+            save_animation(frames, output_path, animation_format, delay, transparent)
+            return len(frames)
+        
+        def summary(frame_count, elapsed):
+            return (f"Exported a {frame_count}-frame {label} animation "
+                    f"({delay} ms per frame) in {elapsed:.1f}s:\n{output_path}")
+        
+        self._run_export_task("Exporting Animation", len(images), task, summary,
+                              f"Encoding {label}...", outputs=[output_path])
+
+    def _get_custom_range_indices(self):
+        """Frame indices from the custom preview's start frame to its end frame (inclusive)"""
+        images = self.character_images.get(self.current_character, []) if self.current_character else []
+        if not images:
+            return []
+        current_job = self.job_var.get() if hasattr(self, 'job_var') else None
+        job_settings = self.frame_range_settings.get(self.current_character, {}).get(current_job)
+        if job_settings:
+            _, start_frame, end_frame = job_settings
+        else:
+            start_frame = getattr(self, 'custom_start_frame', 0)
+            end_frame = getattr(self, 'custom_end_frame', len(images) - 1)
+        start_frame = max(0, min(start_frame, len(images) - 1))
+        end_frame = max(start_frame, min(end_frame, len(images) - 1))
+        return list(range(start_frame, end_frame + 1))
+
+    def _run_export_task(self, title, total, task, summary, finishing_text, outputs=()):
+        """Run task(progress, cancel_event) on a background thread with a progress window.
+        
+        task calls progress(done, total) as it goes and returns None when it was cancelled;
+        summary(result, elapsed seconds) gives the message shown when it is done. With the
+        export queue enabled the task is queued instead; outputs are the paths it writes.
+        """
+        import threading
+        
+        if getattr(self, 'use_export_queue', False):
+            def queued_task(progress, cancel_event):
+                start_time = time.perf_counter()
+                result = task(progress, cancel_event)
+                if result is None:
+                    return None
+                return summary(result, time.perf_counter() - start_time)
+            self._queue_export(title, outputs, queued_task, total)
+            return
+        
+        progress_window = tk.Toplevel(self.master)
+        progress_window.title(title)
+        progress_window.transient(self.master)
+        progress_window.resizable(False, False)
+        
+        progress_label = tk.Label(progress_window, text=f"Rendering frame 0/{total}...")
+        progress_label.pack(padx=10, pady=10)
+        
+        progress_bar = ttk.Progressbar(progress_window, length=250, mode='determinate')
+        progress_bar.pack(padx=10, pady=5)
+        
+        # Shared between the export thread and the Tk poll below
+        state = {"done": 0, "finished": False, "result": None, "error": None, "elapsed": 0.0}
+        cancel_event = threading.Event()
+        
+        def progress(done, total):
+            state["done"] = done
+        
+        def run():
+            start_time = time.perf_counter()
+            try:
+                state["result"] = task(progress, cancel_event)
+            except Exception as e:
+                state["error"] = e
+            state["elapsed"] = time.perf_counter() - start_time
+            state["finished"] = True
+        
+        def poll():
+            if not progress_window.winfo_exists():
+                return
+            progress_bar['value'] = state["done"] / total * 100 if total else 100
+            if not state["finished"]:
+                if state["done"] < total:
+                    progress_label.config(text=f"Rendering frame {state['done']}/{total}...")
+                else:
+                    progress_label.config(text=finishing_text)
+                progress_window.after(100, poll)
+                return
+            progress_window.destroy()
+            if state["error"] is not None:
+                print(f"CONSOLE ERROR MSG: {title} failed: {state['error']}")
+                messagebox.showerror("Error", f"Export failed: {state['error']}")
+                return
+            if state["result"] is None:
+                return  # Cancelled
+            messagebox.showinfo("Success", summary(state["result"], state["elapsed"]))
+        
+        def cancel():
+            cancel_event.set()
+            progress_window.destroy()
+        
+        tk.Button(progress_window, text="Cancel", width=10, command=cancel).pack(pady=10)
+        progress_window.protocol("WM_DELETE_WINDOW", cancel)
+        
+        # Center the progress window after content is created
+        progress_window.update_idletasks()
+        self._center_window_on_parent(progress_window, self.master)
+        threading.Thread(target=run, name="ExportTask", daemon=True).start()
+        poll()
+
+    def _get_export_queue_path(self):
+        """Get the path to the export queue history file"""
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), "export_queue.json")
+
+    def _get_export_queue(self):
+        """The background export queue (created on first use)"""
+        if getattr(self, 'export_queue', None) is None:
+            self.export_queue = ExportQueue(self._get_export_queue_path(),
+                                            getattr(self, 'export_queue_workers', 2))
+        self.export_queue.max_workers = max(1, int(getattr(self, 'export_queue_workers', 2)))
+        return self.export_queue
+
+    def _queue_export(self, title, outputs, task, total=0):
+        """Add task(progress, cancel_event) to the export queue and show the queue panel.
+        
+        The task returns a summary message (None when cancelled) and must not touch Tk.
+        Returns False when its outputs conflict with a queued or running export.
+        """
+        export_queue = self._get_export_queue()
+        conflicts = export_queue.find_conflicts(outputs)
+        if conflicts:
+            details = "\n".join(f"- {path}: {reason}" for path, reason in conflicts[:10])
+            messagebox.showerror("Export Queue", f"This export was not queued:\n{details}")
+            return False
+        export_queue.submit(title, outputs, task, total)
+        self._open_export_queue_panel()
+        return True
+
+    def _open_export_queue_panel(self):
+        """Show the export queue: status, duration and output of queued, running and past exports"""
+        if getattr(self, '_export_queue_window', None) and self._export_queue_window.winfo_exists():
+            self._export_queue_window.lift()
+            return
+        
+        export_queue = self._get_export_queue()
+        window = tk.Toplevel(self.master)
+        window.title("Export Queue")
+        window.transient(self.master)
+        self._export_queue_window = window
+        
+        tree_frame = tk.Frame(window)
+        tree_frame.pack(fill="both", expand=True, padx=10, pady=(10, 5))
+        columns = ("export", "status", "duration", "output")
+        tree = ttk.Treeview(tree_frame, columns=columns, show="headings", height=12, selectmode="browse")
+        for column, label, width in (("export", "Export", 150), ("status", "Status", 110),
+                                     ("duration", "Duration", 70), ("output", "Output", 380)):
+            tree.heading(column, text=label)
+            tree.column(column, width=width, anchor="w")
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar = tk.Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+        scrollbar.pack(side="left", fill="y")
+        tree.config(yscrollcommand=scrollbar.set)
+        
+        message_label = tk.Label(window, text="", justify="left", anchor="w", wraplength=700)
+        message_label.pack(fill="x", padx=10, pady=5)
+        
+        def selected_entry():
+            selection = tree.selection()
+            if not selection:
+                return None
+            return next((entry for entry in export_queue.entries() if str(entry.id) == selection[0]), None)
+        
+        def refresh():
+            if not window.winfo_exists():
+                return
+            entries = export_queue.entries()
+            ids = set()
+            # Newest first
+            for index, entry in enumerate(reversed(entries)):
+                status = STATUS_LABELS[entry.status]
+                if entry.status in ACTIVE_STATUSES and entry.total:
+                    status += f" {entry.done}/{entry.total}"
+                duration = f"{entry.duration:.1f}s" if entry.duration is not None else ""
+                values = (entry.title, status, duration, "; ".join(entry.outputs))
+                item = str(entry.id)
+                ids.add(item)
+                if tree.exists(item):
+                    tree.item(item, values=values)
+                    if tree.index(item) != index:
+                        tree.move(item, "", index)
+                else:
+                    tree.insert("", index, iid=item, values=values)
+            for item in tree.get_children():
+                if item not in ids:
+                    tree.delete(item)
+            entry = selected_entry()
+            message_label.config(text=entry.message if entry is not None else "")
+            window.after(500, refresh)
+        
+        def cancel_selected():
+            entry = selected_entry()
+            if entry is not None:
+                export_queue.cancel(entry.id)
+        
+        def open_output():
+            entry = selected_entry()
+            if entry is None or not entry.outputs:
+                return
+            folder = entry.outputs[0]
+            if not os.path.isdir(folder):
+                folder = os.path.dirname(folder)
+            try:
+                if sys.platform.startswith("win"):
+                    os.startfile(folder)
+                else:
+                    import subprocess
+                    subprocess.Popen(["open" if sys.platform == "darwin" else "xdg-open", folder])
+            except Exception as e:
+                print(f"CONSOLE ERROR MSG: Could not open {folder}: {e}")
+                messagebox.showerror("Error", f"Could not open {folder}: {e}", parent=window)
+        
+        button_row = tk.Frame(window)
+        button_row.pack(pady=(0, 10))
+        tk.Button(button_row, text="Cancel Export", width=12, command=cancel_selected).pack(side="left", padx=5)
+        tk.Button(button_row, text="Open Folder", width=12, command=open_output).pack(side="left", padx=5)
+        tk.Button(button_row, text="Clear Finished", width=12,
+                  command=export_queue.clear_finished).pack(side="left", padx=5)
+        tk.Button(button_row, text="Close", width=12, command=window.destroy).pack(side="left", padx=5)
+        
+        window.update_idletasks()
+        self._center_window_on_parent(window, self.master)
+        refresh()
 
     def update_bg_color_button(self):
         """Update the background color button appearance"""
@@ -6309,46 +7010,59 @@ class PaletteTool:
             # Get the merged palette (same logic as used for display/export)
             merged_palette = self.get_merged_palette()
             
-            if self.palette_format == "pal":
-                # Ensure we have exactly 256 colors for VGA palette
-                while len(merged_palette) < 256:
-                    merged_palette.append((0, 0, 0))  # Fill with black if needed
-                
-                # Write VGA 24-bit format: each color as 3 bytes (R, G, B) in sequence
-                with open(path, "wb") as f:
-                    for r, g, b in merged_palette[:256]:  # Ensure exactly 256 colors
-                        f.write(bytes([r, g, b]))
-            else:  # PNG grid
-                # Create a 503x503 image (16x16 grid where each color is ~31.4375x31.4375)
-                grid_img = Image.new("RGB", (503, 503), (0, 0, 0))
-                cell_size = 503 // 16  # This gives us 31 pixels with some remainder
-                
-                # Fill in the colors in a 16x16 grid
-                for i, color in enumerate(merged_palette):
-                    if i >= 256:  # Maximum 256 colors in 16x16 grid
-                        break
+            palette_format = self.palette_format
+            
+            def write_palette():
+                if palette_format == "pal":
+                    # Ensure we have exactly 256 colors for VGA palette
+                    while len(merged_palette) < 256:
+                        merged_palette.append((0, 0, 0))  # Fill with black if needed
                     
-                    # Calculate position in 16x16 grid
-                    grid_x = i % 16
-                    grid_y = i // 16
+                    # Write VGA 24-bit format: each color as 3 bytes (R, G, B) in sequence
+                    with open(path, "wb") as f:
+                        for r, g, b in merged_palette[:256]:  # Ensure exactly 256 colors
+                            f.write(bytes([r, g, b]))
+                else:  # PNG grid
+                    # Create a 503x503 image (16x16 grid where each color is ~31.4375x31.4375)
+                    grid_img = Image.new("RGB", (503, 503), (0, 0, 0))
+                    cell_size = 503 // 16  # This gives us 31 pixels with some remainder
                     
-                    # Calculate pixel ranges for this cell, handling the remainder
-                    x_start = (grid_x * 503) // 16
-                    x_end = ((grid_x + 1) * 503) // 16
-                    y_start = (grid_y * 503) // 16
-                    y_end = ((grid_y + 1) * 503) // 16
+                    # Fill in the colors in a 16x16 grid
+                    for i, color in enumerate(merged_palette):
+                        if i >= 256:  # Maximum 256 colors in 16x16 grid
+                            break
+                        
+                        # Calculate position in 16x16 grid
+                        grid_x = i % 16
+                        grid_y = i // 16
+                        
+                        # Calculate pixel ranges for this cell, handling the remainder
+                        x_start = (grid_x * 503) // 16
+                        x_end = ((grid_x + 1) * 503) // 16
+                        y_start = (grid_y * 503) // 16
+                        y_end = ((grid_y + 1) * 503) // 16
+                        
+                        # Fill the exact pixel range for this cell
+                        for px in range(x_start, x_end):
+                            for py in range(y_start, y_end):
+                                grid_img.putpixel((px, py), color)
                     
-                    # Fill the exact pixel range for this cell
-                    for px in range(x_start, x_end):
-                        for py in range(y_start, y_end):
-                            grid_img.putpixel((px, py), color)
-                
-                # Save the PNG
-                grid_img.save(path, "PNG")
+                    # Save the PNG
+                    grid_img.save(path, "PNG")
             
             # Show which layers were combined
             layer_names = [layer.name for layer in active_layers]
-            messagebox.showinfo("Success", f"Exported VGA 24-bit palette to {path}\n\nCombined layers:\n" + "\n".join(f"• {name}" for name in layer_names))
+            message = f"Exported VGA 24-bit palette to {path}\n\nCombined layers:\n" + "\n".join(f"• {name}" for name in layer_names)
+            
+            if getattr(self, 'use_export_queue', False):
+                def task(progress, cancel_event):
+                    write_palette()
+                    return message
+                self._queue_export("Palette", [path], task)
+                return
+            
+            write_palette()
+            messagebox.showinfo("Success", message)
         except Exception as e:
             messagebox.showerror("Error", f"Export failed: {e}")
 
@@ -6441,10 +7155,15 @@ class PaletteTool:
         # Temporary palette cache to preserve changes during editor session
         self._live_temp_palette_cache = {}  # Cache for temporary changes during session
         
+        # Undo/redo history; only stores the indices each edit changed
+        self._live_history = PaletteHistory()
+        
         for i, layer in enumerate(active_layers):
+            # Copy-on-write snapshots: no bytes are duplicated until the layer is edited
             self._live_original_colors[names[i]] = layer.colors.copy()
             # Initialize temp cache with current colors (which may already have changes)
             self._live_temp_palette_cache[names[i]] = layer.colors.copy()
+            self._live_history.track(names[i], layer.colors)
         
         # Track which job/character each palette type belongs to
         self._live_palette_job_mapping = {}
@@ -6490,6 +7209,8 @@ class PaletteTool:
                 # Clear the temp cache
                 if hasattr(self, '_live_temp_palette_cache'):
                     delattr(self, '_live_temp_palette_cache')
+                if hasattr(self, '_live_history'):
+                    delattr(self, '_live_history')
             
             self.refresh_custom_pals(update_ui=True)  # Update UI to refresh custom pals display
             
@@ -6499,6 +7220,10 @@ class PaletteTool:
                 self.load_palettes()
                 self._debounced_display_update()
             
+            # Drop any preview render still in flight for this window
+            if getattr(self, '_render_worker', None) is not None:
+                self._render_worker.cancel("simple_preview")
+            
             self._live_editor_window.destroy()
             self._live_editor_window = None  # Clear the instance variable
             
@@ -6517,6 +7242,14 @@ class PaletteTool:
         self._sel_count_lbl = tk.Label(top, text="(0 selected)"); self._sel_count_lbl.pack(side="left", padx=(6,0))
         tk.Button(top, text="Save Item .pal", command=self._live_save_item_pal).pack(side="left", padx=(12,8))
         tk.Button(top, text="Reset to Original", command=self._live_reset_to_original).pack(side="right")
+        self._live_redo_btn = tk.Button(top, text="Redo", command=self._live_redo)
+        self._live_redo_btn.pack(side="right", padx=(0,5))
+        self._live_undo_btn = tk.Button(top, text="Undo", command=self._live_undo)
+        self._live_undo_btn.pack(side="right", padx=(0,5))
+        self._live_update_history_buttons()
+        self._live_editor_window.bind("<Control-z>", lambda e: self._live_undo())
+        self._live_editor_window.bind("<Control-y>", lambda e: self._live_redo())
+        self._live_editor_window.bind("<Control-Shift-Z>", lambda e: self._live_redo())
 
         # Body - use grid for better control over proportions
         body = tk.Frame(self._live_editor_window); body.pack(fill="both", expand=True, padx=1, pady=0)
@@ -6725,6 +7458,7 @@ class PaletteTool:
             if ly is None: return
             idx = getattr(self, "_live_selected_index", 0)
             ly.colors[idx] = (int(r),int(g),int(b))
+            self._live_record_history(ly)
             try: 
                 # Update swatch based on mode
                 if self.live_pal_ui_mode == "Simple":
@@ -7228,113 +7962,48 @@ class PaletteTool:
         
         # Original preview click behavior for color selection
         try:
-            if not hasattr(self, 'current_character') or not self.current_character:
-                return
-            
-            if self.current_character not in self.character_images:
-                return
-            
-            images = self.character_images[self.current_character]
-            if not images or self._simple_current_frame >= len(images):
-                return
-            
-            # Get click coordinates relative to the canvas
-            click_x = event.x
-            click_y = event.y
-            
-            # Get the current zoom and image dimensions
-            zoom = self._simple_zoom_var.get()
-            # Get actual canvas dimensions dynamically
-            canvas_width = self._simple_preview_canvas.winfo_width()
-            canvas_height = self._simple_preview_canvas.winfo_height()
-            
-            # Fallback to reasonable defaults if canvas not yet configured
-            if canvas_width <= 1:
-                canvas_width = 500
-            if canvas_height <= 1:
-                canvas_height = 200
-            
-            # Load the original image to get pixel data
-            original_img_path = images[self._simple_current_frame]
-            original_img = Image.open(original_img_path).convert("P")
-            img_width, img_height = original_img.size
-            
-            # Calculate the displayed image size based on zoom
-            if zoom == "Fit":
-                scale_x = canvas_width / img_width
-                scale_y = canvas_height / img_height
-                scale = min(scale_x, scale_y)
-                display_width = int(img_width * scale)
-                display_height = int(img_height * scale)
-            elif zoom == "200%":
-                display_width = img_width * 2
-                display_height = img_height * 2
-            elif zoom == "300%":
-                display_width = img_width * 3
-                display_height = img_height * 3
-            elif zoom == "400%":
-                display_width = img_width * 4
-                display_height = img_height * 4
-            elif zoom == "500%":
-                display_width = img_width * 5
-                display_height = img_height * 5
-            else:  # 100%
-                display_width = img_width
-                display_height = img_height
-            
-            # Calculate the image position (centered in canvas)
-            image_x = (canvas_width - display_width) / 2
-            image_y = (canvas_height - display_height) / 2
-            
-            # Check if click is within the image bounds
-            if (click_x < image_x or click_x >= image_x + display_width or
-                click_y < image_y or click_y >= image_y + display_height):
+            hit = self._simple_preview_hit(event)
+            if hit is None or hit.index is None:
                 return  # Click outside image
-            
-            # Convert click coordinates to original image coordinates
-            relative_x = click_x - image_x
-            relative_y = click_y - image_y
-            
-            # Scale back to original image coordinates
-            if zoom == "Fit":
-                original_x = int(relative_x / scale)
-                original_y = int(relative_y / scale)
-            elif zoom == "200%":
-                original_x = int(relative_x / 2)
-                original_y = int(relative_y / 2)
-            elif zoom == "300%":
-                original_x = int(relative_x / 3)
-                original_y = int(relative_y / 3)
-            elif zoom == "400%":
-                original_x = int(relative_x / 4)
-                original_y = int(relative_y / 4)
-            elif zoom == "500%":
-                original_x = int(relative_x / 5)
-                original_y = int(relative_y / 5)
-            else:  # 100%
-                original_x = int(relative_x)
-                original_y = int(relative_y)
-            
-            # Ensure coordinates are within image bounds
-            if (0 <= original_x < img_width and 0 <= original_y < img_height):
-                # Get the palette index at this pixel
-                pixel_index = original_img.getpixel((original_x, original_y))
-                
-                # Check if this index is in our editable indices for the current layer
-                current_layer = self._live_current_layer()
-                editable_indices = self._get_editable_color_indices(current_layer)
-                if pixel_index in editable_indices:
-                    # Select this index in the live editor
-                    self._live_select_index(pixel_index)
-                    
-                    # Update selection UI
-                    self._selected_indices.clear()
-                    self._selected_indices.add(pixel_index)
-                    self._update_selection_ui()
+            self._live_select_index_from_preview(hit.index)
                     
         except Exception as e:
             print(f"CONSOLE ERROR MSG: Error handling simple preview click: {e}")
 
+    def _simple_preview_hit(self, event):
+        """Resolve a click on the simple preview to the frame pixel and palette index under it"""
+        hitmap = getattr(self, '_simple_hitmap', None)
+        if hitmap is None:
+            return None
+        return hitmap.lookup(event.x, event.y)
+
+    def _live_select_index_from_preview(self, pixel_index):
+        """Select a clicked palette index in the live editor if it is editable"""
+        # Check if this index is in our editable indices for the current layer
+        current_layer = self._live_current_layer()
+        editable_indices = self._get_editable_color_indices(current_layer)
+        if pixel_index in editable_indices:
+            # Select this index in the live editor
+            self._live_select_index(pixel_index)
+            
+            # Update selection UI
+            self._selected_indices.clear()
+            self._selected_indices.add(pixel_index)
+            self._update_selection_ui()
+
+    def _live_colorpick_index(self, pixel_index):
+        """Apply the displayed color of a clicked palette index to the selection"""
+        # Get the actual color from the merged palette
+        merged_palette = self.get_merged_palette()
+        if pixel_index < len(merged_palette):
+            picked_color = merged_palette[pixel_index]
+            
+            # Check if it's a transparency color and use background color instead
+            if self.is_universal_keying_color(picked_color) or picked_color == (255, 0, 255):
+                picked_color = self.background_color
+            
+            self._apply_colorpicked_color_simple(picked_color)
+
     def _update_simple_preview(self):
         """Update the simple mode preview image"""
         if not hasattr(self, '_simple_preview_canvas') or not self._simple_preview_canvas:
@@ -7353,117 +8022,127 @@ class PaletteTool:
             self._simple_preview_canvas.delete("all")
             return
         
-        # Get the current image with palettes applied
         try:
             # Get the original image for the current frame
             original_img = images[self._simple_current_frame]
             
-            # Apply palettes to this specific frame
-            current_img = self._apply_palettes_to_image_path(original_img)
-            
-            if not current_img:
-                # Fallback to original image
-                current_img = Image.open(original_img)
-            
-            if current_img:
-                # Apply zoom
-                zoom = self._simple_zoom_var.get()
-                img_width, img_height = current_img.size
-                
-                # Get actual canvas dimensions dynamically for fit calculation
-                canvas_width = self._simple_preview_canvas.winfo_width()
-                canvas_height = self._simple_preview_canvas.winfo_height()
-                
-                # Fallback to reasonable defaults if canvas not yet configured
-                if canvas_width <= 1:
-                    canvas_width = 380
-                if canvas_height <= 1:
-                    canvas_height = 200
-                
-                if zoom == "Fit":
-                    # Calculate scale to fit within the canvas
-                    scale_x = canvas_width / img_width
-                    scale_y = canvas_height / img_height
-                    scale = min(scale_x, scale_y)  # Allow scaling up or down
-                    new_width = int(img_width * scale)
-                    new_height = int(img_height * scale)
-                elif zoom == "200%":
-                    new_width = img_width * 2
-                    new_height = img_height * 2
-                elif zoom == "300%":
-                    new_width = img_width * 3
-                    new_height = img_height * 3
-                elif zoom == "400%":
-                    new_width = img_width * 4
-                    new_height = img_height * 4
-                elif zoom == "500%":
-                    new_width = img_width * 5
-                    new_height = img_height * 5
-                else:  # 100%
-                    new_width = img_width
-                    new_height = img_height
-                
-                # Resize image
-                display_img = current_img.resize((new_width, new_height), Image.NEAREST)
-                
-                # Convert to PhotoImage
-                photo = ImageTk.PhotoImage(display_img)
-                
-                # Clear canvas and display image
-                self._simple_preview_canvas.delete("all")
-                
-                # Center the image in the canvas using dynamic dimensions
-                center_x = canvas_width // 2
-                center_y = canvas_height // 2
-                self._simple_preview_canvas.create_image(center_x, center_y, anchor="center", image=photo)
-                
-                # Keep reference to prevent garbage collection
-                self._simple_current_image = photo
-                
-                # Update frame label
-                if hasattr(self, '_simple_frame_label'):
-                    total_frames = len(images)
-                    self._simple_frame_label.config(text=f"Frame {self._simple_current_frame + 1} / {total_frames}")
+            # Frame size is needed for the zoom math; the decoded indices are cached
+            index_map = self._get_frame_index_map(original_img)
+            img_width, img_height = index_map.size
+            
+            # Apply zoom
+            zoom = self._simple_zoom_var.get()
+            
+            # Get actual canvas dimensions dynamically for fit calculation
+            canvas_width = self._simple_preview_canvas.winfo_width()
+            canvas_height = self._simple_preview_canvas.winfo_height()
+            
+            # Fallback to reasonable defaults if canvas not yet configured
+            if canvas_width <= 1:
+                canvas_width = 380
+            if canvas_height <= 1:
+                canvas_height = 200
+            
+            if zoom == "Fit":
+                # Calculate scale to fit within the canvas
+                scale_x = canvas_width / img_width
+                scale_y = canvas_height / img_height
+                scale = min(scale_x, scale_y)  # Allow scaling up or down
+                new_width = int(img_width * scale)
+                new_height = int(img_height * scale)
+            elif zoom == "200%":
+                new_width = img_width * 2
+                new_height = img_height * 2
+            elif zoom == "300%":
+                new_width = img_width * 3
+                new_height = img_height * 3
+            elif zoom == "400%":
+                new_width = img_width * 4
+                new_height = img_height * 4
+            elif zoom == "500%":
+                new_width = img_width * 5
+                new_height = img_height * 5
+            else:  # 100%
+                new_width = img_width
+                new_height = img_height
+            
+            # Update frame label right away so navigation feels instant
+            if hasattr(self, '_simple_frame_label'):
+                total_frames = len(images)
+                self._simple_frame_label.config(text=f"Frame {self._simple_current_frame + 1} / {total_frames}")
+            
+            # Snapshot the keyed display palette and hand the render to the worker;
+            # a newer slider tick replaces this request before it is rendered
+            request = RenderRequest(original_img, self._get_display_palette(),
+                                    (new_width, new_height), Image.NEAREST)
+            center = (canvas_width // 2, canvas_height // 2)
+            self._get_render_worker().submit(
+                "simple_preview", request,
+                lambda img, c=center, key=self._simple_current_frame, m=index_map: self._show_simple_preview_image(img, c, key, m))
                 
         except Exception as e:
             print(f"CONSOLE ERROR MSG: Error updating simple preview: {e}")
             self._simple_preview_canvas.delete("all")
 
+    def _show_simple_preview_image(self, display_img, center, frame_key=None, index_map=None):
+        """Display a finished background render on the simple preview canvas"""
+        if not hasattr(self, '_simple_preview_canvas') or not self._simple_preview_canvas:
+            return
+        if not self._simple_preview_canvas.winfo_exists():
+            return
+        
+        # Convert to PhotoImage
+        photo = ImageTk.PhotoImage(display_img)
+        
+        # Clear canvas and display image
+        self._simple_preview_canvas.delete("all")
+        self._simple_preview_canvas.create_image(center[0], center[1], anchor="center", image=photo)
+        
+        # Remember where the frame landed so clicks resolve by direct lookup
+        self._simple_hitmap = PreviewHitMap()
+        self._simple_hitmap.add(frame_key, index_map, center[0], center[1],
+                                display_img.size[0], display_img.size[1], anchor="center")
+        
+        # Keep reference to prevent garbage collection
+        self._simple_current_image = photo
+
+    def _get_render_worker(self):
+        """Return the shared background render worker, starting it on first use"""
+        if not hasattr(self, '_render_worker') or self._render_worker is None:
+            self._render_worker = RenderWorker(self.master)
+        return self._render_worker
+
+    def _get_frame_index_map(self, image_path, img=None):
+        """Return the cached palette-index map of a frame file, decoding it on first use"""
+        if not hasattr(self, '_frame_index_cache'):
+            self._frame_index_cache = {}
+        index_map = self._frame_index_cache.get(image_path)
+        if index_map is None:
+            # Reuse an already-decoded indexed image when the caller has one
+            index_map = IndexMap.from_image(img) if img is not None else IndexMap.from_path(image_path)
+            # Keep the cache bounded to a few characters' worth of frames
+            if len(self._frame_index_cache) >= 2048:
+                self._frame_index_cache.clear()
+            self._frame_index_cache[image_path] = index_map
+        return index_map
+
+    def _get_display_palette(self):
+        """Return the merged palette with keying colors replaced by the background color"""
+        display_palette = []
+        for color in self.get_merged_palette():
+            if self.is_universal_keying_color(color) or color == (255, 0, 255):  # Green or magenta
+                display_palette.append(self.background_color)
+            else:
+                display_palette.append(color)
+        return display_palette
+
     def _apply_palettes_to_image_path(self, image_path):
-        """Apply current active palettes to a specific image file and return the result"""
+        """Apply current active palettes to a specific image file and return the result (synchronous)"""
         try:
-            # Load the image
-            original_img = Image.open(image_path).convert("P")
-            
-            # Get the merged palette (same logic as update_single_frame_display)
-            merged_palette = self.get_merged_palette()
-            
-            # Create a new image with the merged palette
-            w, h = original_img.size
-            display_img = Image.new("P", (w, h))
-            
-            # Apply the merged palette FIRST
-            display_img.putpalette([color for palette_color in merged_palette for color in palette_color])
-            
-            # THEN copy the pixel data from original image
-            display_img.putdata(original_img.getdata())
-            
-            # Replace transparency colors with background color in the merged palette
-            display_palette = []
-            
-            for i, color in enumerate(merged_palette):
-                if self.is_universal_keying_color(color) or color == (255, 0, 255):  # Green or magenta
-                    display_palette.append(self.background_color)
-                else:
-                    display_palette.append(color)
-            
-            # Apply the modified palette to the display image
-            display_img.putpalette([color for palette_color in display_palette for color in palette_color])
-            
-            # Convert to RGB for display
-            rgb_img = display_img.convert("RGB")
-            
-            return rgb_img
+            with Image.open(image_path) as img:
+                original_img = img.convert("P")
+            flat_palette = [c for rgb in self._get_display_palette() for c in rgb]
+            return render_indexed_frame(original_img, flat_palette)
             
         except Exception as e:
             print(f"CONSOLE ERROR MSG: Error applying palettes to image: {e}")
@@ -7513,98 +8192,9 @@ class PaletteTool:
     def _colorpick_from_simple_preview(self, event):
         """Pick color from simple preview image."""
         try:
-            if not hasattr(self, 'current_character') or not self.current_character:
-                return
-            
-            if self.current_character not in self.character_images:
-                return
-            
-            images = self.character_images[self.current_character]
-            if not images or self._simple_current_frame >= len(images):
-                return
-            
-            # Get click coordinates relative to the canvas
-            click_x = event.x
-            click_y = event.y
-            
-            # Get the current zoom and image dimensions
-            zoom = self._simple_zoom_var.get()
-            canvas_width = self._simple_preview_canvas.winfo_width()
-            canvas_height = self._simple_preview_canvas.winfo_height()
-            
-            if canvas_width <= 1:
-                canvas_width = 380
-            if canvas_height <= 1:
-                canvas_height = 200
-            
-            # Load the original image to get pixel data
-            original_img_path = images[self._simple_current_frame]
-            original_img = Image.open(original_img_path).convert("P")
-            img_width, img_height = original_img.size
-            
-            # Calculate the displayed image size based on zoom
-            if zoom == "Fit":
-                scale_x = canvas_width / img_width
-                scale_y = canvas_height / img_height
-                scale = min(scale_x, scale_y)
-                display_width = int(img_width * scale)
-                display_height = int(img_height * scale)
-            elif zoom == "200%":
-                display_width = img_width * 2
-                display_height = img_height * 2
-                scale = 2
-            elif zoom == "300%":
-                display_width = img_width * 3
-                display_height = img_height * 3
-                scale = 3
-            elif zoom == "400%":
-                display_width = img_width * 4
-                display_height = img_height * 4
-                scale = 4
-            elif zoom == "500%":
-                display_width = img_width * 5
-                display_height = img_height * 5
-                scale = 5
-            else:  # 100%
-                display_width = img_width
-                display_height = img_height
-                scale = 1
-            
-            # Calculate image position (centered)
-            image_x = (canvas_width - display_width) // 2
-            image_y = (canvas_height - display_height) // 2
-            
-            # Check if click is within the image
-            if (image_x <= click_x <= image_x + display_width and 
-                image_y <= click_y <= image_y + display_height):
-                
-                # Convert click coordinates to image coordinates
-                relative_x = click_x - image_x
-                relative_y = click_y - image_y
-                
-                # Scale back to original image coordinates
-                if zoom == "Fit":
-                    original_x = int(relative_x / scale)
-                    original_y = int(relative_y / scale)
-                else:
-                    original_x = int(relative_x / scale)
-                    original_y = int(relative_y / scale)
-                
-                # Ensure coordinates are within image bounds
-                if 0 <= original_x < img_width and 0 <= original_y < img_height:
-                    # Get the palette index at this pixel
-                    pixel_index = original_img.getpixel((original_x, original_y))
-                    
-                    # Get the actual color from the merged palette
-                    merged_palette = self.get_merged_palette()
-                    if pixel_index < len(merged_palette):
-                        picked_color = merged_palette[pixel_index]
-                        
-                        # Check if it's a transparency color and use background color instead
-                        if self.is_universal_keying_color(picked_color) or picked_color == (255, 0, 255):
-                            picked_color = self.background_color
-                        
-                        self._apply_colorpicked_color_simple(picked_color)
+            hit = self._simple_preview_hit(event)
+            if hit is not None and hit.index is not None:
+                self._live_colorpick_index(hit.index)
                         
         except Exception as e:
             print(f"CONSOLE ERROR MSG: Error picking color from simple preview: {e}")
@@ -7646,6 +8236,8 @@ class PaletteTool:
                             canvas.delete("all")
                             canvas.create_rectangle(1, 1, 39, 39, fill=hex_color, outline="black", width=1)
         
+        self._live_record_history(current_layer)
+        
         # Update UI elements
         if hasattr(self, "_update_selection_ui"):
             self._update_selection_ui()
@@ -7987,12 +8579,67 @@ class PaletteTool:
         if hasattr(self, '_live_temp_palette_cache'):
             self._live_temp_palette_cache[current_name] = current_layer.colors.copy()
         
+        # Reset is an undoable step like any other edit
+        self._live_record_history(current_layer)
+        
         # Handle reset differently for Simple vs Advanced mode
         if self.live_pal_ui_mode == "Simple":
             self._simple_mode_reset(current_layer)
         else:
             self._advanced_mode_reset(current_layer)
     
+    def _live_record_history(self, layer):
+        """Record the current layer's edits as an undo step (slider drags coalesce)"""
+        if not hasattr(self, '_live_history') or layer is None:
+            return
+        self._live_history.record(self._live_target_name.get(), layer.colors)
+        self._live_update_history_buttons()
+
+    def _live_update_history_buttons(self):
+        """Enable Undo / Redo only when the current layer has a step to undo / redo"""
+        if not hasattr(self, '_live_history') or not hasattr(self, '_live_undo_btn'):
+            return
+        name = self._live_target_name.get()
+        try:
+            self._live_undo_btn.config(state="normal" if self._live_history.can_undo(name) else "disabled")
+            self._live_redo_btn.config(state="normal" if self._live_history.can_redo(name) else "disabled")
+        except tk.TclError:
+            pass
+
+    def _live_undo(self):
+        """Undo the last edit on the current layer"""
+        self._live_history_step(undo=True)
+
+    def _live_redo(self):
+        """Redo the last undone edit on the current layer"""
+        self._live_history_step(undo=False)
+
+    def _live_history_step(self, undo=True):
+        """Apply one undo/redo step in place and refresh the editor like a reset does"""
+        if not hasattr(self, '_live_history'):
+            return
+        current_layer = self._live_current_layer()
+        if current_layer is None:
+            return
+        
+        current_name = self._live_target_name.get()
+        if undo:
+            changed = self._live_history.undo(current_name, current_layer.colors)
+        else:
+            changed = self._live_history.redo(current_name, current_layer.colors)
+        self._live_update_history_buttons()
+        if not changed:
+            return
+        
+        # Keep the session cache in sync so switching layers preserves the result
+        if hasattr(self, '_live_temp_palette_cache'):
+            self._live_temp_palette_cache[current_name] = current_layer.colors.copy()
+        
+        if self.live_pal_ui_mode == "Simple":
+            self._simple_mode_reset(current_layer)
+        else:
+            self._advanced_mode_reset(current_layer)
+    
     def _simple_mode_reset(self, current_layer):
         """Reset colors specifically for Simple mode using EXACT _live_hsv_changed logic"""
         # Get all editable indices to reset
@@ -8359,12 +9006,6 @@ class PaletteTool:
             
             ly.colors[i] = (rr, gg, bb)
             
-            # Update temp cache with the new color
-            if hasattr(self, '_live_temp_palette_cache') and hasattr(self, '_current_live_palette_name'):
-                current_name = getattr(self, '_current_live_palette_name', None)
-                if current_name and current_name in self._live_temp_palette_cache:
-                    self._live_temp_palette_cache[current_name] = ly.colors.copy()
-            
             # Update swatch based on mode
             if self.live_pal_ui_mode == "Simple":
                 # Find the display index for this palette index
@@ -8383,6 +9024,13 @@ class PaletteTool:
                     hex_color = f"#{rr:02x}{gg:02x}{bb:02x}"
                     canvas.delete("all")
                     canvas.create_rectangle(1, 1, 19, 19, fill=hex_color, outline="black", width=1)
+        # Update temp cache with the new colors (copy-on-write snapshot, once per tick)
+        if hasattr(self, '_live_temp_palette_cache') and hasattr(self, '_current_live_palette_name'):
+            current_name = getattr(self, '_current_live_palette_name', None)
+            if current_name and current_name in self._live_temp_palette_cache:
+                self._live_temp_palette_cache[current_name] = ly.colors.copy()
+        self._live_record_history(ly)
+        
         # Reapply selection highlighting after color changes
         if hasattr(self, "_update_selection_ui"):
             self._update_selection_ui()
@@ -8515,6 +9163,7 @@ class PaletteTool:
             
             # Update icon editor button state after switching palette types
             self._update_icon_editor_button_state()
+            self._live_update_history_buttons()
         except Exception:
             pass
         # Save current palette's temporary changes to cache before switching
@@ -8698,6 +9347,7 @@ class PaletteTool:
                     hex_color = f"#{r:02x}{g:02x}{b:02x}"
                     canvas.delete("all")
                     canvas.create_rectangle(1, 1, 19, 19, fill=hex_color, outline="black", width=1)
+        self._live_record_history(ly)
         # Reapply selection highlighting after color changes
         if hasattr(self, "_update_selection_ui"):
             self._update_selection_ui()
@@ -9083,6 +9733,8 @@ class PaletteTool:
                 
                 ly.colors[i] = candidate_color
         
+        self._live_record_history(ly)
+        
         # Update the UI
         self._live_refresh_swatches()
         self._debounced_display_update()
@@ -9141,6 +9793,8 @@ class PaletteTool:
             except Exception as e:
                 print(f"CONSOLE ERROR MSG: Error resetting gradient colors: {e}")
         
+        self._live_record_history(ly)
+        
         # Update the UI
         self._live_refresh_swatches()
         self._debounced_display_update()
@@ -9230,20 +9884,10 @@ class PaletteTool:
             print(f"CONSOLE ERROR MSG: Error loading original palette: {e}")
             return None
     
-    def _is_keyed_color(self, color, index):
+    def _is_keyed_color(self, color, index=None):
         """Check if a color would be a keying color that should be avoided."""
-        r, g, b = color
-        # Check if it matches common keying colors
-        if (r, g, b) == (255, 0, 255):  # Magenta
-            return True
-        if (r, g, b) == (0, 255, 0):    # Green
-            return True
-        # Check if it's very close to keying colors (within 10 units)
-        if abs(r - 255) < 10 and abs(g - 0) < 10 and abs(b - 255) < 10:  # Close to magenta
-            return True
-        if abs(r - 0) < 10 and abs(g - 255) < 10 and abs(b - 0) < 10:    # Close to green
-            return True
-        return False
+        # Magenta, green, or within 10 units of either on every channel
+        return keying.is_near_keying_color(color)
     
     def _find_nearest_non_keyed_color(self, color):
         """Find the nearest color that isn't a keying color."""
@@ -9434,7 +10078,7 @@ class PaletteTool:
         colors = ly.colors
         
         # Validate colors before proceeding
-        if not colors or not isinstance(colors, list):
+        if not colors or not isinstance(colors, (list, PaletteBuffer)):
             messagebox.showerror("Error", "No valid color data found in the selected layer")
             return
         
@@ -9588,27 +10232,138 @@ class PaletteTool:
             messagebox.showerror("Error", "No valid colors found in the selected layer")
             return
         
-        # Create icon handler and export
+        # Create a temporary palette path for naming
+        temp_palette_path = f"temp_{ly.name}.pal"
+        
+        self._save_quick_icon(char_id, fashion_type, current_colors, temp_palette_path)
+    
+    def _save_quick_icon(self, char_id, fashion_type, colors, palette_path, on_saved=None):
+        """Save an icon with IconHandler.save_as_icon and report it (in the export queue if it's enabled).
+        
+        on_saved() runs once the icon is saved, or queued.
+        """
+        from icon_handler import IconHandler
+        
         icon_handler = IconHandler()
         icon_handler.main_window = self
         
-        # Create a temporary palette path for naming
-        temp_palette_path = f"temp_{ly.name}.pal"
+        if getattr(self, 'use_export_queue', False):
+            try:
+                output_path = icon_handler.get_icon_export_path(char_id, fashion_type, palette_path)
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to export icon: {e}")
+                return
+            
+            def task(progress, cancel_event):
+                if not icon_handler.save_as_icon(char_id, fashion_type, colors, palette_path):
+                    raise RuntimeError("Failed to export icon.")
+                return f"Exported icon to {output_path}"
+            if self._queue_export("Icon", [output_path], task) and on_saved:
+                on_saved()
+            return
         
         try:
             success = icon_handler.save_as_icon(
                 char_id,
                 fashion_type,
-                current_colors,
-                temp_palette_path
+                colors,
+                palette_path
             )
             if success:
                 messagebox.showinfo("Success", "Icon exported successfully!")
+                if on_saved:
+                    on_saved()
             else:
                 messagebox.showerror("Error", "Failed to export icon.")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export icon: {e}")
     
+    def _open_batch_icon_dialog(self):
+        """Generate icons for every custom fashion palette in exports/custom_pals/fashion."""
+        import threading
+        from icon_batch import find_palette_files, plan_jobs, run_batch_async, DEFAULT_SOURCE_DIR
+        
+        if getattr(self, '_batch_icon_window', None) and self._batch_icon_window.winfo_exists():
+            self._batch_icon_window.lift()
+            return
+        
+        window = tk.Toplevel(self.master)
+        window.title("Batch Icon Export")
+        window.transient(self.master)
+        window.resizable(False, False)
+        self._batch_icon_window = window
+        
+        pal_paths = find_palette_files(DEFAULT_SOURCE_DIR)
+        status_label = tk.Label(window, text=f"{len(pal_paths)} fashion palettes in exports/custom_pals/fashion",
+                                justify="left")
+        status_label.pack(padx=10, pady=(10, 5), anchor="w")
+        
+        progress_bar = ttk.Progressbar(window, length=300, mode='determinate')
+        progress_bar.pack(padx=10, pady=5)
+        
+        force_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(window, text="Regenerate icons that are already up to date",
+                       variable=force_var).pack(padx=10, anchor="w")
+        
+        button_row = tk.Frame(window)
+        button_row.pack(pady=10)
+        
+        # Shared between the batch thread and the Tk poll below
+        state = {"done": 0, "total": 0, "result": None}
+        cancel_event = threading.Event()
+        
+        def poll():
+            if not window.winfo_exists():
+                return
+            if state["total"]:
+                progress_bar['value'] = state["done"] / state["total"] * 100
+                status_label.config(text=f"Exporting icon {state['done']}/{state['total']}...")
+            if state["result"] is None:
+                window.after(100, poll)
+                return
+            status_label.config(text=state["result"].summary())
+            start_button.config(state="normal")
+            cancel_button.config(state="disabled")
+            for pal_path in state["result"].failed:
+                print(f"CONSOLE ERROR MSG: Failed to export icon for {pal_path}")
+        
+        def progress(done, total):
+            state["done"], state["total"] = done, total
+        
+        def on_done(result):
+            state["result"] = result
+        
+        def start():
+            # Rescan so palettes saved while the dialog was open are included
+            pal_paths = find_palette_files(DEFAULT_SOURCE_DIR)
+            if not pal_paths:
+                messagebox.showinfo("Batch Icon Export", "No fashion palettes found in exports/custom_pals/fashion.")
+                return
+            status_label.config(text="Checking palettes...")
+            window.update_idletasks()
+            jobs, result = plan_jobs(pal_paths, self.categorize_palette, force=force_var.get())
+            state.update(done=0, total=len(jobs), result=None)
+            progress_bar['value'] = 0
+            cancel_event.clear()
+            start_button.config(state="disabled")
+            cancel_button.config(state="normal")
+            run_batch_async(jobs, progress=progress, cancel_event=cancel_event, on_done=on_done, result=result)
+            poll()
+        
+        def close():
+            cancel_event.set()
+            window.destroy()
+        
+        start_button = tk.Button(button_row, text="Start", width=10, command=start)
+        start_button.pack(side="left", padx=5)
+        cancel_button = tk.Button(button_row, text="Cancel", width=10, state="disabled", command=cancel_event.set)
+        cancel_button.pack(side="left", padx=5)
+        tk.Button(button_row, text="Close", width=10, command=close).pack(side="left", padx=5)
+        
+        window.protocol("WM_DELETE_WINDOW", close)
+        window.update_idletasks()
+        self._center_window_on_parent(window, self.master)
+    
     def _quick_export_icon_from_dialog(self, path, ly, dialog):
         """Quick export icon from the Post-Pal Save Menu dialog."""
         import re
@@ -9643,22 +10398,8 @@ class PaletteTool:
                 b = saved_pal_data[i+2]
                 saved_palette.append((r, g, b))
             
-            # Create icon handler and export
-            icon_handler = IconHandler()
-            icon_handler.main_window = self
-            
-            success = icon_handler.save_as_icon(
-                char_id,
-                fashion_type,
-                saved_palette,
-                path
-            )
-            if success:
-                messagebox.showinfo("Success", "Icon exported successfully!")
-                # Close the dialog after successful export
-                dialog.destroy()
-            else:
-                messagebox.showerror("Error", "Failed to export icon.")
+            # Export, then close the dialog
+            self._save_quick_icon(char_id, fashion_type, saved_palette, path, on_saved=dialog.destroy)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export icon: {e}")
     
@@ -9696,21 +10437,8 @@ class PaletteTool:
                 b = saved_pal_data[i+2]
                 saved_palette.append((r, g, b))
             
-            # Create icon handler and export
-            icon_handler = IconHandler()
-            icon_handler.main_window = self
-            
-            success = icon_handler.save_as_icon(
-                char_id,
-                fashion_type,
-                saved_palette,
-                path
-            )
-            if success:
-                messagebox.showinfo("Success", "Icon exported successfully!")
-                # Don't close the dialog - keep it open
-            else:
-                messagebox.showerror("Error", "Failed to export icon.")
+            # Export without closing the dialog
+            self._save_quick_icon(char_id, fashion_type, saved_palette, path)
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export icon: {e}")
     
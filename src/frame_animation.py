@@ -0,0 +1,130 @@
+import os
+from PIL import Image
+
+import keying
+from frame_export import decode_export_frame, indexed_frame_palette, merge_palette
+
+# Animated export of a frame range (GIF, APNG, WebP).
+#
+# A character's frames share one palette, so the merged palette (current layers
+# over the frames' own colors) is built once and every frame keeps its palette
+# indices: frames go to the encoder as paletted images with the same palette and
+# GIF/APNG write them without requantizing. Keyed indices are folded into a single
+# transparent index with a 256-entry lookup table, and frames of different sizes
+# are centered on a common transparent canvas like the single-frame preview.
+
+ANIMATION_FORMATS = {
+    "gif": (".gif", "GIF"),
+    "apng": (".png", "PNG"),
+    "webp": (".webp", "WEBP"),
+}
+ANIMATION_FORMAT_LABELS = {
+    "gif": "GIF",
+    "apng": "APNG",
+    "webp": "WebP",
+}
+
+
+def _transparent_index(masks, used):
+    """Pick the index keyed frames are folded into: a keyed one, else one no frame uses."""
+    for i in range(256):
+        if all(mask[i] for mask in masks):
+            return i
+    for i in range(256):
+        if i not in used:
+            return i
+    return None
+
+
+def build_animation_frames(char_id, template, image_paths, load_frame=None, progress=None, cancel_event=None):
+    """Return (paletted frames on a common canvas, flat shared palette, transparent index).
+
+    Frames whose palette differs from the first frame's are remapped onto it (exact
+    colors by index lookup, anything else quantized). Returns None when cancelled.
+    """
+    decoded = []
+    total = len(image_paths)
+    for done, image_path in enumerate(image_paths, 1):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        if load_frame is not None:
+            original_img = load_frame(image_path)
+            original_palette = indexed_frame_palette(original_img)
+        else:
+            original_img, original_palette = decode_export_frame(image_path)
+        decoded.append((original_img, original_palette))
+        if progress:
+            progress(done, total)
+    if not decoded:
+        return [], [], None
+
+    shared_original = decoded[0][1]
+    shared_palette = merge_palette(template, shared_original)
+    masks = [keying.keyed_index_mask("display", char_id, palette) for _, palette in decoded]
+    used = set()
+    for original_img, _ in decoded:
+        used.update(i for _, i in original_img.getcolors(256) or ())
+    transparent = _transparent_index(masks, used)
+    flat_palette = [c for rgb in shared_palette for c in rgb]
+
+    canvas_size = (max(img.width for img, _ in decoded), max(img.height for img, _ in decoded))
+    frames = []
+    for (original_img, original_palette), mask in zip(decoded, masks):
+        lut = list(range(256))
+        keyed_alpha = None
+        if original_palette != shared_original:
+            merged = merge_palette(template, original_palette)
+            positions = {}
+            for i, color in enumerate(shared_palette):
+                positions.setdefault(color, i)
+            if all(color in positions for color in merged):
+                lut = [positions[color] for color in merged]
+            else:
+                frame = Image.frombytes("P", original_img.size, original_img.tobytes())
+                frame.putpalette([c for rgb in merged for c in rgb])
+                palette_img = Image.new("P", (1, 1))
+                palette_img.putpalette(flat_palette)
+                keyed_alpha = keying.index_keying_alpha(original_img, mask)
+                original_img = frame.convert("RGB").quantize(palette=palette_img, dither=Image.Dither.NONE)
+        if transparent is not None and keyed_alpha is None:
+            lut = [transparent if mask[i] else lut[i] for i in range(256)]
+        indices = Image.frombytes("L", original_img.size, original_img.tobytes()).point(lut)
+        if transparent is not None and keyed_alpha is not None:
+            indices.paste(transparent, mask=keyed_alpha)
+
+        frame = Image.new("P", canvas_size, transparent or 0)
+        frame.putpalette(flat_palette)
+        offset = ((canvas_size[0] - indices.width) // 2, (canvas_size[1] - indices.height) // 2)
+        frame.paste(Image.frombytes("P", indices.size, indices.tobytes()), offset)
+        if transparent is not None:
+            frame.info["transparency"] = transparent
+        frames.append(frame)
+    return frames, flat_palette, transparent
+
+
+def save_animation(frames, output_path, animation_format="gif", delay=100, transparent=None):
+    """Encode paletted frames as an animation; delay is milliseconds per frame."""
+    if animation_format not in ANIMATION_FORMATS:
+        raise ValueError(f"Unknown animation format: {animation_format}")
+    if not frames:
+        raise ValueError("No frames to export")
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    pil_format = ANIMATION_FORMATS[animation_format][1]
+    options = {"save_all": True, "append_images": frames[1:], "duration": delay, "loop": 0}
+    if animation_format == "gif":
+        # Frames already share the palette; optimize would only reorder it
+        options.update(optimize=False, disposal=2)
+        if transparent is not None:
+            options["transparency"] = transparent
+    elif animation_format == "apng":
+        # Every frame covers the whole canvas, so it replaces the previous one
+        options.update(disposal=0, blend=0)
+        if transparent is not None:
+            options["transparency"] = transparent
+    else:
+        # WebP has no palette mode; keep the colors exact
+        frames = [frame.convert("RGBA") for frame in frames]
+        options.update(append_images=frames[1:], lossless=True)
+    frames[0].save(output_path, pil_format, **options)
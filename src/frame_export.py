@@ -0,0 +1,472 @@
+import io
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from PIL import Image
+
+import keying
+from export_archive import ExportArchiveWriter, archive_extension
+
+# "Export all frames" as a background job.
+#
+# Everything a frame needs from PaletteTool is captured up front on the Tk thread:
+# the character and a merged palette template (256 entries, each either a layer
+# color or None for "keep this frame's original color"). Worker processes then
+# decode, recolor, key and encode frames on their own, in chunks so each task
+# carries a few frames. The job keeps track of which frames are written, so a
+# cancelled export can be resumed where it stopped. Output is byte-identical to
+# rendering the frames one by one on the Tk thread.
+#
+# Frames can be written as 32-bit RGBA PNGs, as 8-bit paletted PNGs (keyed indices
+# marked transparent through tRNS) or as 8-bit BMPs carrying the merged palette.
+# Instead of a folder of loose files, a job can stream its frames into a single
+# .zip or .tar archive: workers return the encoded bytes and the job appends them
+# to the archive as they arrive, adding a manifest of the palettes used at the end.
+#
+# Folder exports are incremental: .export_hashes.json in the output folder maps each
+# written file to a hash of its inputs (frame file, merged palette template, format
+# and keying options). A re-export skips files whose hash and size still match and
+# only re-encodes the frames whose inputs changed. 32-bit PNGs only hash the palette
+# entries the frame's pixels use, so tweaking one hair color only re-encodes the
+# frames that show it; 8-bit formats store the whole palette and hash all of it.
+
+PALETTE_SIZE = 256
+CHUNK_SIZE = 8
+EXPORT_HASHES_NAME = ".export_hashes.json"
+# Bump when rendering changes so earlier exports are re-encoded
+EXPORT_HASH_VERSION = 1
+
+# Image export format -> (file extension, PIL format)
+IMAGE_FORMATS = {
+    "png32": (".png", "PNG"),
+    "png8": (".png", "PNG"),
+    "bmp8": (".bmp", "BMP"),
+}
+IMAGE_FORMAT_LABELS = {
+    "png32": "32-bit PNG",
+    "png8": "8-bit PNG",
+    "bmp8": "8-bit BMP",
+}
+
+
+def indexed_frame_palette(indexed_img):
+    """Return the 256-entry palette of an indexed frame, padded with keyed green."""
+    raw_palette = indexed_img.getpalette() or []
+    original_palette = [
+        (raw_palette[j*3], raw_palette[j*3+1], raw_palette[j*3+2])
+        for j in range(min(len(raw_palette)//3, PALETTE_SIZE))
+    ]
+    while len(original_palette) < PALETTE_SIZE:
+        original_palette.append((0, 255, 0))
+    return original_palette
+
+
+def decode_export_frame(image_path):
+    """Return (indexed image, 256-entry original palette) for a frame file."""
+    img = Image.open(image_path)
+    if img.mode == 'P':
+        # Already palette mode - preserve original structure
+        original_img = img.copy()
+        return original_img, indexed_frame_palette(original_img)
+
+    # For non-palette images, convert more carefully to preserve transparency
+    if img.mode in ['RGBA', 'LA', 'PA']:
+        if img.mode == 'RGBA':
+            # Create a new image with transparent background
+            new_img = Image.new('RGBA', img.size, (0, 0, 0, 0))
+            new_img.paste(img, mask=img.split()[-1])
+            img = new_img
+        else:
+            img = img.convert('RGBA')
+
+    if img.mode == 'RGBA':
+        # Keyed green shows through where the frame is transparent
+        background = Image.new('RGB', img.size, (0, 255, 0))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Quantization that preserves keying colors
+    img_palette = img.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+    raw_palette = img_palette.getpalette()
+    if raw_palette:
+        original_palette = [
+            (raw_palette[j*3], raw_palette[j*3+1], raw_palette[j*3+2])
+            for j in range(min(len(raw_palette)//3, PALETTE_SIZE))
+        ]
+        while len(original_palette) < PALETTE_SIZE:
+            original_palette.append((0, 255, 0))  # Fill with green instead of black
+    else:
+        original_palette = [(0, 255, 0)] * PALETTE_SIZE
+    return img_palette, original_palette
+
+
+def merge_palette(template, original_palette):
+    """Fill a merged palette template with a frame's own colors where the layers don't apply."""
+    return [original_palette[i] if color is None else color for i, color in enumerate(template)]
+
+
+def render_export_frame(original_img, original_palette, template, char_id):
+    """Return the RGBA export of one frame: merged palette applied, keyed pixels transparent."""
+    result_palette = merge_palette(template, original_palette)
+    display_img = Image.frombytes("P", original_img.size, original_img.tobytes())
+    display_img.putpalette([c for rgb in result_palette for c in rgb])
+    rgba_img = display_img.convert("RGBA")
+
+    # Pixels whose original palette color is a keying color become transparent
+    # (chr014 only keys pure green/magenta, black never)
+    mask = keying.keyed_index_mask("display", char_id, original_palette)
+    rgba_img.paste((0, 0, 0, 0), mask=keying.index_keying_alpha(original_img, mask))
+    return rgba_img
+
+
+def render_export_indexed(original_img, original_palette, template, char_id):
+    """Return the 8-bit export of one frame: frame indices with the merged palette.
+
+    Indices whose original color is a keying color are listed in info["transparency"]
+    (one alpha byte per index), which PNG writes as a tRNS chunk.
+    """
+    result_palette = merge_palette(template, original_palette)
+    indexed_img = Image.frombytes("P", original_img.size, original_img.tobytes())
+    indexed_img.putpalette([c for rgb in result_palette for c in rgb])
+    mask = keying.keyed_index_mask("display", char_id, original_palette)
+    if any(mask):
+        indexed_img.info["transparency"] = bytes(0 if keyed else 255 for keyed in mask)
+    return indexed_img
+
+
+def save_export_frame(original_img, original_palette, template, char_id, output_path, image_format="png32"):
+    """Render one frame in an IMAGE_FORMATS format and write it to output_path."""
+    if image_format not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown image export format: {image_format}")
+    if image_format == "png32":
+        img = render_export_frame(original_img, original_palette, template, char_id)
+    else:
+        # PNG writes info["transparency"] as tRNS; BMP has no transparency and ignores it
+        img = render_export_indexed(original_img, original_palette, template, char_id)
+    img.save(output_path, IMAGE_FORMATS[image_format][1])
+
+
+def _export_frame_chunk(char_id, template, frames, image_format="png32", to_bytes=False):
+    """Worker entry point: export (position, image path, output path) frames.
+
+    Returns [(position, error, data)]; with to_bytes the encoded file is returned as
+    data instead of being written to output path.
+    """
+    results = []
+    for position, image_path, output_path in frames:
+        try:
+            original_img, original_palette = decode_export_frame(image_path)
+            if to_bytes:
+                buffer = io.BytesIO()
+                save_export_frame(original_img, original_palette, template, char_id, buffer, image_format)
+                results.append((position, None, buffer.getvalue()))
+            else:
+                save_export_frame(original_img, original_palette, template, char_id, output_path, image_format)
+                results.append((position, None, None))
+        except Exception as e:
+            results.append((position, f"{image_path}: {e}", None))
+    return results
+
+
+class FrameExportResult:
+    """Counts and timing of one run of a frame export job."""
+
+    def __init__(self):
+        self.exported = 0
+        self.skipped = 0      # already up to date
+        self.failed = []      # error messages
+        self.cancelled = False
+        self.elapsed = 0.0
+
+    @property
+    def frames_per_second(self):
+        return self.exported / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        text = (f"Exported {self.exported} frames in {self.elapsed:.1f}s "
+                f"({self.frames_per_second:.1f} frames/s)")
+        if self.skipped:
+            text += f", {self.skipped} unchanged"
+        if self.failed:
+            text += f", {len(self.failed)} failed"
+        if self.cancelled:
+            text += " (cancelled)"
+        return text
+
+
+class FrameExportJob:
+    """Frames to export with one palette snapshot; remembers which frames are done.
+
+    With archive_format ("zip" or "tar") the frames go into output_dir + extension,
+    under a folder named after output_dir, instead of into the output_dir folder.
+    manifest is a dict describing the export (palettes used); the job adds the
+    format and frame list to it and stores it in the archive as manifest.json.
+    Folder exports with incremental set skip files that are already up to date.
+    """
+
+    def __init__(self, char_id, template, image_paths, output_dir, image_format="png32",
+                 archive_format=None, compression_level=6, manifest=None, incremental=True):
+        self.char_id = char_id
+        self.template = tuple(template)
+        self.output_dir = output_dir
+        self.image_format = image_format
+        self.archive_format = archive_format
+        self.compression_level = compression_level
+        self.manifest = dict(manifest or {})
+        self.archive_path = None
+        self._archive = None
+        extension = IMAGE_FORMATS[image_format][0]
+        if archive_format:
+            self.archive_path = output_dir + archive_extension(archive_format, compression_level)
+            folder_name = os.path.basename(output_dir)
+        self.frames = []
+        for image_path in image_paths:
+            name = os.path.splitext(os.path.basename(image_path))[0]
+            if archive_format:
+                self.frames.append((image_path, f"{folder_name}/{name}{extension}"))
+            else:
+                self.frames.append((image_path, os.path.join(output_dir, f"{name}{extension}")))
+        self.completed = set()   # positions in self.frames already written
+        self.exported = 0        # frames written over all runs, including resumed ones
+        self.skipped = 0         # frames left alone because they were up to date
+        self.failed = []         # errors over all runs
+        self.incremental = incremental and not archive_format
+        self._keys = None        # position -> input hash, once planned
+        self._hashes = {}        # contents of the output folder's hash file
+
+    # Frames per worker task
+    chunk_size = CHUNK_SIZE
+
+    @property
+    def total(self):
+        return len(self.frames)
+
+    def worker_initializer(self):
+        """(function, args) run once in every worker process before its first chunk, or (None, ())."""
+        return None, ()
+
+    def chunk_call(self, chunk, to_bytes=False):
+        """(function, args) that exports a chunk of remaining() entries and returns [(position, error, data)]."""
+        return _export_frame_chunk, (self.char_id, self.template, chunk, self.image_format, to_bytes)
+
+    @property
+    def destination(self):
+        """The archive file or output folder the frames go to."""
+        return self.archive_path or self.output_dir
+
+    def _open_archive(self):
+        if self._archive is None:
+            os.makedirs(os.path.dirname(self.archive_path) or ".", exist_ok=True)
+            self._archive = ExportArchiveWriter(self.archive_path, self.archive_format, self.compression_level)
+        return self._archive
+
+    def close(self):
+        """Finish the archive (with its manifest). Safe to call more than once."""
+        if self._archive is None or self._archive.closed:
+            return
+        written = set(self._archive.names)
+        manifest = dict(self.manifest)
+        manifest.update({
+            "character": self.char_id,
+            "image_format": self.image_format,
+            "frames": [self.frames[i][1] for i in sorted(self.completed) if self.frames[i][1] in written],
+            "failed": list(self.failed),
+            "complete": self.is_finished() and not self.failed,
+        })
+        self._archive.close(manifest, f"{os.path.basename(self.output_dir)}/manifest.json")
+
+    def remaining(self):
+        return [(i, image_path, output_path) for i, (image_path, output_path) in enumerate(self.frames)
+                if i not in self.completed]
+
+    def template_for(self, position):
+        """Merged palette template the frame at position is rendered with."""
+        return self.template
+
+    def _hashes_path(self):
+        return os.path.join(self.output_dir, EXPORT_HASHES_NAME)
+
+    def skip_unchanged(self):
+        """Hash every frame's inputs and mark frames whose output is up to date as completed.
+
+        Runs once per job; returns the number of frames skipped.
+        """
+        if not self.incremental or self._keys is not None:
+            return 0
+        try:
+            with open(self._hashes_path(), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == EXPORT_HASH_VERSION:
+                self._hashes = data.get("files", {})
+        except (OSError, ValueError):
+            self._hashes = {}
+
+        options = json.dumps({"character": self.char_id, "image_format": self.image_format,
+                              "keying": "display"}, sort_keys=True)
+        frame_digests = {}       # image path -> (file hash, used palette indices or None)
+        template_digests = {}
+        self._keys = {}
+        skipped = 0
+        for position, (image_path, output_path) in enumerate(self.frames):
+            if position in self.completed:
+                continue
+            frame_digest = frame_digests.get(image_path)
+            if frame_digest is None:
+                try:
+                    with open(image_path, "rb") as f:
+                        data = f.read()
+                    used = None
+                    if self.image_format == "png32":
+                        original_img, _ = decode_export_frame(io.BytesIO(data))
+                        used = tuple(sorted(index for _, index in original_img.getcolors(PALETTE_SIZE) or ()))
+                except Exception:
+                    continue  # Let the export report the unreadable frame
+                frame_digest = (hashlib.sha1(data).hexdigest(), used)
+                frame_digests[image_path] = frame_digest
+            template = self.template_for(position)
+            template_key = (id(template), frame_digest[1])
+            template_digest = template_digests.get(template_key)
+            if template_digest is None:
+                entries = template if frame_digest[1] is None else [template[i] for i in frame_digest[1]]
+                template_digest = hashlib.sha1(repr(entries).encode("utf-8")).hexdigest()
+                template_digests[template_key] = template_digest
+            key = hashlib.sha1(f"{frame_digest[0]}|{template_digest}|{options}".encode("utf-8")).hexdigest()
+            self._keys[position] = key
+
+            recorded = self._hashes.get(os.path.relpath(output_path, self.output_dir))
+            if recorded and recorded.get("key") == key:
+                try:
+                    if os.path.getsize(output_path) == recorded.get("size"):
+                        self.completed.add(position)
+                        skipped += 1
+                except OSError:
+                    pass
+        self.skipped += skipped
+        return skipped
+
+    def record_written(self, position):
+        """Remember the input hash of a frame that was just written."""
+        if not self.incremental or not self._keys or position not in self._keys:
+            return
+        output_path = self.frames[position][1]
+        try:
+            size = os.path.getsize(output_path)
+        except OSError:
+            return
+        self._hashes[os.path.relpath(output_path, self.output_dir)] = {"key": self._keys[position], "size": size}
+
+    def save_hashes(self):
+        """Write the output folder's hash file (also after a cancelled run)."""
+        if not self.incremental or self._keys is None:
+            return
+        tmp_path = f"{self._hashes_path()}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": EXPORT_HASH_VERSION, "files": self._hashes}, f)
+            os.replace(tmp_path, self._hashes_path())
+        except OSError as e:
+            print(f"CONSOLE ERROR MSG: Could not save export hashes: {e}")
+
+    def is_finished(self):
+        return len(self.completed) == len(self.frames)
+
+
+def run_export(job, workers=None, progress=None, cancel_event=None, result=None):
+    """Export the job's remaining frames on a process pool.
+
+    progress(done, total) is called after every finished chunk with the job's overall
+    counts. Setting cancel_event stops the export after the chunks already running;
+    calling run_export again with the same job resumes it.
+    """
+    result = result if result is not None else FrameExportResult()
+    start = time.perf_counter()
+    to_bytes = bool(job.archive_format)
+    archive = job._open_archive() if to_bytes else None
+    if not to_bytes:
+        os.makedirs(job.output_dir, exist_ok=True)
+        result.skipped = job.skip_unchanged()
+        if result.skipped and progress:
+            progress(len(job.completed), job.total)
+    frames = job.remaining()
+
+    chunk_size = job.chunk_size
+    chunks = [frames[i:i + chunk_size] for i in range(0, len(frames), chunk_size)]
+    initializer, initargs = job.worker_initializer()
+
+    def finished(chunk_results):
+        for position, error, data in chunk_results:
+            if error is None and archive is not None:
+                try:
+                    archive.write(job.frames[position][1], data)
+                except Exception as e:
+                    error = f"{job.frames[position][0]}: {e}"
+            # Failed frames count as done so a resume doesn't retry them forever
+            job.completed.add(position)
+            if error is None:
+                result.exported += 1
+                job.exported += 1
+                job.record_written(position)
+            else:
+                result.failed.append(error)
+                job.failed.append(error)
+        if progress:
+            progress(len(job.completed), job.total)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(chunks) <= 1:
+        if initializer is not None and chunks:
+            initializer(*initargs)
+        for chunk in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                break
+            function, args = job.chunk_call(chunk, to_bytes)
+            finished(function(*args))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                 initializer=initializer, initargs=initargs) as pool:
+            futures = {}
+            for chunk in chunks:
+                function, args = job.chunk_call(chunk, to_bytes)
+                futures[pool.submit(function, *args)] = chunk
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    chunk_results = future.result()
+                except Exception as e:
+                    chunk_results = [(entry[0], f"{entry[1]}: {e}", None) for entry in futures[future]]
+                finished(chunk_results)
+                if cancel_event is not None and cancel_event.is_set() and not result.cancelled:
+                    result.cancelled = True
+                    for pending in futures:
+                        pending.cancel()
+
+    if not result.cancelled and cancel_event is not None and cancel_event.is_set() and not job.is_finished():
+        result.cancelled = True
+    if job.is_finished():
+        job.close()
+    job.save_hashes()
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run_export_async(job, workers=None, progress=None, cancel_event=None, on_done=None):
+    """Run run_export on a background thread; on_done(result) is called from that thread."""
+    def target():
+        export_result = FrameExportResult()
+        try:
+            run_export(job, workers, progress, cancel_event, export_result)
+        except Exception as e:
+            export_result.failed.append(str(e))
+        if on_done:
+            on_done(export_result)
+
+    thread = threading.Thread(target=target, name="FrameExport", daemon=True)
+    thread.start()
+    return thread
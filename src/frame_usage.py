@@ -0,0 +1,111 @@
+import os
+import json
+import threading
+from PIL import Image
+
+# Per-frame palette-index usage index.
+#
+# For every sprite frame we store a 256-bit bitmap of the palette indices that occur
+# in it (bit i set = index i is used). It is computed from one Image.histogram()
+# call per frame, persisted to JSON next to settings.json and invalidated by the
+# frame file's mtime and size, so each character is only scanned once.
+#
+# Renders use it to skip frames an edit cannot affect.
+
+USAGE_INDEX_VERSION = 1
+
+
+def usage_mask_from_image(indexed_img):
+    """Return the usage bitmap of an indexed (mode "P") image."""
+    if indexed_img.mode != "P":
+        indexed_img = indexed_img.convert("P")
+    mask = 0
+    for i, count in enumerate(indexed_img.histogram()[:256]):
+        if count:
+            mask |= 1 << i
+    return mask
+
+
+class FrameUsageIndex:
+    """Persisted map of frame path -> palette-index usage bitmap."""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self._entries = {}  # normalized path -> (mtime, size, mask)
+        self._dirty = False
+        self._lock = threading.RLock()  # build_async scans from a background thread
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                data = json.load(f)
+            if data.get("version") != USAGE_INDEX_VERSION:
+                return
+            for path, (mtime, size, mask_hex) in data.get("frames", {}).items():
+                self._entries[path] = (mtime, size, int(mask_hex, 16))
+        except (FileNotFoundError, json.JSONDecodeError, ValueError, TypeError):
+            # Missing or corrupt cache just means frames get rescanned
+            self._entries = {}
+
+    def save(self):
+        """Write the index to disk if anything changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": USAGE_INDEX_VERSION,
+                "frames": {path: [mtime, size, format(mask, "064x")]
+                           for path, (mtime, size, mask) in self._entries.items()},
+            }
+            self._dirty = False
+            try:
+                tmp_path = self.cache_path + ".tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.cache_path)
+            except Exception as e:
+                print(f"CONSOLE ERROR MSG: Error saving frame usage index: {e}")
+
+    @staticmethod
+    def _key(image_path):
+        return os.path.normcase(os.path.abspath(image_path))
+
+    def get_mask(self, image_path, indexed_img=None):
+        """Return the usage bitmap of a frame, rescanning it only if the file changed.
+
+        If the caller already has the decoded indexed image it can pass it in to avoid
+        reopening the file.
+        """
+        key = self._key(image_path)
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return 0
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == st.st_mtime and entry[1] == st.st_size:
+            return entry[2]
+
+        if indexed_img is not None:
+            mask = usage_mask_from_image(indexed_img)
+        else:
+            with Image.open(image_path) as img:
+                mask = usage_mask_from_image(img)
+        with self._lock:
+            self._entries[key] = (st.st_mtime, st.st_size, mask)
+            self._dirty = True
+        return mask
+
+    def build(self, image_paths):
+        """Make sure every frame in a character's frame list is indexed, then persist."""
+        masks = [self.get_mask(path) for path in image_paths]
+        self.save()
+        return masks
+
+    def build_async(self, image_paths):
+        """Index a character's frames on a background thread (one histogram per frame)."""
+        thread = threading.Thread(target=self.build, args=(list(image_paths),),
+                                  name="FrameUsageIndex", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,134 @@
+import os
+import time
+import threading
+from PIL import Image
+
+# Shared cache for the icon editor's on-disk assets.
+#
+# Icon BMPs, reference/vanilla .pal files, directory listings and file existence
+# checks are read once and kept in memory. Every entry remembers the file's mtime
+# and size; it is re-validated with a single os.stat() at most once every
+# `revalidate_seconds`, so switching palettes back and forth in the icon editor
+# dropdown touches neither the file contents nor the file system metadata.
+
+
+class IconAssetCache:
+    """mtime-validated cache of decoded icon BMPs, parsed PAL files and directory listings."""
+
+    def __init__(self, revalidate_seconds=0.5):
+        self.revalidate_seconds = revalidate_seconds
+        self._lock = threading.RLock()
+        self._stats = {}     # path -> ((mtime, size) or None, time of last stat)
+        self._images = {}    # path -> ((mtime, size), decoded image)
+        self._palettes = {}  # path -> ((mtime, size), tuple of (r, g, b))
+        self._listings = {}  # dir -> ((mtime, size), tuple of file names)
+
+    def _signature(self, path):
+        """Return (mtime, size) of a path, or None if it doesn't exist; stats are throttled."""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._stats.get(path)
+            if cached is not None and now - cached[1] < self.revalidate_seconds:
+                return cached[0]
+        try:
+            st = os.stat(path)
+            signature = (st.st_mtime, st.st_size)
+        except OSError:
+            signature = None
+        with self._lock:
+            self._stats[path] = (signature, now)
+        return signature
+
+    def _lookup(self, store, path):
+        """Return (signature, cached value or None) for a path."""
+        signature = self._signature(path)
+        if signature is None:
+            return None, None
+        with self._lock:
+            entry = store.get(path)
+        if entry is not None and entry[0] == signature:
+            return signature, entry[1]
+        return signature, None
+
+    def exists(self, path):
+        return bool(path) and self._signature(path) is not None
+
+    def get_image(self, path):
+        """Return a private copy of the decoded image at path, or None if it can't be read."""
+        signature, img = self._lookup(self._images, path)
+        if signature is None:
+            return None
+        if img is None:
+            try:
+                with Image.open(path) as f:
+                    f.load()
+                    img = f.copy()
+            except Exception as e:
+                print(f"CONSOLE ERROR MSG: Error loading icon image {path}: {e}")
+                return None
+            with self._lock:
+                self._images[path] = (signature, img)
+        # Callers are free to modify what they get back
+        return img.copy()
+
+    def get_palette(self, path):
+        """Return a .pal file as a new list of (r, g, b) tuples, or None if it can't be read."""
+        colors = self.get_palette_data(path)
+        return list(colors) if colors is not None else None
+
+    def get_palette_data(self, path):
+        """Return the cached, shared tuple of (r, g, b) for a .pal file (do not modify), or None.
+
+        The same tuple object is returned until the file changes, so callers can use
+        identity to tell whether data derived from it is still valid.
+        """
+        signature, colors = self._lookup(self._palettes, path)
+        if signature is None:
+            return None
+        if colors is None:
+            try:
+                with open(path, 'rb') as f:
+                    pal_data = f.read()
+            except OSError as e:
+                print(f"CONSOLE ERROR MSG: Error loading palette {path}: {e}")
+                return None
+            colors = tuple((pal_data[i], pal_data[i + 1], pal_data[i + 2])
+                           for i in range(0, len(pal_data) - 2, 3))
+            with self._lock:
+                self._palettes[path] = (signature, colors)
+        return colors
+
+    def listdir(self, directory):
+        """Return the file names in a directory (empty if missing), re-listed when it changes."""
+        return list(self.listdir_data(directory))
+
+    def listdir_data(self, directory):
+        """Return the cached, shared tuple of file names in a directory (empty if missing).
+
+        The same tuple object is returned until the directory changes.
+        """
+        signature, names = self._lookup(self._listings, directory)
+        if signature is None:
+            return ()
+        if names is None:
+            try:
+                names = tuple(os.listdir(directory))
+            except OSError:
+                return ()
+            with self._lock:
+                self._listings[directory] = (signature, names)
+        return names
+
+    def invalidate(self, path=None):
+        """Forget one path (e.g. after writing it) or everything."""
+        with self._lock:
+            if path is None:
+                self._stats.clear()
+                self._images.clear()
+                self._palettes.clear()
+                self._listings.clear()
+                return
+            for store in (self._stats, self._images, self._palettes, self._listings):
+                store.pop(path, None)
+            # The containing directory's listing may have changed too
+            self._stats.pop(os.path.dirname(path), None)
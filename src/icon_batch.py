@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Batch icon generation for a whole custom palette library.
+
+Every chr###_w##.pal in exports/custom_pals/fashion gets its icon written to
+exports/icons/<palette name>.bmp, exactly like the Quick Export button does for a
+single palette. Icons are rendered on a process pool; jobs are grouped by
+character and fashion type so each worker reuses its cached icon BMP and
+reference PAL. Icons newer than their palette and icon assets are skipped.
+
+Headless usage (from the repository root):
+    python src/icon_batch.py [--force] [--workers N] [--char chr001]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.environ.get("FASHION_PREVIEWER_ROOT", os.path.dirname(SCRIPT_DIR))
+DEFAULT_SOURCE_DIR = os.path.join(ROOT_DIR, "exports", "custom_pals", "fashion")
+DEFAULT_EXPORT_DIR = os.path.join(ROOT_DIR, "exports", "icons")
+
+FASHION_PAL_PATTERN = re.compile(r'^chr(\d{3})_w\d+\.pal$')
+
+
+class IconBatchJob:
+    """One palette to turn into an icon."""
+
+    __slots__ = ("pal_path", "char_id", "fashion_type", "output_path")
+
+    def __init__(self, pal_path, char_id, fashion_type, output_path):
+        self.pal_path = pal_path
+        self.char_id = char_id
+        self.fashion_type = fashion_type
+        self.output_path = output_path
+
+
+class IconBatchResult:
+    """Counts and timing of a finished (or cancelled) batch."""
+
+    def __init__(self):
+        self.generated = 0
+        self.failed = []      # palette paths that could not be exported
+        self.skipped = 0      # already up to date
+        self.unknown = 0      # fashion type could not be determined
+        self.cancelled = False
+        self.elapsed = 0.0
+
+    @property
+    def icons_per_second(self):
+        return self.generated / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        text = (f"Generated {self.generated} icons in {self.elapsed:.1f}s "
+                f"({self.icons_per_second:.1f} icons/s), {self.skipped} up to date")
+        if self.unknown:
+            text += f", {self.unknown} with unknown fashion type"
+        if self.failed:
+            text += f", {len(self.failed)} failed"
+        if self.cancelled:
+            text += " (cancelled)"
+        return text
+
+
+def find_palette_files(source_dir=DEFAULT_SOURCE_DIR, char_filter=None):
+    """Return the sorted fashion palette paths in source_dir, optionally for one character."""
+    if not os.path.isdir(source_dir):
+        return []
+    paths = []
+    for filename in sorted(os.listdir(source_dir)):
+        match = FASHION_PAL_PATTERN.match(filename.lower())
+        if not match:
+            continue
+        if char_filter and f"chr{match.group(1)}" != char_filter:
+            continue
+        paths.append(os.path.join(source_dir, filename))
+    return paths
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def plan_jobs(pal_paths, classify, export_dir=DEFAULT_EXPORT_DIR, force=False, result=None):
+    """Turn palette paths into jobs, skipping palettes whose icon is already up to date.
+
+    classify(filename) must return the palette's fashion type (PaletteTool.categorize_palette).
+    """
+    from icon_handler import IconHandler
+
+    handler = IconHandler()
+    result = result if result is not None else IconBatchResult()
+    jobs = []
+    for pal_path in pal_paths:
+        filename = os.path.basename(pal_path)
+        char_id = f"chr{FASHION_PAL_PATTERN.match(filename.lower()).group(1)}"
+        fashion_type = classify(filename)
+        if not fashion_type or not fashion_type.startswith("fashion_"):
+            result.unknown += 1
+            continue
+
+        # Same name save_as_icon uses when given a palette path
+        output_path = os.path.join(export_dir, os.path.splitext(filename)[0] + ".bmp")
+        if not force:
+            output_mtime = _mtime(output_path)
+            if output_mtime is not None:
+                item_name = handler._get_fashion_name(char_id, fashion_type)
+                sources = (pal_path,) + handler._get_icon_paths(char_id, item_name)
+                source_mtimes = [m for m in map(_mtime, sources) if m is not None]
+                if source_mtimes and output_mtime >= max(source_mtimes):
+                    result.skipped += 1
+                    continue
+
+        jobs.append(IconBatchJob(pal_path, char_id, fashion_type, output_path))
+
+    # Keep jobs for the same icon together so workers hit their asset cache
+    jobs.sort(key=lambda job: (job.char_id, job.fashion_type, job.pal_path))
+    return jobs, result
+
+
+def _export_icon_job(pal_path, char_id, fashion_type):
+    """Worker entry point: export one icon; returns (pal_path, success)."""
+    from icon_handler import IconHandler
+
+    handler = IconHandler()
+    colors = handler._assets.get_palette(pal_path)
+    if not colors:
+        return pal_path, False
+    return pal_path, handler.save_as_icon(char_id, fashion_type, colors, pal_path)
+
+
+def run_batch(jobs, workers=None, progress=None, cancel_event=None, result=None):
+    """Export all jobs on a process pool.
+
+    progress(done, total) is called after every finished icon (from the calling
+    thread). Setting cancel_event stops the batch after the icons already running.
+    """
+    result = result if result is not None else IconBatchResult()
+    total = len(jobs)
+    start = time.perf_counter()
+
+    def finished(pal_path, success, done):
+        if success:
+            result.generated += 1
+        else:
+            result.failed.append(pal_path)
+        if progress:
+            progress(done, total)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or total <= 1:
+        for done, job in enumerate(jobs, 1):
+            if cancel_event is not None and cancel_event.is_set():
+                result.cancelled = True
+                break
+            try:
+                pal_path, success = _export_icon_job(job.pal_path, job.char_id, job.fashion_type)
+            except Exception as e:
+                print(f"CONSOLE ERROR MSG: Icon export failed for {job.pal_path}: {e}")
+                pal_path, success = job.pal_path, False
+            finished(pal_path, success, done)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, total)) as pool:
+            futures = {pool.submit(_export_icon_job, job.pal_path, job.char_id, job.fashion_type): job
+                       for job in jobs}
+            done = 0
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                done += 1
+                try:
+                    pal_path, success = future.result()
+                except Exception as e:
+                    print(f"CONSOLE ERROR MSG: Icon export failed for {futures[future].pal_path}: {e}")
+                    pal_path, success = futures[future].pal_path, False
+                finished(pal_path, success, done)
+                if cancel_event is not None and cancel_event.is_set() and not result.cancelled:
+                    result.cancelled = True
+                    for pending in futures:
+                        pending.cancel()
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run_batch_async(jobs, workers=None, progress=None, cancel_event=None, on_done=None, result=None):
+    """Run run_batch on a background thread; on_done(result) is called from that thread."""
+    def target():
+        batch_result = run_batch(jobs, workers, progress, cancel_event, result)
+        if on_done:
+            on_done(batch_result)
+
+    thread = threading.Thread(target=target, name="IconBatch", daemon=True)
+    thread.start()
+    return thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate icons for every custom fashion palette.")
+    parser.add_argument("--char", default=None, help="only palettes for this character, e.g. chr001")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="regenerate icons that are already up to date")
+    args = parser.parse_args(argv)
+
+    # Fashion type detection lives on PaletteTool; it only needs the palette files, not a window
+    from fashionpreviewer import PaletteTool
+    classifier = PaletteTool.__new__(PaletteTool)
+    classifier.root_dir = ROOT_DIR
+
+    # Palette type detection resolves vanilla palettes relative to src/
+    os.chdir(SCRIPT_DIR)
+
+    pal_paths = find_palette_files(DEFAULT_SOURCE_DIR, args.char)
+    if not pal_paths:
+        print(f"No fashion palettes found in {DEFAULT_SOURCE_DIR}")
+        return 0
+
+    def classify(filename):
+        return classifier.categorize_palette(filename)
+
+    jobs, result = plan_jobs(pal_paths, classify, force=args.force)
+    print(f"Found {len(pal_paths)} palettes, {len(jobs)} icons to generate")
+
+    def progress(done, total):
+        print(f"\r{done}/{total}", end="", flush=True)
+
+    run_batch(jobs, args.workers, progress if jobs else None, result=result)
+    if jobs:
+        print()
+    for pal_path in result.failed:
+        print(f"CONSOLE ERROR MSG: Failed to export icon for {pal_path}")
+    print(result.summary())
+    return 1 if result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,6 +4,13 @@ from tkinter import ttk, messagebox, filedialog
 from typing import List, Tuple
 from PIL import Image, ImageTk
 from palette_ranges import CHARACTER_RANGES
+from palette_buffer import PaletteBuffer
+from preview_hitmap import IndexMap, PreviewHitMap
+from icon_assets import IconAssetCache
+from palette_index import PaletteIndex
+from icon_matching import collect_candidates, get_match_table
+from icon_writer import IconWriteQueue, write_image_atomic
+import keying
 import time
 
 # Character number mapping including alternate IDs
@@ -41,7 +48,13 @@ CHARACTER_MAPPING = {
 }
 
 class IndexTranslator:
-    """Handles translation between original palette indexes and icon palette indexes."""
+    """Handles translation between original palette indexes and icon palette indexes.
+    
+    The ranges in CHARACTER_RANGES are mapped consecutively onto icon indexes starting at 1,
+    so the mapping is precomputed once into dense 256-entry forward and reverse tables per
+    (character, fashion type). Single translations are a table lookup, and whole index
+    buffers can be translated in one bytes.translate() call.
+    """
     
     def __init__(self):
         # Original palette ranges from fashionpreviewer.py
@@ -54,6 +67,47 @@ class IndexTranslator:
             "dummy_index": 0,  # First index is always dummy/keying
             "color_start": 1,  # Actual colors start at index 1
         }
+        
+        # (char_num, fashion_type) -> (forward table, reverse table), both bytes of length 256
+        self._tables = {}
+        # (char_num, fashion_type) -> every original index covered by its ranges, in range order
+        self._range_indices = {}
+        for char_num, fashion_types in self.original_ranges.items():
+            for fashion_type, ranges in fashion_types.items():
+                self._tables[(char_num, fashion_type)] = self._build_tables(ranges)
+                self._range_indices[(char_num, fashion_type)] = tuple(idx for r in ranges for idx in r)
+        
+        # Unknown character/fashion type: everything maps to the dummy index
+        self._empty_tables = self._build_tables([])
+    
+    def _build_tables(self, ranges):
+        """Precompute forward (original -> icon) and reverse (icon -> original) tables."""
+        dummy = self.icon_structure["dummy_index"]
+        forward = bytearray([dummy] * 256)
+        reverse = bytearray(256)  # Unmapped icon indexes go back to original index 0
+        assigned = [False] * 256
+        
+        # Map ranges consecutively starting from index 1
+        current_icon_index = self.icon_structure["color_start"]
+        for r in ranges:
+            for original_index in r:
+                icon_index = current_icon_index + (original_index - r.start)
+                # The first range containing an index wins, like the old range walk
+                if 0 <= original_index < 256 and not assigned[original_index]:
+                    assigned[original_index] = True
+                    forward[original_index] = icon_index if icon_index < 256 else dummy
+                if 0 < icon_index < 256:
+                    reverse[icon_index] = original_index
+            current_icon_index += len(r)
+        return bytes(forward), bytes(reverse)
+    
+    def get_tables(self, char_num: str, fashion_type: str) -> Tuple[bytes, bytes]:
+        """Return the (forward, reverse) 256-byte translation tables for a character/fashion type."""
+        return self._tables.get((char_num, fashion_type), self._empty_tables)
+    
+    def get_range_indices(self, char_num: str, fashion_type: str) -> Tuple[int, ...]:
+        """Return every original palette index in a character/fashion type's ranges."""
+        return self._range_indices.get((char_num, fashion_type), ())
     
     def translate_to_icon_index(self, original_index: int, char_num: str, fashion_type: str) -> int:
         """
@@ -67,23 +121,9 @@ class IndexTranslator:
         Returns:
             Corresponding index in the icon palette, or 0 if it's a dummy/keying index
         """
-        # If it's not in any of the valid ranges, it's a dummy/keying index
-        ranges = self.original_ranges.get(char_num, {}).get(fashion_type, [])
-        
-        # Map ranges consecutively starting from index 1
-        current_icon_index = self.icon_structure["color_start"]
-        
-        for r in ranges:
-            if original_index in r:
-                # Calculate position within this specific range
-                relative_pos = original_index - r.start
-                return current_icon_index + relative_pos
-            else:
-                # Move to the next range's starting position
-                current_icon_index += len(r)
-        
-        # Return dummy index for any index not in the valid ranges
-        return self.icon_structure["dummy_index"]
+        if not 0 <= original_index < 256:
+            return self.icon_structure["dummy_index"]
+        return self.get_tables(char_num, fashion_type)[0][original_index]
     
     def translate_from_icon_index(self, icon_index: int, char_num: str, fashion_type: str) -> int:
         """
@@ -97,29 +137,21 @@ class IndexTranslator:
         Returns:
             Corresponding index in the original palette
         """
-        # If it's the dummy index, return the first dummy index from original
-        if icon_index == self.icon_structure["dummy_index"]:
+        if not 0 <= icon_index < 256:
             return 0
-            
-        # Get the valid ranges for this character/fashion type
-        ranges = self.original_ranges.get(char_num, {}).get(fashion_type, [])
-        if not ranges:
-            return 0
-            
-        # Calculate which range this index maps to
-        relative_pos = icon_index - self.icon_structure["color_start"]
-        
-        # Find the appropriate range and map back to original index
-        current_pos = 0
-        for r in ranges:
-            range_size = len(r)
-            if relative_pos < current_pos + range_size:
-                # Found the right range, calculate original index
-                return r.start + (relative_pos - current_pos)
-            current_pos += range_size
-        
-        # If we get here, it's out of range, return dummy index
-        return 0
+        return self.get_tables(char_num, fashion_type)[1][icon_index]
+    
+    def translate_indices_to_icon(self, original_indices: bytes, char_num: str, fashion_type: str) -> bytes:
+        """Translate a whole buffer of original indexes (e.g. Image.tobytes()) in one pass."""
+        return bytes(original_indices).translate(self.get_tables(char_num, fashion_type)[0])
+    
+    def translate_indices_from_icon(self, icon_indices: bytes, char_num: str, fashion_type: str) -> bytes:
+        """Translate a whole buffer of icon indexes back to original indexes in one pass."""
+        return bytes(icon_indices).translate(self.get_tables(char_num, fashion_type)[1])
+
+
+# Shared translator; its tables are built once at import
+INDEX_TRANSLATOR = IndexTranslator()
 
 
 class IconHandler:
@@ -128,6 +160,18 @@ class IconHandler:
     # Class variable to track the single instance of IconPaletteEditor
     _icon_editor_instance = None
     
+    # Decoded icon BMPs / PALs shared by every IconHandler and icon editor
+    _assets = IconAssetCache()
+    
+    # Dropdown entries and palette directory index for the icon editor
+    _palette_index = PaletteIndex(_assets)
+    
+    # (pal_path, vanilla_path, char_num, fashion_type) -> (pal data, vanilla data, adjustable indices)
+    _slider_masks = {}
+    
+    # Background icon writer shared by every icon editor (created on first use)
+    _write_queue = None
+    
     # Get root directory for relative paths
     root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     
@@ -643,7 +687,7 @@ class IconHandler:
         colors = ly.colors
         
         # Validate colors before proceeding
-        if not colors or not isinstance(colors, list):
+        if not colors or not isinstance(colors, (list, PaletteBuffer)):
             messagebox.showerror("Error", "No valid color data found in the selected layer")
             return
         
@@ -738,7 +782,7 @@ class IconHandler:
             
             
             # If both files exist in this folder, use these paths
-            if os.path.exists(bmp_path) and os.path.exists(pal_path):
+            if self._assets.exists(bmp_path) and self._assets.exists(pal_path):
                 return bmp_path, pal_path
         
         # If no matching files found in any folder, return paths for the primary folder
@@ -780,7 +824,7 @@ class IconHandler:
             char_icon_dir = os.path.join(self.icons_dir, folder)
             pal_path = os.path.join(char_icon_dir, "PAL", f"{base_bmp_name}.pal")
             
-            if os.path.exists(pal_path):
+            if self._assets.exists(pal_path):
                 return pal_path
         
         return ""
@@ -800,90 +844,69 @@ class IconHandler:
             list: Adjusted PAL folder palette colors
         """
         try:
-            # Load the PAL folder palette
-            pal_colors = []
-            with open(pal_path, 'rb') as f:
-                pal_data = f.read()
-                
-                for i in range(0, len(pal_data), 3):
-                    if i + 2 >= len(pal_data):
-                        break
-                    r = pal_data[i]
-                    g = pal_data[i+1]
-                    b = pal_data[i+2]
-                    pal_colors.append((r, g, b))
-            
-            # Get the valid ranges for this fashion type
-            char_num = char_id[3:] if char_id.startswith('chr') else char_id
-            translator = IndexTranslator()
-            ranges = translator.original_ranges.get(char_num, {}).get(fashion_type, [])
+            # Load the PAL folder palette (shared cached data, never modified here)
+            pal_colors = self._assets.get_palette_data(pal_path)
+            if pal_colors is None:
+                return []
             
             # Load the original vanilla palette to compare changes
             vanilla_pal_name = f"{char_id}_{fashion_type.replace('fashion_', 'w')}.pal"
             script_dir = os.path.dirname(os.path.abspath(__file__))
             vanilla_pal_path = os.path.join(script_dir, "nonremovable_assets", "vanilla_pals", "fashion", vanilla_pal_name)
+            vanilla_colors = self._assets.get_palette_data(vanilla_pal_path) or ()
             
-            vanilla_colors = []
-            if os.path.exists(vanilla_pal_path):
-                with open(vanilla_pal_path, 'rb') as f:
-                    vanilla_data = f.read()
-                    
-                    for i in range(0, len(vanilla_data), 3):
-                        if i + 2 >= len(vanilla_data):
-                            break
-                        r = vanilla_data[i]
-                        g = vanilla_data[i+1]
-                        b = vanilla_data[i+2]
-                        vanilla_colors.append((r, g, b))
-            
-            # Calculate the adjustment ratios from vanilla to custom palette
-            adjusted_pal_colors = pal_colors.copy()
-            
-            # Apply adjustments to valid range colors, but skip magenta keying colors
-            for r in ranges:
-                for idx in range(r.start, min(r.stop, len(pal_colors), len(vanilla_colors), len(custom_palette))):
-                    pal_color = pal_colors[idx] if idx < len(pal_colors) else (0, 0, 0)
-                    vanilla_color = vanilla_colors[idx] if idx < len(vanilla_colors) else (0, 0, 0)
-                    custom_color = custom_palette[idx] if idx < len(custom_palette) else (0, 0, 0)
-                    
-                    # Skip magenta keying colors
-                    if pal_color == (255, 0, 255):
-                        continue
-                        
-                    # Calculate adjustment ratios
-                    if vanilla_color != (0, 0, 0):
-                        r_ratio = custom_color[0] / max(1, vanilla_color[0])
-                        g_ratio = custom_color[1] / max(1, vanilla_color[1])
-                        b_ratio = custom_color[2] / max(1, vanilla_color[2])
-                        
-                        # Apply ratios to PAL color
-                        new_r = min(255, max(0, int(pal_color[0] * r_ratio)))
-                        new_g = min(255, max(0, int(pal_color[1] * g_ratio)))
-                        new_b = min(255, max(0, int(pal_color[2] * b_ratio)))
-                        
-                        adjusted_pal_colors[idx] = (new_r, new_g, new_b)
+            # Range indices where the PAL color isn't magenta and the vanilla color isn't black;
+            # this only depends on the two palette files, so it is computed once per file version
+            char_num = char_id[3:] if char_id.startswith('chr') else char_id
+            mask_key = (pal_path, vanilla_pal_path, char_num, fashion_type)
+            cached = self._slider_masks.get(mask_key)
+            if cached is not None and cached[0] is pal_colors and cached[1] is vanilla_colors:
+                indices = cached[2]
+            else:
+                limit = min(len(pal_colors), len(vanilla_colors))
+                indices = tuple(idx for idx in INDEX_TRANSLATOR.get_range_indices(char_num, fashion_type)
+                                if idx < limit and pal_colors[idx] != (255, 0, 255)
+                                and vanilla_colors[idx] != (0, 0, 0))
+                self._slider_masks[mask_key] = (pal_colors, vanilla_colors, indices)
+            
+            # Transfer the vanilla -> custom per-channel ratios onto the PAL colors in one pass
+            custom_len = len(custom_palette)
+            adjusted_pal_colors = list(pal_colors)
+            for idx in indices:
+                if idx >= custom_len:
+                    continue
+                pal_color, vanilla_color, custom_color = pal_colors[idx], vanilla_colors[idx], custom_palette[idx]
+                adjusted_pal_colors[idx] = (
+                    min(255, max(0, int(pal_color[0] * (custom_color[0] / max(1, vanilla_color[0]))))),
+                    min(255, max(0, int(pal_color[1] * (custom_color[1] / max(1, vanilla_color[1]))))),
+                    min(255, max(0, int(pal_color[2] * (custom_color[2] / max(1, vanilla_color[2]))))),
+                )
             
             return adjusted_pal_colors
             
         except Exception as e:
             # Return the PAL colors as-is if adjustment fails
-            try:
-                pal_colors = []
-                with open(pal_path, 'rb') as f:
-                    pal_data = f.read()
-                    
-                    for i in range(0, len(pal_data), 3):
-                        if i + 2 >= len(pal_data):
-                            break
-                        r = pal_data[i]
-                        g = pal_data[i+1]
-                        b = pal_data[i+2]
-                        pal_colors.append((r, g, b))
-                
-                return pal_colors
-            except:
-                return []
+            return self._assets.get_palette(pal_path) or []
 
+    @classmethod
+    def get_write_queue(cls, master=None):
+        """Return the shared background icon writer, creating it on first use."""
+        if cls._write_queue is None:
+            cls._write_queue = IconWriteQueue(master)
+        elif cls._write_queue.master is None and master is not None:
+            cls._write_queue.master = master
+        return cls._write_queue
+    
+    def get_icon_export_path(self, char_id: str, fashion_type: str, palette_path: str = None) -> str:
+        """Return where save_as_icon writes the icon for a character/fashion type/palette."""
+        export_dir = os.path.join(self.root_dir, "exports", "icons")
+        if palette_path:
+            icon_name = os.path.splitext(os.path.basename(palette_path))[0] + ".bmp"
+        else:
+            base_bmp_name = self._find_base_bmp_name(char_id, fashion_type)
+            icon_name = f"{char_id}_{fashion_type}_{base_bmp_name}.bmp"
+        return os.path.join(export_dir, icon_name)
+    
     def save_as_icon(self, char_id: str, fashion_type: str, custom_palette: list, palette_path: str = None) -> bool:
         """
         Save the current item as an icon with the custom palette applied.
@@ -899,6 +922,18 @@ class IconHandler:
         Returns:
             bool: True if successful, False otherwise
         """
+        try:
+            new_img = self.render_icon(char_id, fashion_type, custom_palette)
+            if new_img is None:
+                return False
+            # Save as 24-bit BMP
+            write_image_atomic(new_img, self.get_icon_export_path(char_id, fashion_type, palette_path))
+            return True
+        except Exception as e:
+            return False
+    
+    def render_icon(self, char_id: str, fashion_type: str, custom_palette: list):
+        """Build the icon image save_as_icon writes; returns an RGB image or None on failure."""
         try:
             # Step 1: Find the base BMP name
             base_bmp_name = self._find_base_bmp_name(char_id, fashion_type)
@@ -906,25 +941,18 @@ class IconHandler:
             # Step 2: Find the matching fashion PAL file in PAL folder
             pal_file_path = self._find_matching_pal_file(char_id, base_bmp_name)
             if not pal_file_path:
-                return False
+                return None
             
             # Step 3: For quicksave, directly use the saved palette colors instead of applying slider adjustments
             # Load the base PAL file structure but replace the colors with saved palette colors
-            base_pal_colors = []
-            with open(pal_file_path, 'rb') as f:
-                pal_data = f.read()
-                for i in range(0, len(pal_data), 3):
-                    if i + 2 >= len(pal_data):
-                        break
-                    r = pal_data[i]
-                    g = pal_data[i+1]
-                    b = pal_data[i+2]
-                    base_pal_colors.append((r, g, b))
+            base_pal_colors = self._assets.get_palette(pal_file_path)
+            if base_pal_colors is None:
+                return None
             
             # Create adjusted palette by mapping saved colors to the correct indexes
             adjusted_pal_colors = base_pal_colors.copy()  # Start with base structure
             char_num = char_id[3:] if char_id.startswith('chr') else char_id
-            translator = IndexTranslator()
+            translator = INDEX_TRANSLATOR
             ranges = translator.original_ranges.get(char_num, {}).get(fashion_type, [])
             
             # Map saved palette colors to the correct indexes in the base PAL structure
@@ -962,19 +990,16 @@ class IconHandler:
             # Use only BMP files for consistency
             bmp_path = os.path.join(icon_dir, "BMP", f"{base_bmp_name}.bmp")
             
-            if os.path.exists(bmp_path):
+            if self._assets.exists(bmp_path):
                 image_path = bmp_path
             else:
-                return False
+                return None
                 
-            # Get exports/icons directory path
-            export_dir = os.path.join(self.root_dir, "exports", "icons")
-            
             # Get the actual used indexes (non-keying colors) from the adjusted PAL palette
             # Only use colors that match the valid indexes, excluding keying colors
             used_colors = []
             char_num = char_id[3:] if char_id.startswith('chr') else char_id
-            translator = IndexTranslator()
+            translator = INDEX_TRANSLATOR
             ranges = translator.original_ranges.get(char_num, {}).get(fashion_type, [])
             
             # Extract ONLY the valid colors from the ranges, excluding keying colors and last indexes
@@ -990,7 +1015,8 @@ class IconHandler:
                             used_colors.append(color)
             
             # Load and process the image
-            img = Image.open(image_path).convert("RGBA")
+            source_img = self._assets.get_image(image_path)
+            img = source_img.convert("RGBA")
             
             # Get alpha channel first
             alpha = img.split()[3]
@@ -999,7 +1025,7 @@ class IconHandler:
             new_img = Image.new("RGB", img.size)
             
             # Load the original image as palette mode to get the palette indices
-            original_img_palette = Image.open(image_path).convert("P")
+            original_img_palette = source_img.convert("P")
             original_pixel_data = list(original_img_palette.getdata())
             
             # Get the original BMP's palette
@@ -1012,18 +1038,9 @@ class IconHandler:
             # CORRECT FLOW: vanilla_pal ↔ _base.pal matching → BMP color mapping → final palette
             
             # Step 1: Load _base.pal colors
-            base_pal_colors = []
-            try:
-                with open(pal_file_path, 'rb') as f:
-                    base_pal_data = f.read()
-                for i in range(0, len(base_pal_data), 3):
-                    if i + 2 < len(base_pal_data):
-                        r = base_pal_data[i]
-                        g = base_pal_data[i+1]
-                        b = base_pal_data[i+2]
-                        base_pal_colors.append((r, g, b))
-            except Exception as e:
-                return False
+            base_pal_colors = self._assets.get_palette(pal_file_path)
+            if base_pal_colors is None:
+                return None
             
             # Step 2: Color-based mapping from custom_palette to _base.pal using multi-pass matching
             base_to_custom_mapping = self._create_base_to_custom_mapping(
@@ -1043,9 +1060,7 @@ class IconHandler:
                     bmp_color = (r, g, b)
                     
                     # Skip magenta BMP indices
-                    if (bmp_color == (255, 0, 255) or 
-                        bmp_color == (0, 255, 0) or 
-                        self.is_universal_keying_color(bmp_color)):
+                    if keying.is_standard_keying_color(bmp_color):
                         continue
                     
                     # Find exact match in _base.pal
@@ -1095,9 +1110,7 @@ class IconHandler:
                     bmp_color = (r, g, b)
                     
                     # Skip keying colors, use 1:1 mapping from vanilla indices to _base.pal
-                    if not (bmp_color == (255, 0, 255) or 
-                           bmp_color == (0, 255, 0) or 
-                           self.is_universal_keying_color(bmp_color)):
+                    if not keying.is_standard_keying_color(bmp_color):
                         
                         # Find this BMP color in _base.pal to get the _base.pal index
                         base_pal_idx = None
@@ -1161,35 +1174,37 @@ class IconHandler:
                     opaque_count += 1
             
             new_img.putdata(new_img_data)
-            
-            # Save as 24-bit BMP
-            if palette_path:
-                icon_name = os.path.splitext(os.path.basename(palette_path))[0] + ".bmp"
-            else:
-                icon_name = f"{char_id}_{fashion_type}_{base_bmp_name}.bmp"
-            export_path = os.path.join(export_dir, icon_name)
-            
-            # Create directory if it doesn't exist when actually saving
-            os.makedirs(os.path.dirname(export_path), exist_ok=True)
-            new_img.save(export_path, "BMP")
-            return True
+            return new_img
             
         except Exception as e:
-            return False
+            return None
     
     def save_as_icon_with_colors(self, char_id: str, fashion_type: str, colors: list, 
                                 keying_color: tuple, bmp_path: str, export_path: str) -> bool:
         """Save icon with specific colors (used by IconPaletteEditor)."""
+        try:
+            new_img = self.render_icon_with_colors(colors, keying_color, bmp_path)
+            if new_img is None:
+                return False
+            # Save as 24-bit BMP
+            write_image_atomic(new_img, export_path)
+            return True
+        except Exception as e:
+            return False
+    
+    def render_icon_with_colors(self, colors: list, keying_color: tuple, bmp_path: str):
+        """Build the icon image save_as_icon_with_colors writes; returns an RGB image or None."""
         try:
             # Load the original BMP
-            img = Image.open(bmp_path).convert("RGBA")
+            source_img = self._assets.get_image(bmp_path)
+            img = source_img.convert("RGBA")
             alpha = img.split()[3]
             
             # Create new RGB image
             new_img = Image.new("RGB", img.size)
             
             # Load the original image as palette mode to get the palette indices
-            original_img_palette = Image.open(bmp_path).convert("P")
+            original_img_palette = source_img.convert("P")
             original_pixel_data = list(original_img_palette.getdata())
             
             # Create a new palette-mode image with the provided colors
@@ -1228,15 +1243,10 @@ class IconHandler:
                     new_img_data[i] = keying_color
             
             new_img.putdata(new_img_data)
-            
-            # Save as 24-bit BMP
-            # Create directory if it doesn't exist when actually saving
-            os.makedirs(os.path.dirname(export_path), exist_ok=True)
-            new_img.save(export_path, "BMP")
-            return True
+            return new_img
             
         except Exception as e:
-            return False
+            return None
 
     def _create_base_to_custom_mapping(self, base_pal_colors, custom_palette, char_id, fashion_type):
         """Create a mapping from base palette indices to custom palette colors using multi-pass matching.
@@ -1251,189 +1261,50 @@ class IconHandler:
             dict: base_palette_index -> custom_palette_color mapping
         """
         char_num = char_id[3:] if char_id.startswith('chr') else char_id
-        translator = IndexTranslator()
+        translator = INDEX_TRANSLATOR
         ranges = translator.original_ranges.get(char_num, {}).get(fashion_type, [])
         
-        # Collect candidate colors from custom palette
-        candidates = {}  # vanilla_idx -> color
-        for r in ranges:
-            for idx in range(r.start, r.stop):
-                if idx < len(custom_palette) and idx != 0 and idx != 255:
-                    color = custom_palette[idx]
-                    
-                    # Validate color tuple
-                    if isinstance(color, (list, tuple)) and len(color) == 3:
-                        try:
-                            r_val, g_val, b_val = int(color[0]), int(color[1]), int(color[2])
-                            if 0 <= r_val <= 255 and 0 <= g_val <= 255 and 0 <= b_val <= 255:
-                                color = (r_val, g_val, b_val)
-                                # Filter out keying colors
-                                if (color != (255, 0, 255) and color != (0, 255, 0) and
-                                    not self.is_universal_keying_color(color) and
-                                    not self._is_keyed_color(color, idx)):
-                                    candidates[idx] = color
-                        except (ValueError, TypeError):
-                            continue
-        
-        # Create base_pal to custom_palette mapping using multi-pass matching
-        base_to_custom_mapping = {}  # base_pal_index -> custom_palette_color
-        matched_base_indices = set()
-        unmatched_candidates = dict(candidates)
-        
-        
-        # Pass 1: Direct index-to-index matching
-        for vanilla_idx, vanilla_color in list(unmatched_candidates.items()):
-            if vanilla_idx < len(base_pal_colors):
-                base_color = base_pal_colors[vanilla_idx]
-                
-                # Check if base palette has a non-keying color at this index
-                # For chr003: only key out pure green (0,255,0), green variants, and pure magenta (255,0,255)
-                is_keying = False
-                if base_color == (255, 0, 255):  # Pure magenta
-                    is_keying = True
-                elif base_color == (0, 255, 0):  # Pure green  
-                    is_keying = True
-                elif self.is_universal_keying_color(base_color):  # Green variants
-                    is_keying = True
-                
-                if not is_keying:
-                    # Map base palette index to custom palette color
-                    base_to_custom_mapping[vanilla_idx] = vanilla_color
-                    matched_base_indices.add(vanilla_idx)
-                    del unmatched_candidates[vanilla_idx]
-        
-        # Pass 2+: Match remaining colors by color similarity
-        max_passes = 5
-        for pass_num in range(max_passes):
-            if not unmatched_candidates:
-                break
-            
-            matched_this_pass = []
-            
-            for vanilla_idx, vanilla_color in unmatched_candidates.items():
-                # Find nearest non-keying, non-matched base color
-                best_match_idx = None
-                best_distance = float('inf')
-                
-                for base_idx, base_color in enumerate(base_pal_colors):
-                    # Skip if already matched
-                    if base_idx in matched_base_indices:
-                        continue
-                    # Skip keying colors in base palette (same logic as Pass 1)
-                    is_keying = (base_color == (255, 0, 255) or  # Pure magenta
-                                base_color == (0, 255, 0) or     # Pure green
-                                self.is_universal_keying_color(base_color))  # Green variants
-                    if is_keying:
-                        continue
-                    
-                    # Calculate color distance
-                    distance = sum((a - b) ** 2 for a, b in zip(vanilla_color, base_color))
-                    
-                    if distance < best_distance:
-                        best_distance = distance
-                        best_match_idx = base_idx
-                
-                if best_match_idx is not None:
-                    base_to_custom_mapping[best_match_idx] = vanilla_color
-                    matched_base_indices.add(best_match_idx)
-                    matched_this_pass.append(vanilla_idx)
-            
-            # Remove matched candidates
-            for vanilla_idx in matched_this_pass:
-                del unmatched_candidates[vanilla_idx]
-            
-            # If no progress, stop
-            if not matched_this_pass:
-                break
+        # Collect candidate colors from custom palette (vanilla_idx -> color), keying colors filtered out
+        candidates = collect_candidates(custom_palette, ranges, self._is_keyed_color)
+        
+        # Direct index matches first, then nearest free non-keying base color for the rest
+        base_to_custom_mapping = get_match_table(base_pal_colors).match(candidates)
         
         return base_to_custom_mapping
 
     def _is_keyed_color(self, rgb_color, palette_index=None):
         """Check if an RGB color is a keyed/transparency color that should be avoided"""
-        r, g, b = rgb_color
-        
-        # Universal keying colors (same logic as main app)
-        if self.is_universal_keying_color(rgb_color):
-            return True
-        
-        # Magenta (chroma key)
-        if rgb_color == (255, 0, 255):
-            return True
-        
-        # Character-specific keying rules
-        if hasattr(self, 'char_id') and self.char_id:
-            char_num = self.char_id[3:]  # Extract number from chr###
-            
-            # chr004 specific rules
-            if char_num == "004":
-                if rgb_color == (0, 0, 0):  # Black
-                    return True
-                if palette_index == 255:  # Last color in palette
-                    return True
-            
-            # chr003 (Sheep) - uses universal keying colors
-            elif char_num == "003":
-                return self.is_chr003_keying_color(rgb_color)
-            
-            # chr008 (Raccoon) - uses universal keying colors  
-            elif char_num == "008":
-                return self.is_chr008_keying_color(rgb_color)
-            
-            # chr011 (Sheep 2nd Job) - uses same as chr003
-            elif char_num == "011":
-                return self.is_chr011_keying_color(rgb_color)
-            
-            # chr014 (Lion 2nd Job) - uses selective keying
-            elif char_num == "014":
-                return self.is_chr014_keying_color(rgb_color)
-        
-        return False
+        # Universal keying colors and magenta; chr004 also keys black and index 255
+        return keying.is_keyed("palette", getattr(self, 'char_id', None), rgb_color, palette_index)
 
     def is_universal_keying_color(self, color):
         """Check if a color is a universal keying color for ALL characters"""
-        r, g, b = color
-        
-        # Pure green (0, 255, 0) - used by ALL characters including chr010
-        if color == (0, 255, 0):
-            return True
-        
-        # (0~25, 255, 0) pattern - used by chr002, chr008, chr024, and others
-        if g == 255 and b == 0 and 0 <= r <= 25:
-            return True
-        
-        # (0, 255, 0~21) pattern - used by chr003, chr011, chr019, and others
-        if g == 255 and r == 0 and 0 <= b <= 21:
-            return True
-        
-        return False
+        return keying.is_universal_keying_color(color)
 
     def is_chr003_keying_color(self, color):
         """Check if a color is a keying color for chr003 (Sheep)"""
-        # chr003 uses universal keying colors
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr008_keying_color(self, color):
         """Check if a color is a keying color for chr008 (Raccoon)"""
-        # chr008 uses universal keying colors
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr011_keying_color(self, color):
         """Check if a color is a keying color for chr011 (Sheep 2nd Job)"""
-        # chr011 uses the same keying patterns as chr003
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr014_keying_color(self, color):
         """Check if a color is a keying color for chr014 (Lion 2nd Job)"""
-        # chr014 uses more selective keying to avoid over-transparency
         # Only key out pure green and magenta, not green variants
-        if color == (0, 255, 0) or color == (255, 0, 255):  # Pure green and magenta
-            return True
-        return False
+        return keying.is_selective_keying_color(color)
 
 
 class IconPaletteEditor:
     """A mini palette editor specifically for editing icon palettes with live preview."""
     
+    # (char_id, fashion_type, reference PAL) -> static excess color index classification
+    _excess_layouts = {}
+    
     def __init__(self, char_id: str, fashion_type: str, custom_palette: list, palette_path: str, palette_layers=None, live_editor_window=None, is_quicksave_mode=False, icon_handler=None):
         self.char_id = char_id
         self.fashion_type = fashion_type
@@ -1466,7 +1337,7 @@ class IconPaletteEditor:
         self.palette_frame = None  # Will be set in _create_ui
         self.saved_colors_frame = None  # Will be set in _create_ui
         self.preview_photo = None  # Will be set in _update_preview
-        self.color_mapping = {}  # Maps original pixel colors to color indices
+        self.preview_hitmap = None  # Screen-to-BMP transform and BMP indices of the preview
         self._last_palette_key = None  # Track the last selected palette
         self.zoom_level = 6  # Current zoom level (6x is the default for larger preview)
         self.min_zoom = 1  # Minimum zoom (100%)
@@ -1542,21 +1413,6 @@ class IconPaletteEditor:
         # Prompt user to save excess colors after window is shown
         self.window.after(100, self._prompt_save_excess_colors)
     
-    def is_universal_keying_color(self, color):
-        """Match the same 'universal keying' rules used in the main app."""
-        r, g, b = color
-        # Pure green
-        if color == (0, 255, 0):
-            return True
-        # (0~25, 255, 0) pattern
-        if g == 255 and b == 0 and 0 <= r <= 25:
-            return True
-        # (0, 255, 0~21) pattern
-        if g == 255 and r == 0 and 0 <= b <= 21:
-            return True
-        return False
-
-    
     def _find_nearest_non_keyed_color(self, target_rgb, adjustment_direction='both'):
         """Find the nearest non-keyed color by adjusting RGB values with precise increments"""
         r, g, b = target_rgb
@@ -1604,16 +1460,10 @@ class IconPaletteEditor:
     def _load_reference_palette(self):
         """Load the reference palette and determine keying color."""
         try:
-            with open(self.ref_pal_path, 'rb') as f:
-                ref_pal_data = f.read()
-                
-            # Convert to RGB tuples
-            for i in range(0, len(ref_pal_data), 3):
-                if i + 2 < len(ref_pal_data):
-                    r = ref_pal_data[i]
-                    g = ref_pal_data[i+1]
-                    b = ref_pal_data[i+2]
-                    self.ref_colors.append((r, g, b))
+            ref_pal_colors = self.icon_handler._assets.get_palette(self.ref_pal_path)
+            if ref_pal_colors is None:
+                return
+            self.ref_colors.extend(ref_pal_colors)
             
             # Determine keying color (always use first index)
             if self.ref_colors:
@@ -1657,41 +1507,16 @@ class IconPaletteEditor:
         3. Second+ passes: Match unmatched colors to nearest available neighbors
         """
         # Validate custom_palette
-        if not self.custom_palette or not isinstance(self.custom_palette, list):
+        if not self.custom_palette or not isinstance(self.custom_palette, (list, PaletteBuffer)):
             return {0: (128, 128, 128)}  # Return dict with single default color
         
         # Get the valid ranges for this fashion type
         char_num = self.char_id[3:] if self.char_id.startswith('chr') else self.char_id
-        translator = IndexTranslator()
+        translator = INDEX_TRANSLATOR
         ranges = translator.original_ranges.get(char_num, {}).get(self.fashion_type, [])
         
         # First, collect all candidate colors from custom palette (excluding keying colors)
-        candidates = {}  # idx -> color
-        
-        for r in ranges:
-            for idx in range(r.start, r.stop):
-                if idx < len(self.custom_palette) and idx != 0 and idx != 255:
-                    color = self.custom_palette[idx]
-                    
-                    # Validate and convert color tuple
-                    if not isinstance(color, (list, tuple)) or len(color) != 3:
-                        continue
-                    
-                    try:
-                        r_val, g_val, b_val = int(color[0]), int(color[1]), int(color[2])
-                        if not (0 <= r_val <= 255 and 0 <= g_val <= 255 and 0 <= b_val <= 255):
-                            continue
-                        color = (r_val, g_val, b_val)
-                    except (ValueError, TypeError):
-                        continue
-                    
-                    # Filter out keying colors
-                    if color == (255, 0, 255) or color == (0, 255, 0):
-                        continue
-                    if self._is_keyed_color(color, idx):
-                        continue
-                    
-                    candidates[idx] = color
+        candidates = collect_candidates(self.custom_palette, ranges, self._is_keyed_color)  # idx -> color
         
         if not candidates:
             return {111: (128, 128, 128)}
@@ -1713,26 +1538,13 @@ class IconPaletteEditor:
         editable_colors = {}
         
         # Include ALL vanilla indices that produce colors used by the icon
-        for vanilla_idx in candidates.keys():
-            vanilla_color = candidates[vanilla_idx]
-            
-            # Check if this vanilla color is actually used by the base palette mapping
-            is_used = False
-            for base_idx, mapped_color in base_to_custom_mapping.items():
-                if mapped_color == vanilla_color:
-                    is_used = True
-                    break
-            
-            if is_used:
+        used_colors = set(base_to_custom_mapping.values())
+        for vanilla_idx, vanilla_color in candidates.items():
+            if vanilla_color in used_colors:
                 editable_colors[vanilla_idx] = vanilla_color
         
-        # Count non-keying base palette colors
-        non_keying_base_count = 0
-        for base_idx, base_color in enumerate(self.ref_colors):
-            if (base_color != (255, 0, 255) and base_color != (0, 255, 0) and
-                not self.is_universal_keying_color(base_color) and
-                not self._is_keyed_color(base_color, base_idx)):
-                non_keying_base_count += 1
+        # Count non-keying base palette colors (only changes with the reference palette/character)
+        non_keying_base_count = self._get_non_keying_base_count()
         
         # IMPROVED LOGIC: Include additional candidates even if there are fewer base colors
         # This handles cases where vanilla palette has more useful colors than the base palette
@@ -1770,6 +1582,88 @@ class IconPaletteEditor:
         
         return editable_colors
     
+    def _get_non_keying_base_count(self):
+        """Return how many reference palette colors are not keying colors for this character."""
+        key = (self.char_id, tuple(self.ref_colors))
+        cached = getattr(self, '_non_keying_base_count_cache', None)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        
+        mask = keying.keyed_index_mask("icon", self.char_id, self.ref_colors)
+        non_keying_base_count = sum(
+            1 for base_idx, base_color in enumerate(self.ref_colors)
+            if not (mask[base_idx] if base_idx < 256 else self._is_keyed_color(base_color, base_idx))
+        )
+        self._non_keying_base_count_cache = (key, non_keying_base_count)
+        return non_keying_base_count
+    
+    def _get_excess_layout(self):
+        """Return the static index classification behind _extract_unused_colors.
+        
+        Which indexes are in the fashion ranges, which of those have a keying color in the
+        reference PAL, and which are outside the ranges only depend on the character,
+        fashion type and reference PAL, so they are computed once and shared by every editor.
+        """
+        ref_colors = tuple(self.ref_colors) if getattr(self, 'ref_colors', None) else ()
+        key = (self.char_id, self.fashion_type, ref_colors)
+        layout = IconPaletteEditor._excess_layouts.get(key)
+        if layout is not None:
+            return layout
+        
+        # Get the valid ranges for this fashion type
+        char_num = self.char_id[3:] if self.char_id.startswith('chr') else self.char_id
+        ranges = INDEX_TRANSLATOR.original_ranges.get(char_num, {}).get(self.fashion_type, [])
+        
+        # Built with the same adds as before so iteration order (and JSON color order) is unchanged
+        valid_range_indexes = set()
+        for r in ranges:
+            for idx in range(r.start, r.stop):
+                valid_range_indexes.add(idx)
+        valid_order = tuple(valid_range_indexes)
+        
+        # Indexes where the REFERENCE PAL has keying colors (icon doesn't use these indexes)
+        ref_mask = keying.keyed_index_mask("icon", self.char_id, ref_colors)
+        ref_keyed = frozenset(
+            idx for idx in valid_order
+            if idx < len(ref_colors) and idx != 0 and idx != 255 and ref_mask[idx]
+        )
+        
+        outside_order = tuple(idx for idx in range(256)
+                              if idx not in valid_range_indexes and idx != 0 and idx != 255)
+        
+        layout = (frozenset(valid_range_indexes), valid_order, ref_keyed, outside_order)
+        if len(IconPaletteEditor._excess_layouts) >= 64:
+            IconPaletteEditor._excess_layouts.clear()
+        IconPaletteEditor._excess_layouts[key] = layout
+        return layout
+    
+    def _classify_excess_color(self, color, idx):
+        """Return (rgb, basic_keyed, fully_keyed) for a palette entry, or None if it isn't a valid color.
+        
+        basic_keyed covers magenta/green/universal keying colors, fully_keyed adds the character's
+        own rules. Indexes 0 and 255 never get here, so the result only depends on the color and
+        is memoized per character.
+        """
+        if not isinstance(color, (list, tuple)) or len(color) != 3:
+            return None
+        try:
+            rgb = (int(color[0]), int(color[1]), int(color[2]))
+        except (ValueError, TypeError):
+            return None
+        if not (0 <= rgb[0] <= 255 and 0 <= rgb[1] <= 255 and 0 <= rgb[2] <= 255):
+            return None
+        
+        memo = getattr(self, '_excess_keyed_memo', None)
+        if memo is None or memo[0] != self.char_id:
+            memo = (self.char_id, {})
+            self._excess_keyed_memo = memo
+        flags = memo[1].get(rgb)
+        if flags is None:
+            basic = keying.is_standard_keying_color(rgb)
+            flags = (basic, basic or self._is_keyed_color(rgb, idx))
+            memo[1][rgb] = flags
+        return rgb, flags[0], flags[1]
+    
     def _extract_unused_colors(self):
         """Extract colors from palette indexes that are NOT used by the icon (excess colors).
         This includes:
@@ -1781,130 +1675,61 @@ class IconPaletteEditor:
         All extracted colors exclude keying colors (magenta, green, character-specific) for JSON export.
         """
         # Validate custom_palette
-        if not self.custom_palette or not isinstance(self.custom_palette, list):
+        if not self.custom_palette or not isinstance(self.custom_palette, (list, PaletteBuffer)):
             return []
         
-        # Get the valid ranges for this fashion type
-        char_num = self.char_id[3:] if self.char_id.startswith('chr') else self.char_id
-        translator = IndexTranslator()
-        ranges = translator.original_ranges.get(char_num, {}).get(self.fashion_type, [])
-        
-        # Create a set of all indexes in valid ranges
-        valid_range_indexes = set()
-        for r in ranges:
-            for idx in range(r.start, r.stop):
-                valid_range_indexes.add(idx)
+        valid_range_indexes, valid_order, ref_keyed, outside_order = self._get_excess_layout()
+        custom_palette = self.custom_palette
+        palette_len = len(custom_palette)
         
         # Extract unused colors from multiple sources:
         unused_colors = []
+        seen_colors = set()
         processed_indices = set()  # Track which indices we've already processed
         
+        def add_color(idx, rgb):
+            if rgb not in seen_colors:
+                seen_colors.add(rgb)
+                unused_colors.append(list(rgb))
+                processed_indices.add(idx)
+        
         # IMPORTANT: Exclude all editable/active colors from excess colors
-        # Get the editable colors indices to avoid including them in excess
-        editable_indices = set()
         if hasattr(self, 'editable_colors') and self.editable_colors:
-            editable_indices = set(self.editable_colors.keys())
-            processed_indices.update(editable_indices)  # Mark all editable indices as processed
-            
+            processed_indices.update(self.editable_colors.keys())
         
         # Source 0: Unmatched colors from multi-pass matching (highest priority)
         if hasattr(self, '_unmatched_candidates') and self._unmatched_candidates:
             for idx, color in self._unmatched_candidates.items():
                 if isinstance(color, (list, tuple)) and len(color) == 3:
                     # Already validated and filtered in _extract_editable_colors
-                    color_list = [int(color[0]), int(color[1]), int(color[2])]
-                    if color_list not in unused_colors:
-                        unused_colors.append(color_list)
-                        processed_indices.add(idx)
+                    add_color(idx, (int(color[0]), int(color[1]), int(color[2])))
         
         # Source 1: Colors where REFERENCE PAL has keying colors (icon doesn't use these indexes)
-        if hasattr(self, 'ref_colors') and self.ref_colors:
-            for idx in valid_range_indexes:
-                # Skip if already processed
-                if idx in processed_indices:
-                    continue
-                    
-                if idx < len(self.custom_palette) and idx < len(self.ref_colors) and idx != 0 and idx != 255:
-                    ref_color = self.ref_colors[idx]
-                    custom_color = self.custom_palette[idx]
-                    
-                    # Check if reference PAL has a keying color at this index
-                    ref_is_keyed = (ref_color == (255, 0, 255) or 
-                                   ref_color == (0, 255, 0) or 
-                                   self.is_universal_keying_color(ref_color) or
-                                   self._is_keyed_color(ref_color, idx))
-                    
-                    if ref_is_keyed:
-                        # Reference has keying color, so icon doesn't use this index
-                        # But only save if custom palette has a valid, non-keying color
-                        if isinstance(custom_color, (list, tuple)) and len(custom_color) == 3:
-                            try:
-                                r_val, g_val, b_val = int(custom_color[0]), int(custom_color[1]), int(custom_color[2])
-                                if 0 <= r_val <= 255 and 0 <= g_val <= 255 and 0 <= b_val <= 255:
-                                    # Don't save magenta/green from custom palette
-                                    if (r_val, g_val, b_val) not in [(255, 0, 255), (0, 255, 0)]:
-                                        # Also skip if custom color is a keying color
-                                        if not self.is_universal_keying_color((r_val, g_val, b_val)):
-                                            color_list = [r_val, g_val, b_val]
-                                            if color_list not in unused_colors:
-                                                unused_colors.append(color_list)
-                                                processed_indices.add(idx)
-                            except (ValueError, TypeError):
-                                pass
+        # Only saved if the custom palette has a valid, non-keying color there
+        if ref_keyed:
+            for idx in valid_order:
+                if idx in ref_keyed and idx not in processed_indices and idx < palette_len:
+                    classified = self._classify_excess_color(custom_palette[idx], idx)
+                    if classified is not None and not classified[1]:
+                        add_color(idx, classified[0])
         
         # Source 2: Non-keying colors in custom palette WITHIN valid ranges that are unused
-        for idx in valid_range_indexes:
-            # Skip if already processed
-            if idx in processed_indices:
+        for idx in valid_order:
+            if idx in processed_indices or idx >= palette_len or idx == 0 or idx == 255:
                 continue
-                
-            if idx < len(self.custom_palette) and idx != 0 and idx != 255:
-                color = self.custom_palette[idx]
-                
-                # Validate color tuple
-                if isinstance(color, (list, tuple)) and len(color) == 3:
-                    try:
-                        r_val, g_val, b_val = int(color[0]), int(color[1]), int(color[2])
-                        if 0 <= r_val <= 255 and 0 <= g_val <= 255 and 0 <= b_val <= 255:
-                            # Only save NON-keying colors that are in valid ranges but unused by icon
-                            if not self._is_keyed_color((r_val, g_val, b_val), idx):
-                                # Additional check: skip magenta/green even if not detected as keyed
-                                if (r_val, g_val, b_val) not in [(255, 0, 255), (0, 255, 0)]:
-                                    # Skip universal keying colors as extra safety
-                                    if not self.is_universal_keying_color((r_val, g_val, b_val)):
-                                        color_list = [r_val, g_val, b_val]
-                                        if color_list not in unused_colors:
-                                            unused_colors.append(color_list)
-                                            processed_indices.add(idx)
-                    except (ValueError, TypeError):
-                        pass
+            classified = self._classify_excess_color(custom_palette[idx], idx)
+            if classified is not None and not classified[2]:
+                add_color(idx, classified[0])
         
         # Source 3: Colors OUTSIDE valid ranges (truly unused indexes)
-        for idx in range(len(self.custom_palette)):
-            # Skip if in valid ranges or already processed
-            if idx in valid_range_indexes or idx in processed_indices:
+        for idx in outside_order:
+            if idx >= palette_len:
+                break
+            if idx in processed_indices:
                 continue
-                
-            if idx != 0 and idx != 255:
-                color = self.custom_palette[idx]
-                
-                # Validate color tuple
-                if isinstance(color, (list, tuple)) and len(color) == 3:
-                    try:
-                        r_val, g_val, b_val = int(color[0]), int(color[1]), int(color[2])
-                        if 0 <= r_val <= 255 and 0 <= g_val <= 255 and 0 <= b_val <= 255:
-                            # Use comprehensive keying detection to exclude ALL keying colors
-                            if not self._is_keyed_color((r_val, g_val, b_val), idx):
-                                # Additional safety checks: skip magenta/green explicitly
-                                if (r_val, g_val, b_val) not in [(255, 0, 255), (0, 255, 0)]:
-                                    # Skip universal keying colors as extra safety
-                                    if not self.is_universal_keying_color((r_val, g_val, b_val)):
-                                        color_list = [r_val, g_val, b_val]
-                                        if color_list not in unused_colors:
-                                            unused_colors.append(color_list)
-                                            processed_indices.add(idx)
-                    except (ValueError, TypeError):
-                        pass
+            classified = self._classify_excess_color(custom_palette[idx], idx)
+            if classified is not None and not classified[2]:
+                add_color(idx, classified[0])
         
         return unused_colors
     
@@ -2387,28 +2212,7 @@ class IconPaletteEditor:
         ttk.Label(edit_frame, text="Edit which:").pack(side=tk.LEFT)
         
         # Populate dropdown with all active palettes
-        palette_options = []
-        current_palette_name = f"{self.icon_handler._get_fashion_name(self.char_id, self.fashion_type)} — {os.path.basename(self.palette_path)}"
-        
-        if self.palette_layers:
-            active_layers = [ly for ly in self.palette_layers if getattr(ly, "active", False)]
-            for layer in active_layers:
-                if hasattr(layer, 'name') and hasattr(layer, 'palette_type'):
-                    # Skip hair and third job layers - don't include them in the dropdown
-                    if layer.palette_type in ('hair', '3rd_job_base'):
-                        continue
-                    
-                    # Extract character and fashion info from layer name
-                    import re
-                    char_match = re.search(r'(?:chr)?(\d{3})', layer.name)
-                    if char_match:
-                        char_id = f"chr{char_match.group(1).zfill(3)}"
-                        fashion_name = self.icon_handler._get_fashion_name(char_id, layer.palette_type)
-                        palette_options.append(f"{fashion_name} — {layer.name}")
-        
-        # If no active layers found, just show current palette
-        if not palette_options:
-            palette_options = [current_palette_name]
+        current_palette_name, palette_options = self._get_dropdown_options()
         
         # Determine if dropdown should be disabled (when opened from live editor or quicksave mode)
         dropdown_state = "disabled" if (self.live_editor_window or self.is_quicksave_mode) else "readonly"
@@ -2451,6 +2255,11 @@ class IconPaletteEditor:
         ttk.Button(button_frame, text="Reset to Original", command=self._reset_colors).pack(side=tk.LEFT, padx=(0, 10))
         ttk.Button(button_frame, text="Close", command=self._close_editor).pack(side=tk.RIGHT)
         
+        # Icon saves finish in the background; their result is shown here
+        self.export_status_var = tk.StringVar(value="")
+        self.export_status_label = ttk.Label(button_frame, textvariable=self.export_status_var, font=("Arial", 8))
+        self.export_status_label.pack(side=tk.RIGHT, padx=(0, 10))
+        
         # Initialize UI
         self._update_color_picker()
         self._update_preview()
@@ -3028,170 +2837,153 @@ class IconPaletteEditor:
         
         # Find the corresponding layer
         if self.palette_layers:
-            active_layers = [ly for ly in self.palette_layers if getattr(ly, "active", False)]
-            for layer in active_layers:
-                if hasattr(layer, 'name') and hasattr(layer, 'palette_type'):
+            palette_index = self.icon_handler._palette_index
+            for layer_name, char_id, layer in palette_index.dropdown_entries(self.palette_layers, self.icon_handler._get_fashion_name):
+                if layer_name == selected_text:
+                    # COMPLETE REINITIALIZATION - as if opening editor fresh with this palette
+                    
+                    # Update to NEW character and fashion type
+                    self.char_id = char_id
+                    self.fashion_type = layer.palette_type
+                    
+                    # Update palette_path to the NEW palette name
+                    self.palette_path = layer.name if hasattr(layer, 'name') else f"{char_id}_{layer.palette_type}.pal"
+                    
+                    # Get NEW icon paths for the selected character/fashion type
+                    item_name = self.icon_handler._get_fashion_name(char_id, layer.palette_type)
+                    self.image_path, self.ref_pal_path = self.icon_handler._get_icon_paths(char_id, item_name)
+                    
+                    # Clear all cached state to force fresh extraction
+                    self.ref_colors = []
+                    self.keying_color = (255, 0, 255)
+                    self._unmatched_candidates = {}
+                    
+                    # Load the NEW reference palette
+                    self._load_reference_palette()
+                    
+                    # ALWAYS initialize custom_palette with NEW layer colors first
+                    self.custom_palette = layer.colors if hasattr(layer, 'colors') else []
+                    
+                    # Check if this specific palette was exported/saved
+                    # Look for a saved .pal file that matches this character and fashion type
+                    import os
                     import re
-                    char_match = re.search(r'(?:chr)?(\d{3})', layer.name)
-                    if char_match:
-                        char_id = f"chr{char_match.group(1).zfill(3)}"
-                        fashion_name = self.icon_handler._get_fashion_name(char_id, layer.palette_type)
-                        layer_name = f"{fashion_name} — {layer.name}"
+                    exports_dir = os.path.join(self.icon_handler.root_dir, "exports", "custom_pals", "fashion")
+                    
+                    # Try multiple filename patterns that might match this character/fashion combination
+                    possible_filenames = []
+                    
+                    # Pattern 1: chr###_w#.pal (standard fashion palette format)
+                    if layer.palette_type.startswith('fashion_'):
+                        fashion_num = layer.palette_type.split('_')[1]
+                        possible_filenames.append(f"{char_id}_w{fashion_num}.pal")
+                    
+                    # Pattern 2: chr###_#.pal (hair palette format)
+                    if layer.palette_type == 'hair':
+                        # Extract hair number from layer name if possible
+                        hair_match = re.search(r'_(\d+)\.pal', layer.name)
+                        if hair_match:
+                            hair_num = hair_match.group(1)
+                            possible_filenames.append(f"{char_id}_{hair_num}.pal")
+                    
+                    # Pattern 3: Generic chr###_palette_type.pal format
+                    possible_filenames.append(f"{char_id}_{layer.palette_type}.pal")
+                    
+                    # Pattern 4: Look for any palette file that contains the character ID and matches the layer name
+                    assets = self.icon_handler._assets
+                    if assets.exists(exports_dir):
+                        # Only the indexed palettes for this character are candidates
+                        base_layer_name = os.path.splitext(layer.name)[0].lower()  # Remove .pal extension
+                        for filename in palette_index.directory(exports_dir).files_for_char(char_id):
+                            # Check if this palette file corresponds to the current layer
+                            # by examining the layer name for matching patterns
+                            if base_layer_name in filename.lower():
+                                possible_filenames.append(filename)
                         
-                        if layer_name == selected_text:
-                            # COMPLETE REINITIALIZATION - as if opening editor fresh with this palette
-                            
-                            # Update to NEW character and fashion type
-                            self.char_id = char_id
-                            self.fashion_type = layer.palette_type
-                            
-                            # Update palette_path to the NEW palette name
-                            self.palette_path = layer.name if hasattr(layer, 'name') else f"{char_id}_{layer.palette_type}.pal"
-                            
-                            # Get NEW icon paths for the selected character/fashion type
-                            item_name = self.icon_handler._get_fashion_name(char_id, layer.palette_type)
-                            self.image_path, self.ref_pal_path = self.icon_handler._get_icon_paths(char_id, item_name)
-                            
-                            # Clear all cached state to force fresh extraction
-                            self.ref_colors = []
-                            self.keying_color = (255, 0, 255)
-                            self._unmatched_candidates = {}
-                            
-                            # Load the NEW reference palette
-                            self._load_reference_palette()
-                            
-                            # ALWAYS initialize custom_palette with NEW layer colors first
-                            self.custom_palette = layer.colors if hasattr(layer, 'colors') else []
-                            
-                            # Check if this specific palette was exported/saved
-                            # Look for a saved .pal file that matches this character and fashion type
-                            import os
-                            exports_dir = os.path.join(self.icon_handler.root_dir, "exports", "custom_pals", "fashion")
-                            
-                            # Try multiple filename patterns that might match this character/fashion combination
-                            possible_filenames = []
-                            
-                            # Pattern 1: chr###_w#.pal (standard fashion palette format)
-                            if layer.palette_type.startswith('fashion_'):
-                                fashion_num = layer.palette_type.split('_')[1]
-                                possible_filenames.append(f"{char_id}_w{fashion_num}.pal")
-                            
-                            # Pattern 2: chr###_#.pal (hair palette format)
-                            if layer.palette_type == 'hair':
-                                # Extract hair number from layer name if possible
-                                hair_match = re.search(r'_(\d+)\.pal', layer.name)
-                                if hair_match:
-                                    hair_num = hair_match.group(1)
-                                    possible_filenames.append(f"{char_id}_{hair_num}.pal")
-                            
-                            # Pattern 3: Generic chr###_palette_type.pal format
-                            possible_filenames.append(f"{char_id}_{layer.palette_type}.pal")
-                            
-                            # Pattern 4: Look for any palette file that contains the character ID and matches the layer name
-                            if os.path.exists(exports_dir):
-                                for filename in os.listdir(exports_dir):
-                                    if filename.lower().endswith('.pal') and char_id in filename.lower():
-                                        # Check if this palette file corresponds to the current layer
-                                        # by examining the layer name for matching patterns
-                                        base_layer_name = os.path.splitext(layer.name)[0]  # Remove .pal extension
-                                        if base_layer_name.lower() in filename.lower():
-                                            possible_filenames.append(filename)
-                                
-                                # Try to find the first existing saved palette
-                                saved_palette_path = None
-                                for filename in possible_filenames:
-                                    test_path = os.path.join(exports_dir, filename)
-                                    if os.path.exists(test_path):
-                                        saved_palette_path = test_path
-                                        break
-                                
-                                if saved_palette_path:
-                                    # Validate that this saved palette truly matches the selected fashion and character
-                                    saved_filename = os.path.basename(saved_palette_path)
-                                    is_valid_match = self._validate_palette_match(saved_filename, char_id, layer.palette_type, layer.name)
-                                    
-                                    if is_valid_match:
-                                        # Override with saved palette colors
-                                        try:
-                                            with open(saved_palette_path, 'rb') as f:
-                                                pal_data = f.read()
-                                            
-                                            # Parse the saved palette
-                                            saved_palette = []
-                                            for i in range(0, len(pal_data), 3):
-                                                if i + 2 < len(pal_data):
-                                                    r, g, b = pal_data[i], pal_data[i+1], pal_data[i+2]
-                                                    saved_palette.append((r, g, b))
-                                            
-                                            # Override the default layer colors with saved palette
-                                            self.custom_palette = saved_palette
-                                        except Exception as e:
-                                            # Keep layer colors (already set above)
-                                            pass
-                                else:
-                                    # No saved palette found, try to load vanilla palette
-                                    vanilla_palette = self._load_vanilla_palette_for_item(char_id, layer.palette_type, layer.name)
-                                    if vanilla_palette:
-                                        # Override with vanilla palette
-                                        self.custom_palette = vanilla_palette
-                                    # else: keep layer colors (already set above)
-                            
-                            # Extract editable colors - this will generate fresh _unmatched_candidates
-                            self.editable_colors = self._extract_editable_colors()
-                            
-                            # Create a FRESH full palette with all indices (from scratch)
-                            full_palette = [(0, 0, 0)] * 256  # Initialize with black
-                            
-                            # Fill in the editable colors at their correct indices
-                            for idx, color in self.editable_colors.items():
-                                if idx < 256:  # Safety check
-                                    full_palette[idx] = color
-                            
-                            # Check if we have cached temporary changes for this palette
-                            new_palette_key = f"{char_id}_{layer.palette_type}"
-                            if hasattr(self, '_temp_palette_cache') and new_palette_key in self._temp_palette_cache:
-                                # Restore from temp cache to preserve temporary changes
-                                cached_colors = self._temp_palette_cache[new_palette_key]
-                                # Update only the editable indices from cache
-                                for idx in self.editable_colors.keys():
-                                    if idx < len(cached_colors):
-                                        full_palette[idx] = cached_colors[idx]
-                            
-                            # Set current_colors to the full palette (after cache restoration)
-                            self.current_colors = full_palette
-                            
-                            # Update cache
-                            if hasattr(self, '_temp_palette_cache'):
-                                self._temp_palette_cache[new_palette_key] = self.current_colors.copy()
-                                self._original_palettes[new_palette_key] = self.current_colors.copy()
-                            
-                            # Store the current palette key
-                            self._last_palette_key = f"{char_id}_{layer.palette_type}"
-                            
-                            # Refresh the UI completely
-                            
-                            # Reset selection state
-                            self.selected_index = 0
-                            self.selected_indices = set()
-                            
-                            # Force a complete UI refresh
-                            self._create_palette_grid()
-                            self._update_color_picker()
-                            self._update_preview()
-                            
-                            # Force window update
-                            self.window.update_idletasks()
-                            
-                            # Update window title
-                            self.window.title(f"Icon Palette Editor - {item_name}")
-                            
-                            # Prompt to save excess colors from the NEW palette after extraction
-                            self._prompt_save_excess_colors()
-                            
-                            # Clear protection flags after successful switch with delay
-                            self._clear_protection_flags()
-                            return  # Exit after successful switch
+                        # Try to find the first existing saved palette
+                        saved_palette_path = None
+                        for filename in possible_filenames:
+                            test_path = os.path.join(exports_dir, filename)
+                            if assets.exists(test_path):
+                                saved_palette_path = test_path
+                                break
+                        
+                        if saved_palette_path:
+                            # Validate that this saved palette truly matches the selected fashion and character
+                            saved_filename = os.path.basename(saved_palette_path)
+                            is_valid_match = self._validate_palette_match(saved_filename, char_id, layer.palette_type, layer.name)
                             
+                            if is_valid_match:
+                                # Override with saved palette colors
+                                saved_palette = assets.get_palette(saved_palette_path)
+                                if saved_palette is not None:
+                                    # Override the default layer colors with saved palette
+                                    self.custom_palette = saved_palette
+                                # else: keep layer colors (already set above)
+                        else:
+                            # No saved palette found, try to load vanilla palette
+                            vanilla_palette = self._load_vanilla_palette_for_item(char_id, layer.palette_type, layer.name)
+                            if vanilla_palette:
+                                # Override with vanilla palette
+                                self.custom_palette = vanilla_palette
+                            # else: keep layer colors (already set above)
+                    
+                    # Extract editable colors - this will generate fresh _unmatched_candidates
+                    self.editable_colors = self._extract_editable_colors()
+                    
+                    # Create a FRESH full palette with all indices (from scratch)
+                    full_palette = [(0, 0, 0)] * 256  # Initialize with black
+                    
+                    # Fill in the editable colors at their correct indices
+                    for idx, color in self.editable_colors.items():
+                        if idx < 256:  # Safety check
+                            full_palette[idx] = color
+                    
+                    # Check if we have cached temporary changes for this palette
+                    new_palette_key = f"{char_id}_{layer.palette_type}"
+                    if hasattr(self, '_temp_palette_cache') and new_palette_key in self._temp_palette_cache:
+                        # Restore from temp cache to preserve temporary changes
+                        cached_colors = self._temp_palette_cache[new_palette_key]
+                        # Update only the editable indices from cache
+                        for idx in self.editable_colors.keys():
+                            if idx < len(cached_colors):
+                                full_palette[idx] = cached_colors[idx]
+                    
+                    # Set current_colors to the full palette (after cache restoration)
+                    self.current_colors = full_palette
+                    
+                    # Update cache
+                    if hasattr(self, '_temp_palette_cache'):
+                        self._temp_palette_cache[new_palette_key] = self.current_colors.copy()
+                        self._original_palettes[new_palette_key] = self.current_colors.copy()
+                    
+                    # Store the current palette key
+                    self._last_palette_key = f"{char_id}_{layer.palette_type}"
+                    
+                    # Refresh the UI completely
+                    
+                    # Reset selection state
+                    self.selected_index = 0
+                    self.selected_indices = set()
+                    
+                    # Force a complete UI refresh
+                    self._create_palette_grid()
+                    self._update_color_picker()
+                    self._update_preview()
+                    
+                    # Force window update
+                    self.window.update_idletasks()
+                    
+                    # Update window title
+                    self.window.title(f"Icon Palette Editor - {item_name}")
+                    
+                    # Prompt to save excess colors from the NEW palette after extraction
+                    self._prompt_save_excess_colors()
+                    
+                    # Clear protection flags after successful switch with delay
+                    self._clear_protection_flags()
+                    return  # Exit after successful switch
+                    
         # Clear protection flags even if no match found
         self._clear_protection_flags()
     
@@ -3276,34 +3068,26 @@ class IconPaletteEditor:
         
         return False
     
+    def _get_dropdown_options(self):
+        """Return (current palette label, dropdown labels) from the shared palette index."""
+        current_palette_name = f"{self.icon_handler._get_fashion_name(self.char_id, self.fashion_type)} — {os.path.basename(self.palette_path)}"
+        # Hair and third job layers are not included in the dropdown
+        entries = self.icon_handler._palette_index.dropdown_entries(
+            self.palette_layers, self.icon_handler._get_fashion_name, skip_types=('hair', '3rd_job_base'))
+        palette_options = [label for label, _, _ in entries]
+        
+        # If no active layers found, just show current palette
+        if not palette_options:
+            palette_options = [current_palette_name]
+        return current_palette_name, palette_options
+    
     def refresh_dropdown_options(self):
         """Refresh the Edit Which dropdown options based on current palette layers."""
         if not hasattr(self, 'edit_combo') or not self.edit_combo:
             return
         
         # Populate dropdown with all active palettes
-        palette_options = []
-        current_palette_name = f"{self.icon_handler._get_fashion_name(self.char_id, self.fashion_type)} — {os.path.basename(self.palette_path)}"
-        
-        if self.palette_layers:
-            active_layers = [ly for ly in self.palette_layers if getattr(ly, "active", False)]
-            for layer in active_layers:
-                if hasattr(layer, 'name') and hasattr(layer, 'palette_type'):
-                    # Skip hair and third job layers - don't include them in the dropdown
-                    if layer.palette_type in ('hair', '3rd_job_base'):
-                        continue
-                    
-                    # Extract character and fashion info from layer name
-                    import re
-                    char_match = re.search(r'(?:chr)?(\d{3})', layer.name)
-                    if char_match:
-                        char_id = f"chr{char_match.group(1).zfill(3)}"
-                        fashion_name = self.icon_handler._get_fashion_name(char_id, layer.palette_type)
-                        palette_options.append(f"{fashion_name} — {layer.name}")
-        
-        # If no active layers found, just show current palette
-        if not palette_options:
-            palette_options = [current_palette_name]
+        current_palette_name, palette_options = self._get_dropdown_options()
         
         # Update the combobox values
         self.edit_combo.configure(values=palette_options)
@@ -3325,31 +3109,19 @@ class IconPaletteEditor:
         vanilla_fashion_dir = os.path.join(script_dir, "nonremovable_assets", "vanilla_pals", "fashion")
         
         # Try to find the vanilla palette file that matches this layer
-        if os.path.exists(vanilla_fashion_dir):
+        assets = self.icon_handler._assets
+        if assets.exists(vanilla_fashion_dir):
             # Extract the base name from the layer name (e.g., "chr001_w12.pal" -> "chr001_w12")
             base_layer_name = os.path.splitext(layer_name)[0] if layer_name.endswith('.pal') else layer_name
             
             # Look for a matching vanilla palette file
-            for filename in os.listdir(vanilla_fashion_dir):
-                if filename.lower().endswith('.pal'):
-                    base_filename = os.path.splitext(filename)[0]
-                    if base_filename.lower() == base_layer_name.lower():
-                        vanilla_path = os.path.join(vanilla_fashion_dir, filename)
-                        
-                        try:
-                            with open(vanilla_path, 'rb') as f:
-                                pal_data = f.read()
-                            
-                            # Parse the vanilla palette
-                            vanilla_palette = []
-                            for i in range(0, len(pal_data), 3):
-                                if i + 2 < len(pal_data):
-                                    r, g, b = pal_data[i], pal_data[i+1], pal_data[i+2]
-                                    vanilla_palette.append((r, g, b))
-                            
-                            return vanilla_palette
-                        except Exception as e:
-                            continue
+            filename = self.icon_handler._palette_index.directory(vanilla_fashion_dir).find_by_base_name(base_layer_name)
+            if filename:
+                vanilla_path = os.path.join(vanilla_fashion_dir, filename)
+                
+                vanilla_palette = assets.get_palette(vanilla_path)
+                if vanilla_palette is not None:
+                    return vanilla_palette
         
         return None
     
@@ -3739,31 +3511,15 @@ class IconPaletteEditor:
         try:
             # Use only BMP files for consistency
             bmp_path = self.image_path
-            if not os.path.exists(bmp_path):
-                return
             
-            # Load the BMP file for both image data and palette
-            bmp_img = Image.open(bmp_path)
+            # Load the BMP file for both image data and palette (decoded once, then cached)
+            bmp_img = self.icon_handler._assets.get_image(bmp_path)
+            if bmp_img is None:
+                return
             if bmp_img.mode != 'P':
                 bmp_img = bmp_img.convert('P')
             
-            # For transparency, we'll treat the keying color (magenta) as transparent
-            # Convert to RGBA to create alpha channel from keying color
-            img = bmp_img.convert("RGBA")
-            alpha_data = []
-            
-            # Create alpha channel: transparent where keying color exists
-            for pixel in img.getdata():
-                if pixel[:3] == self.keying_color:  # Keying color (usually magenta)
-                    alpha_data.append(0)  # Transparent
-                else:
-                    alpha_data.append(255)  # Opaque
-            
-            # Create alpha channel
-            alpha = Image.new('L', img.size)
-            alpha.putdata(alpha_data)
-            
-            # Get BMP palette and pixel data
+            # Get BMP palette
             bmp_palette_data = bmp_img.getpalette()
             if not bmp_palette_data:
                 return
@@ -3774,52 +3530,35 @@ class IconPaletteEditor:
                 if i + 2 < len(bmp_palette_data):
                     bmp_palette.append((bmp_palette_data[i], bmp_palette_data[i+1], bmp_palette_data[i+2]))
             
-            # Get BMP pixel indices
-            bmp_pixels = list(bmp_img.getdata())
-            
             # Load the base palette (_base.pal)
             base_pal_colors = []
-            if self.ref_pal_path and os.path.exists(self.ref_pal_path):
-                with open(self.ref_pal_path, 'rb') as f:
-                    base_pal_data = f.read()
-                    for i in range(0, len(base_pal_data), 3):
-                        if i + 2 < len(base_pal_data):
-                            base_pal_colors.append((base_pal_data[i], base_pal_data[i+1], base_pal_data[i+2]))
+            if self.ref_pal_path:
+                base_pal_colors = self.icon_handler._assets.get_palette(self.ref_pal_path) or []
             
             if not base_pal_colors:
                 return
             
-            # Check if the base palette is mostly keying colors (invalid reference palette)
-            non_keying_count = 0
-            for color in base_pal_colors:
-                if (color != (255, 0, 255) and color != (0, 255, 0) and 
-                    not self.is_universal_keying_color(color)):
-                    non_keying_count += 1
-            
-            
             # Create base palette to current_colors mapping using multi-pass matching
             base_to_custom_mapping = self.icon_handler._create_base_to_custom_mapping(
                 base_pal_colors, self.current_colors, self.char_id, self.fashion_type
             )
             
-            # Create BMP index to custom_palette index mapping
+            # First base palette index of each color, so matching a BMP color is a dict lookup
+            base_index_of_color = {}
+            for base_idx, base_color in enumerate(base_pal_colors):
+                base_index_of_color.setdefault(base_color, base_idx)
+            
+            # Create BMP index to custom_palette color mapping
             # Match BMP colors to base palette colors, then use mapped custom colors
-
             bmp_to_custom_map = {}
             
             for bmp_idx, bmp_color in enumerate(bmp_palette):
-                if (bmp_color == (255, 0, 255) or 
-                    bmp_color == (0, 255, 0) or 
-                    self.is_universal_keying_color(bmp_color)):
+                if keying.is_standard_keying_color(bmp_color):
                     bmp_to_custom_map[bmp_idx] = (255, 0, 255)  # Map to magenta
                     continue
                 
                 # Find matching color in base palette
-                base_pal_idx = None
-                for base_idx, base_color in enumerate(base_pal_colors):
-                    if base_color == bmp_color:
-                        base_pal_idx = base_idx
-                        break
+                base_pal_idx = base_index_of_color.get(bmp_color)
                 
                 if base_pal_idx is not None:
                     # Use the mapped custom color if available
@@ -3840,41 +3579,31 @@ class IconPaletteEditor:
                     # (don't default to magenta - that would key out valid pixels)
                     bmp_to_custom_map[bmp_idx] = bmp_color
             
-            # Create new RGB image with palette-translated colors
-            new_img = Image.new("RGB", img.size)
-            
-            transparent_count = 0
-            opaque_count = 0
-            
-            # Create color mapping for colorpicker (map BMP RGBA pixels to palette indices)
-            self.color_mapping = {}
-            
-            for y in range(img.size[1]):
-                for x in range(img.size[0]):
-                    if alpha.getpixel((x, y)) > 0:  # Not transparent
-                        # Get the BMP palette index for this pixel
-                        pixel_idx = y * img.size[0] + x
-                        if pixel_idx < len(bmp_pixels):
-                            bmp_idx = bmp_pixels[pixel_idx]
-                            
-                            # Get the mapped color
-                            final_color = bmp_to_custom_map.get(bmp_idx, (255, 0, 255))
-                            new_img.putpixel((x, y), final_color)
-                            
-                            # Store mapping for colorpicker (BMP pixel -> custom_palette index)
-                            bmp_pixel = img.getpixel((x, y))
-                            if bmp_pixel not in self.color_mapping and bmp_idx in bmp_to_custom_map:
-                                # Find which index in current_colors this color is
-                                for idx, color in enumerate(self.current_colors):
-                                    if color == final_color:
-                                        self.color_mapping[bmp_pixel] = idx
-                                        break
-                            
-                            opaque_count += 1
-                    else:
-                        # Use keying color for transparent areas
-                        new_img.putpixel((x, y), self.keying_color)
-                        transparent_count += 1
+            # Build one 256-entry LUT (BMP index -> output color) and apply it as the palette.
+            # Pixels whose BMP color is the keying color stay the keying color (transparent).
+            lut = []
+            for bmp_idx in range(256):
+                bmp_color = bmp_palette[bmp_idx] if bmp_idx < len(bmp_palette) else (0, 0, 0)
+                if bmp_color == self.keying_color:
+                    lut.append(tuple(self.keying_color))
+                else:
+                    lut.append(tuple(bmp_to_custom_map.get(bmp_idx, (255, 0, 255))))
+            
+            lut_img = bmp_img.copy()
+            lut_img.putpalette([c for color in lut for c in color])
+            new_img = lut_img.convert("RGB")
+            
+            # Colorpicker lookup table: BMP palette index -> current_colors index showing its color.
+            # Built once per 256 BMP entries rather than per pixel, using the first matching index.
+            first_index_of_color = {}
+            for idx, color in enumerate(self.current_colors):
+                first_index_of_color.setdefault(tuple(color), idx)
+            self._preview_bmp_to_color_index = [None] * 256
+            self._preview_bmp_transparent = [True] * 256
+            for bmp_idx, bmp_color in enumerate(bmp_palette[:256]):
+                self._preview_bmp_transparent[bmp_idx] = (bmp_color == self.keying_color)
+                if bmp_idx in bmp_to_custom_map:
+                    self._preview_bmp_to_color_index[bmp_idx] = first_index_of_color.get(bmp_to_custom_map[bmp_idx])
             
             # Save the base preview image (before resizing) for click detection
             self.preview_base_img = new_img
@@ -3892,6 +3621,11 @@ class IconPaletteEditor:
             preview_size = (int(new_img.size[0] * effective_zoom), int(new_img.size[1] * effective_zoom))
             preview_img = new_img.resize(preview_size, Image.NEAREST)
             
+            # Screen-to-source transform for clicks (the image sits at the label's origin)
+            self.preview_hitmap = PreviewHitMap()
+            self.preview_hitmap.add(self.image_path, IndexMap.from_image(bmp_img), 0, 0,
+                                    preview_size[0], preview_size[1])
+            
             # Convert to PhotoImage for tkinter
             self.preview_photo = ImageTk.PhotoImage(preview_img)
             if self.preview_label is not None:
@@ -3927,82 +3661,49 @@ class IconPaletteEditor:
     def _colorpick_from_preview(self, event):
         """Pick color from preview image."""
         try:
-            # Use the preview base image (already has correct palette applied)
-            if not hasattr(self, 'preview_base_img') or self.preview_base_img is None:
+            hit = self._preview_hit(event)
+            if hit is None:
                 return
             
-            # Get the click coordinates relative to the preview label
-            click_x = event.x
-            click_y = event.y
-            
-            # The preview is scaled up by effective zoom, so we need to scale down the coordinates
-            # Calculate the same effective zoom as in _update_preview
-            max_allowed_width = 230  # Same as in _update_preview
-            max_allowed_height = 230  # Same as in _update_preview
-            
-            max_zoom_x = max_allowed_width / self.preview_base_img.size[0] if self.preview_base_img.size[0] > 0 else self.zoom_level
-            max_zoom_y = max_allowed_height / self.preview_base_img.size[1] if self.preview_base_img.size[1] > 0 else self.zoom_level
-            max_allowed_zoom = min(max_zoom_x, max_zoom_y, self.zoom_level)
-            
-            effective_zoom = min(self.zoom_level, max_allowed_zoom)
-            
-            original_x = int(click_x / effective_zoom)
-            original_y = int(click_y / effective_zoom)
-            
-            # Check if the click is within the image bounds
-            if 0 <= original_x < self.preview_base_img.size[0] and 0 <= original_y < self.preview_base_img.size[1]:
-                # Get the original BMP pixel to use for mapping
-                original_img = Image.open(self.image_path)
-                if original_img.mode != 'P':
-                    original_img = original_img.convert('P')
-                
-                # Get the palette index at this position
-                pixel_idx = original_img.getpixel((original_x, original_y))
-                palette_data = original_img.getpalette()
-                
-                # Check if the pixel is transparent (keying color)
-                if palette_data and pixel_idx < len(palette_data)//3:
-                    r = palette_data[pixel_idx*3]
-                    g = palette_data[pixel_idx*3+1] 
-                    b = palette_data[pixel_idx*3+2]
-                    pixel_color = (r, g, b)
-                    is_transparent = (pixel_color == self.keying_color)
-                    pixel = (r, g, b, 255 if not is_transparent else 0)  # Create RGBA-like tuple
-                else:
-                    is_transparent = True
-                    pixel = (0, 0, 0, 0)
-                
-                if is_transparent:
-                    # Clicked on transparent area - pick the keying/background color
-                    picked_color = self.keying_color
-                else:
-                    # Get the actual color being displayed (after color mapping)
-                    if pixel in self.color_mapping:
-                        # Get the mapped color from current_colors
-                        color_index = self.color_mapping[pixel]
-                        
-                        # If inverse order is enabled, translate the index
-                        if self.inverse_order_var.get():
-                            color_index = len(self.current_colors) - 1 - color_index
-                        
-                        if 0 <= color_index < len(self.current_colors):
-                            picked_color = self.current_colors[color_index]
-                        else:
-                            picked_color = (0, 0, 0)
+            if self._preview_bmp_transparent[hit.index]:
+                # Clicked on transparent area - pick the keying/background color
+                picked_color = self.keying_color
+            else:
+                # Get the actual color being displayed (after color mapping)
+                color_index = self._preview_bmp_to_color_index[hit.index]
+                if color_index is not None:
+                    # If inverse order is enabled, translate the index
+                    if self.inverse_order_var.get():
+                        color_index = len(self.current_colors) - 1 - color_index
+                    
+                    if 0 <= color_index < len(self.current_colors):
+                        picked_color = self.current_colors[color_index]
                     else:
-                        # Fallback to black if mapping not found
                         picked_color = (0, 0, 0)
-                
-                # Check if picked color is a keying color and find alternative if needed
-                if self._is_keyed_color(picked_color):
-                    picked_color = self._find_nearest_non_keyed_color(picked_color)
-                
-                # Apply the picked color to selected palette indices
-                self._apply_colorpicked_color(picked_color)
+                else:
+                    # Fallback to black if mapping not found
+                    picked_color = (0, 0, 0)
+            
+            # Check if picked color is a keying color and find alternative if needed
+            if self._is_keyed_color(picked_color):
+                picked_color = self._find_nearest_non_keyed_color(picked_color)
+            
+            # Apply the picked color to selected palette indices
+            self._apply_colorpicked_color(picked_color)
                 
         except Exception as e:
             pass
     
+    def _preview_hit(self, event):
+        """Resolve a click on the preview label to the BMP pixel and palette index under it."""
+        hitmap = getattr(self, 'preview_hitmap', None)
+        if hitmap is None or not hasattr(self, '_preview_bmp_to_color_index'):
+            return None
+        hit = hitmap.lookup(event.x, event.y)
+        if hit is None or hit.index is None:
+            return None
+        return hit
+    
     def _colorpick_from_palette(self, index):
         """Pick color from palette square."""
         if 0 <= index < len(self.current_colors):
@@ -4095,69 +3796,28 @@ class IconPaletteEditor:
         
         # Original preview click behavior for color selection
         try:
-            # Use the preview base image (already has correct palette applied)
-            if not hasattr(self, 'preview_base_img') or self.preview_base_img is None:
+            hit = self._preview_hit(event)
+            if hit is None or self._preview_bmp_transparent[hit.index]:
                 return
             
-            # Get the click coordinates relative to the preview label
-            click_x = event.x
-            click_y = event.y
-            
-            # The preview is scaled up by effective zoom, so we need to scale down the coordinates
-            # Calculate the same effective zoom as in _update_preview
-            max_allowed_width = 230  # Same as in _update_preview (10px more stretch)
-            max_allowed_height = 230  # Same as in _update_preview
+            # Look up the color index shown by this BMP index
+            color_index = self._preview_bmp_to_color_index[hit.index]
+            if color_index is None:
+                return
             
-            max_zoom_x = max_allowed_width / self.preview_base_img.size[0] if self.preview_base_img.size[0] > 0 else self.zoom_level
-            max_zoom_y = max_allowed_height / self.preview_base_img.size[1] if self.preview_base_img.size[1] > 0 else self.zoom_level
-            max_allowed_zoom = min(max_zoom_x, max_zoom_y, self.zoom_level)
+            # If inverse order is enabled, translate the index
+            if self.inverse_order_var.get():
+                color_index = len(self.current_colors) - 1 - color_index
             
-            effective_zoom = min(self.zoom_level, max_allowed_zoom)
-            
-            original_x = int(click_x / effective_zoom)
-            original_y = int(click_y / effective_zoom)
+            # Convert display index to original index for selection
+            if hasattr(self, 'display_to_original_index'):
+                original_idx = self.display_to_original_index.get(color_index, color_index)
+            else:
+                original_idx = color_index
             
-            # Check if the click is within the image bounds
-            if 0 <= original_x < self.preview_base_img.size[0] and 0 <= original_y < self.preview_base_img.size[1]:
-                # Get the original BMP pixel to use for mapping
-                original_img = Image.open(self.image_path)
-                if original_img.mode != 'P':
-                    original_img = original_img.convert('P')
-                
-                # Get the palette index and color
-                pixel_idx = original_img.getpixel((original_x, original_y))
-                palette_data = original_img.getpalette()
-                
-                # Check if the pixel is transparent (keying color)
-                if palette_data and pixel_idx < len(palette_data)//3:
-                    r = palette_data[pixel_idx*3]
-                    g = palette_data[pixel_idx*3+1] 
-                    b = palette_data[pixel_idx*3+2]
-                    pixel_color = (r, g, b)
-                    is_transparent = (pixel_color == self.keying_color)
-                    pixel = (r, g, b, 255 if not is_transparent else 0)  # Create RGBA-like tuple for mapping
-                else:
-                    is_transparent = True
-                    pixel = (0, 0, 0, 0)
-                
-                if not is_transparent:
-                    # Look up the color index from our mapping (maps RGBA-like pixel to display index)
-                    if pixel in self.color_mapping:
-                        color_index = self.color_mapping[pixel]
-                        
-                        # If inverse order is enabled, translate the index
-                        if self.inverse_order_var.get():
-                            color_index = len(self.current_colors) - 1 - color_index
-                        
-                        # Convert display index to original index for selection
-                        if hasattr(self, 'display_to_original_index'):
-                            original_idx = self.display_to_original_index.get(color_index, color_index)
-                        else:
-                            original_idx = color_index
-                        
-                        # Select the corresponding color in the palette
-                        if 0 <= original_idx < len(self.current_colors):
-                            self._select_color(original_idx, "left", 0)
+            # Select the corresponding color in the palette
+            if 0 <= original_idx < len(self.current_colors):
+                self._select_color(original_idx, "left", 0)
                 
         except Exception as e:
             pass
@@ -4764,87 +4424,31 @@ class IconPaletteEditor:
         self._update_color_picker()
         self._update_preview()
     
-    def _is_keyed_color(self, color, index):
+    def _is_keyed_color(self, color, index=None):
         """Check if a color would be a keying color that should be avoided."""
-        r, g, b = color
-        
-        # Use the same comprehensive keying logic as the IconHandler
-        # Universal keying colors
-        if self.is_universal_keying_color(color):
-            return True
-        
-        # Magenta (chroma key)
-        if color == (255, 0, 255):
-            return True
-        
-        # Character-specific keying rules
-        char_num = self.char_id[3:] if self.char_id.startswith('chr') else self.char_id
-        
-        # chr004 specific rules
-        if char_num == "004":
-            # Black is now treated as a valid color for icon editor
-            # Only filter out the last palette index
-            if index == 255:  # Last color in palette
-                return True
-        
-        # chr003 (Sheep) - uses universal keying colors
-        elif char_num == "003":
-            return self.is_chr003_keying_color(color)
-        
-        # chr008 (Raccoon) - uses universal keying colors  
-        elif char_num == "008":
-            return self.is_chr008_keying_color(color)
-        
-        # chr011 (Sheep 2nd Job) - uses same as chr003
-        elif char_num == "011":
-            return self.is_chr011_keying_color(color)
-        
-        # chr014 (Lion 2nd Job) - uses selective keying
-        elif char_num == "014":
-            return self.is_chr014_keying_color(color)
-        
-        return False
+        # Same keying as the IconHandler, except black stays a valid color for chr004 icons
+        return keying.is_keyed("icon", self.char_id, color, index)
 
     def is_universal_keying_color(self, color):
         """Check if a color is a universal keying color for ALL characters"""
-        r, g, b = color
-        
-        # Pure green (0, 255, 0) - used by ALL characters including chr010
-        if color == (0, 255, 0):
-            return True
-        
-        # (0~25, 255, 0) pattern - used by chr002, chr008, chr024, and others
-        if g == 255 and b == 0 and 0 <= r <= 25:
-            return True
-        
-        # (0, 255, 0~21) pattern - used by chr003, chr011, chr019, and others
-        if g == 255 and r == 0 and 0 <= b <= 21:
-            return True
-        
-        return False
+        return keying.is_universal_keying_color(color)
 
     def is_chr003_keying_color(self, color):
         """Check if a color is a keying color for chr003 (Sheep)"""
-        # chr003 uses universal keying colors
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr008_keying_color(self, color):
         """Check if a color is a keying color for chr008 (Raccoon)"""
-        # chr008 uses universal keying colors
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr011_keying_color(self, color):
         """Check if a color is a keying color for chr011 (Sheep 2nd Job)"""
-        # chr011 uses the same keying patterns as chr003
-        return self.is_universal_keying_color(color) or color == (255, 0, 255)  # Magenta
+        return keying.is_standard_keying_color(color)
 
     def is_chr014_keying_color(self, color):
         """Check if a color is a keying color for chr014 (Lion 2nd Job)"""
-        # chr014 uses more selective keying to avoid over-transparency
         # Only key out pure green and magenta, not green variants
-        if color == (0, 255, 0) or color == (255, 0, 255):  # Pure green and magenta
-            return True
-        return False
+        return keying.is_selective_keying_color(color)
     
     def _find_nearest_non_keyed_color(self, color):
         """Find the nearest color that isn't a keying color."""
@@ -4872,17 +4476,16 @@ class IconPaletteEditor:
         """Quick export either icon or portrait using current settings."""
         try:
             if export_type == "icon":
-                # Use current settings to export icon
-                success = self.icon_handler.save_as_icon(
-                    self.char_id,
-                    self.fashion_type,
-                    self.current_colors,
-                    self.palette_path
+                # Use current settings to export icon; building and writing happen off the Tk thread
+                handler = self.icon_handler
+                char_id, fashion_type = self.char_id, self.fashion_type
+                colors = [tuple(c) for c in self.current_colors]  # Snapshot so later edits don't leak in
+                export_path = handler.get_icon_export_path(char_id, fashion_type, self.palette_path)
+                self._queue_icon_write(
+                    export_path,
+                    lambda: handler.render_icon(char_id, fashion_type, colors),
+                    ("icon", char_id, fashion_type, tuple(colors))
                 )
-                if success:
-                    messagebox.showinfo("Success", "Icon exported successfully!")
-                else:
-                    messagebox.showerror("Error", "Failed to export icon.")
             else:  # portrait
                 # Get the live editor window
                 if (self.live_editor_window and self.live_editor_window.winfo_exists() and 
@@ -4912,6 +4515,25 @@ class IconPaletteEditor:
             messagebox.showerror("Error", f"Export failed: {e}")
             self._bring_to_front()
 
+    def _queue_icon_write(self, export_path, build, key):
+        """Hand an icon save to the background writer and report the result in the status label."""
+        window = self.window
+        queue = self.icon_handler.get_write_queue(window.nametowidget("."))
+        
+        def on_written(target_path, success, error):
+            if not window.winfo_exists():
+                return
+            if success:
+                self.export_status_var.set(f"Icon saved: {os.path.basename(target_path)}")
+            else:
+                self.export_status_var.set("Failed to save icon")
+        
+        if queue.submit(export_path, build, on_written, key):
+            self.export_status_var.set(f"Saving {os.path.basename(export_path)}...")
+        else:
+            # Identical save already queued or on disk - nothing to write
+            self.export_status_var.set(f"Icon up to date: {os.path.basename(export_path)}")
+    
     def _export_icon(self):
         """Export the edited icon."""
         try:
@@ -4950,22 +4572,17 @@ class IconPaletteEditor:
                 if not export_path.lower().endswith('.bmp'):
                     export_path += '.bmp'
             
-            # Create directory if it doesn't exist when actually saving
-            os.makedirs(os.path.dirname(export_path), exist_ok=True)
-            
-            # Use the icon handler to save with our edited colors
-            success = self.icon_handler.save_as_icon_with_colors(
-                self.char_id, self.fashion_type, self.current_colors, 
-                self.keying_color, self.image_path, export_path
+            # Use the icon handler to save with our edited colors, off the Tk thread
+            handler = self.icon_handler
+            colors = [tuple(c) for c in self.current_colors]  # Snapshot so later edits don't leak in
+            keying_color, image_path = self.keying_color, self.image_path
+            self._queue_icon_write(
+                export_path,
+                lambda: handler.render_icon_with_colors(colors, keying_color, image_path),
+                ("colors", image_path, keying_color, tuple(colors))
             )
-            
-            if success:
-                messagebox.showinfo("Success", f"Icon saved to: {export_path}")
-                self._bring_to_front()
-                # Don't close the editor - let user continue editing
-            else:
-                messagebox.showerror("Error", "Failed to save icon")
-                self._bring_to_front()
+            # Don't close the editor - let user continue editing
+            self._bring_to_front()
                 
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export icon: {e}")
@@ -0,0 +1,115 @@
+import threading
+from collections import OrderedDict
+from keying import MAGENTA, PURE_GREEN, is_standard_keying_color
+
+# Color matching between a custom (vanilla layout) palette and an icon's base palette.
+#
+# Candidates are the editable custom colors keyed by their vanilla index. Pass 1
+# maps every candidate straight onto the same base index when that base color is
+# not a keying color. Each remaining candidate (in index order) then takes the
+# nearest still-free base color by squared RGB distance, ties going to the lowest
+# base index. Everything that depends only on the base palette (which indices are
+# keying, the eligible colors) is precomputed once per base palette, so a full
+# match is one row of the candidate x base distance matrix per leftover candidate.
+
+
+def is_base_keying_color(color):
+    """Return True for base palette colors the icon never uses (magenta and green variants)."""
+    return is_standard_keying_color(color)
+
+
+def collect_candidates(custom_palette, ranges, is_keyed):
+    """Return {vanilla_idx: (r, g, b)} of valid, non-keying colors inside the fashion ranges.
+
+    is_keyed(color, idx) is the caller's keying rule; magenta and pure green are
+    always excluded. Indices 0 and 255 are never editable.
+    """
+    candidates = {}
+    palette_len = len(custom_palette)
+    for r in ranges:
+        for idx in range(r.start, min(r.stop, palette_len)):
+            if idx == 0 or idx == 255:
+                continue
+            color = custom_palette[idx]
+
+            # Validate and convert color tuple
+            if not isinstance(color, (list, tuple)) or len(color) != 3:
+                continue
+            try:
+                color = (int(color[0]), int(color[1]), int(color[2]))
+            except (ValueError, TypeError):
+                continue
+            if not (0 <= color[0] <= 255 and 0 <= color[1] <= 255 and 0 <= color[2] <= 255):
+                continue
+
+            # Filter out keying colors
+            if color == MAGENTA or color == PURE_GREEN or is_keyed(color, idx):
+                continue
+            candidates[idx] = color
+    return candidates
+
+
+class BaseMatchTable:
+    """Precomputed matching data for one base palette."""
+
+    __slots__ = ("size", "direct", "columns")
+
+    def __init__(self, base_colors):
+        self.size = len(base_colors)
+        # direct[i] is True when base index i can take the candidate with the same index
+        self.direct = [not is_base_keying_color(c) for c in base_colors]
+        # Distance matrix columns: (base_idx, r, g, b) of every non-keying base color, in index order
+        self.columns = tuple((i, c[0], c[1], c[2]) for i, c in enumerate(base_colors) if self.direct[i])
+
+    def match(self, candidates):
+        """Map base palette indices to candidate colors; returns {base_idx: (r, g, b)}."""
+        mapping = {}
+        leftovers = []
+
+        # Pass 1: direct index-to-index matching
+        size, direct = self.size, self.direct
+        for vanilla_idx, color in candidates.items():
+            if vanilla_idx < size and direct[vanilla_idx]:
+                mapping[vanilla_idx] = color
+            else:
+                leftovers.append(color)
+
+        if not leftovers:
+            return mapping
+
+        # Pass 2: nearest free base color, one distance-matrix row per leftover candidate
+        free = [col for col in self.columns if col[0] not in mapping]
+        for cr, cg, cb in leftovers:
+            if not free:
+                break
+            row = [(cr - r) * (cr - r) + (cg - g) * (cg - g) + (cb - b) * (cb - b)
+                   for _, r, g, b in free]
+            # min() keeps the first minimum, i.e. the lowest base index on ties
+            best = min(range(len(row)), key=row.__getitem__)
+            mapping[free[best][0]] = (cr, cg, cb)
+            del free[best]
+        return mapping
+
+
+_TABLE_CACHE = OrderedDict()
+_TABLE_CACHE_SIZE = 64
+# Matching runs on the Tk thread, the icon write queue and export queue threads
+_TABLE_CACHE_LOCK = threading.Lock()
+
+
+def get_match_table(base_colors):
+    """Return the (cached) BaseMatchTable for a base palette."""
+    key = tuple(tuple(c) for c in base_colors)
+    with _TABLE_CACHE_LOCK:
+        table = _TABLE_CACHE.get(key)
+        if table is not None:
+            _TABLE_CACHE.move_to_end(key)
+            return table
+    table = BaseMatchTable(key)
+    with _TABLE_CACHE_LOCK:
+        # Another thread may have built the same table meanwhile; keep the cached one
+        table = _TABLE_CACHE.setdefault(key, table)
+        _TABLE_CACHE.move_to_end(key)
+        if len(_TABLE_CACHE) > _TABLE_CACHE_SIZE:
+            _TABLE_CACHE.popitem(last=False)
+    return table
@@ -0,0 +1,161 @@
+import os
+import threading
+
+# Background writer for icon exports.
+#
+# Building an icon (palette mapping, keying, BMP encode) and writing it to disk run
+# on one worker thread instead of the Tk thread. Saves are keyed by their target
+# file: a new save for a target that is still waiting replaces the waiting one, and
+# a save whose content key matches the waiting or last written save is dropped, so
+# hammering Quick Export never queues duplicate writes. Files are written to a
+# temporary name and renamed over the target, so a half-written icon is never seen.
+#
+# Completion callbacks run on the Tk thread through a short `after` poll, the same
+# way RenderWorker delivers previews.
+
+
+def write_image_atomic(img, path, image_format="BMP"):
+    """Save an image to a temporary file next to path, then rename it over path."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        img.save(tmp_path, image_format)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class IconWriteQueue:
+    """Single background thread that builds and writes icons, coalescing saves per target."""
+
+    POLL_MS = 50
+
+    def __init__(self, master=None):
+        self.master = master
+        self._cond = threading.Condition()
+        self._pending = {}   # target path -> (build, callback, key)
+        self._order = []     # target paths in submission order
+        self._written = {}   # target path -> (key, (mtime, size)) of the last completed write
+        self._results = []   # (callback, target path, success, error)
+        self._writing = None      # target path being written right now
+        self._writing_key = None
+        self._polling = False
+        self._thread = threading.Thread(target=self._run, name="IconWriteQueue", daemon=True)
+        self._thread.start()
+
+    def submit(self, target_path, build, callback=None, key=None):
+        """Queue build() -> PIL image to be written to target_path.
+
+        callback(target_path, success, error) runs on the Tk thread once the file is
+        written. key identifies the content (e.g. a palette snapshot); a save with the
+        same key as the one waiting or last written for this target is dropped.
+        Returns False if the save was dropped as a duplicate.
+        """
+        target_path = os.path.abspath(target_path)
+        with self._cond:
+            pending = self._pending.get(target_path)
+            if key is not None:
+                if pending is not None and pending[2] == key:
+                    return False
+                if pending is None:
+                    if self._writing == target_path:
+                        if self._writing_key == key:
+                            return False
+                    elif self._is_current(target_path, key):
+                        return False
+            if pending is None:
+                self._order.append(target_path)
+            # A newer save replaces one that hasn't started yet
+            self._pending[target_path] = (build, callback, key)
+            self._cond.notify()
+        self._schedule_poll()
+        return True
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending) + (1 if self._writing else 0)
+
+    def _is_current(self, target_path, key):
+        written = self._written.get(target_path)
+        if written is None or written[0] != key:
+            return False
+        try:
+            st = os.stat(target_path)
+        except OSError:
+            return False
+        # Only skip if nobody replaced the file since we wrote it
+        return written[1] == (st.st_mtime, st.st_size)
+
+    def _schedule_poll(self):
+        if self.master is None or self._polling:
+            return
+        try:
+            self.master.after(self.POLL_MS, self._poll)
+            self._polling = True
+        except Exception:
+            # Root window is gone
+            self._polling = False
+
+    def _poll(self):
+        """Deliver finished writes on the Tk thread."""
+        self._polling = False
+        with self._cond:
+            results = self._results
+            self._results = []
+            outstanding = bool(self._pending) or self._writing is not None
+        for callback, target_path, success, error in results:
+            try:
+                callback(target_path, success, error)
+            except Exception as e:
+                print(f"CONSOLE ERROR MSG: Error reporting icon export: {e}")
+        if outstanding:
+            self._schedule_poll()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._order:
+                    self._cond.wait()
+                target_path = self._order.pop(0)
+                build, callback, key = self._pending.pop(target_path)
+                self._writing = target_path
+                self._writing_key = key
+
+            success, error = False, None
+            try:
+                img = build()
+                if img is None:
+                    error = "icon could not be built"
+                else:
+                    write_image_atomic(img, target_path)
+                    success = True
+            except Exception as e:
+                error = e
+            if error is not None:
+                print(f"CONSOLE ERROR MSG: Failed to write icon {target_path}: {error}")
+
+            with self._cond:
+                self._writing = None
+                self._writing_key = None
+                if success and key is not None:
+                    try:
+                        st = os.stat(target_path)
+                        self._written[target_path] = (key, (st.st_mtime, st.st_size))
+                    except OSError:
+                        self._written.pop(target_path, None)
+                else:
+                    self._written.pop(target_path, None)
+                if callback is not None and self.master is not None:
+                    self._results.append((callback, target_path, success, error))
+            # Without a Tk master (headless use) report straight from the writer thread
+            if callback is not None and self.master is None:
+                try:
+                    callback(target_path, success, error)
+                except Exception as e:
+                    print(f"CONSOLE ERROR MSG: Error reporting icon export: {e}")
@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from PIL import Image, ImageChops
+
+# Keying (transparency) rules shared by the previewer and the icon editor.
+#
+# Every rule is compiled per character into a set of keyed RGB colors plus a set of
+# always-keyed palette indices. Checking one color is a set lookup, and a whole
+# palette compiles to a 256-byte index mask (1 = keyed) that images can be keyed
+# with in one Image.point() pass instead of a Python check per pixel.
+#
+# Rules:
+#   standard  - universal keying colors and magenta (every character)
+#   selective - pure green and magenta only (chr014 avoids over-transparency)
+#   palette   - standard; chr004 also keys black and index 255
+#   icon      - standard; chr004 also keys index 255 (black stays editable in the icon editor)
+#   fashion   - standard; chr004 keys only pure green and index 255
+#   hair      - standard; chr014 is selective
+#   display   - standard; chr014 is selective; black is never keyed
+#   near      - within 10 of magenta or pure green on every channel
+
+MAGENTA = (255, 0, 255)
+PURE_GREEN = (0, 255, 0)
+BLACK = (0, 0, 0)
+
+# Pure green, the (0~25, 255, 0) pattern and the (0, 255, 0~21) pattern
+UNIVERSAL_KEYING_COLORS = frozenset(
+    [PURE_GREEN] + [(r, 255, 0) for r in range(26)] + [(0, 255, b) for b in range(22)]
+)
+STANDARD_KEYING_COLORS = UNIVERSAL_KEYING_COLORS | {MAGENTA}
+SELECTIVE_KEYING_COLORS = frozenset([PURE_GREEN, MAGENTA])
+NEAR_KEYING_COLORS = frozenset(
+    [(r, g, b) for r in range(246, 256) for g in range(10) for b in range(246, 256)] +
+    [(r, g, b) for r in range(10) for g in range(246, 256) for b in range(10)]
+)
+
+RULES = ("standard", "selective", "palette", "icon", "fashion", "hair", "display", "near")
+
+
+def _as_rgb(color):
+    """Return color as an (r, g, b) tuple so lists and tuples look up the same way."""
+    if type(color) is tuple and len(color) == 3:
+        return color
+    try:
+        return (color[0], color[1], color[2]) if len(color) == 3 else None
+    except TypeError:
+        return None
+
+
+def is_universal_keying_color(color):
+    return _as_rgb(color) in UNIVERSAL_KEYING_COLORS
+
+
+def is_standard_keying_color(color):
+    """Universal keying colors and magenta."""
+    return _as_rgb(color) in STANDARD_KEYING_COLORS
+
+
+def is_selective_keying_color(color):
+    """Pure green and magenta only."""
+    return _as_rgb(color) in SELECTIVE_KEYING_COLORS
+
+
+def is_near_keying_color(color):
+    return _as_rgb(color) in NEAR_KEYING_COLORS
+
+
+def char_number(char_id):
+    """Return the 3-digit character number of 'chr004' / '004' (empty for None)."""
+    if not char_id:
+        return ""
+    return char_id[3:] if char_id.startswith("chr") else char_id
+
+
+class KeyingRule:
+    """One rule compiled for one character: keyed colors and always-keyed indices."""
+
+    __slots__ = ("name", "char_num", "colors", "indices", "_masks")
+
+    def __init__(self, name, char_num, colors, indices=()):
+        self.name = name
+        self.char_num = char_num
+        self.colors = frozenset(colors)
+        self.indices = frozenset(indices)
+        self._masks = OrderedDict()
+
+    def is_keyed(self, color, index=None):
+        return (index is not None and index in self.indices) or _as_rgb(color) in self.colors
+
+    def index_mask(self, palette):
+        """Return 256 bytes, 1 where the palette entry at that index is keyed.
+
+        Indices past the end of the palette are only keyed by index rules.
+        """
+        key = palette if type(palette) is tuple else tuple(map(_as_rgb, palette))
+        mask = self._masks.get(key)
+        if mask is not None:
+            self._masks.move_to_end(key)
+            return mask
+        colors, indices = self.colors, self.indices
+        size = len(key)
+        mask = bytes(1 if (i in indices or (i < size and key[i] in colors)) else 0
+                     for i in range(256))
+        self._masks[key] = mask
+        if len(self._masks) > 32:
+            self._masks.popitem(last=False)
+        return mask
+
+    def keyed_indices(self, palette):
+        mask = self.index_mask(palette)
+        return [i for i in range(256) if mask[i]]
+
+
+def _compile(name, char_num):
+    if name == "selective":
+        return KeyingRule(name, char_num, SELECTIVE_KEYING_COLORS)
+    if name == "near":
+        return KeyingRule(name, char_num, NEAR_KEYING_COLORS)
+    if name == "palette" and char_num == "004":
+        return KeyingRule(name, char_num, STANDARD_KEYING_COLORS | {BLACK}, (255,))
+    if name == "icon" and char_num == "004":
+        return KeyingRule(name, char_num, STANDARD_KEYING_COLORS, (255,))
+    if name == "fashion" and char_num == "004":
+        return KeyingRule(name, char_num, (PURE_GREEN,), (255,))
+    if name in ("hair", "display") and char_num == "014":
+        return KeyingRule(name, char_num, SELECTIVE_KEYING_COLORS)
+    if name not in RULES:
+        raise ValueError(f"Unknown keying rule: {name}")
+    return KeyingRule(name, char_num, STANDARD_KEYING_COLORS)
+
+
+_COMPILED = {}
+
+
+def get_rule(name, char_id=None):
+    """Return the compiled rule for a character ('chr004', '004' or None)."""
+    char_num = char_number(char_id)
+    rule = _COMPILED.get((name, char_num))
+    if rule is None:
+        rule = _compile(name, char_num)
+        _COMPILED[(name, char_num)] = rule
+    return rule
+
+
+def is_keyed(name, char_id, color, index=None):
+    return get_rule(name, char_id).is_keyed(color, index)
+
+
+def keyed_index_mask(name, char_id, palette):
+    return get_rule(name, char_id).index_mask(palette)
+
+
+def index_keying_alpha(indexed_img, mask):
+    """Return an "L" image that is 255 where an indexed image's pixel index is keyed."""
+    lut = bytes(255 if m else 0 for m in mask)
+    return Image.frombytes("L", indexed_img.size, indexed_img.tobytes()).point(list(lut))
+
+
+def color_keying_alpha(rgb_img, name, char_id):
+    """Return an "L" image that is 255 where an RGB image's pixel color is keyed, or None if nothing is."""
+    rule = get_rule(name, char_id)
+    if rgb_img.mode != "RGB":
+        rgb_img = rgb_img.convert("RGB")
+    colors = rgb_img.getcolors(maxcolors=rgb_img.width * rgb_img.height + 1) or []
+    keyed = [c for _, c in colors if c in rule.colors]
+    if not keyed:
+        return None
+    channels = rgb_img.split()
+    result = None
+    for color in keyed:
+        match = _channels_match(channels, color)
+        result = match if result is None else ImageChops.lighter(result, match)
+    return result
+
+
+def _channels_match(channels, color):
+    """255 where every channel equals the color's value for it."""
+    match = None
+    for channel, value in zip(channels, color):
+        hit = channel.point([255 if v == value else 0 for v in range(256)])
+        match = hit if match is None else ImageChops.multiply(match, hit)
+    return match
+
+
+def color_match_alpha(img, color):
+    """Return an "L" image that is 255 where an image's pixel RGB equals color (alpha is ignored)."""
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    return _channels_match(img.split()[:3], color)
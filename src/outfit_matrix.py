@@ -0,0 +1,111 @@
+import io
+import itertools
+import os
+
+from frame_export import FrameExportJob, decode_export_frame, save_export_frame, IMAGE_FORMATS
+
+# Outfit matrix export: every combination of the chosen palettes per layer
+# (e.g. each hair palette x each top), rendered for the chosen frames.
+#
+# Only the palette differs between combinations, so each worker process decodes
+# a frame once and keeps it while it renders the frame with every combination's
+# merged palette template. Work is ordered frame by frame, so a task covers a run
+# of combinations of the same frame. The templates are sent to each worker process
+# once, when the pool starts, instead of with every task. The job is a
+# FrameExportJob, so the progress window, cancel / resume and archive output work
+# the same way as for "Export all frames".
+
+# Images per worker task
+MATRIX_CHUNK_SIZE = 32
+# Decoded frames each worker process keeps
+DECODED_FRAME_CACHE_SIZE = 16
+
+# Merged palette templates of the running matrix job and decoded frames, per worker process
+_worker_templates = ()
+_worker_frames = {}
+
+
+def _init_matrix_worker(templates):
+    global _worker_templates
+    _worker_templates = templates
+    _worker_frames.clear()
+
+
+def _decode_frame(image_path):
+    decoded = _worker_frames.get(image_path)
+    if decoded is None:
+        decoded = decode_export_frame(image_path)
+        if len(_worker_frames) >= DECODED_FRAME_CACHE_SIZE:
+            _worker_frames.pop(next(iter(_worker_frames)))
+        _worker_frames[image_path] = decoded
+    return decoded
+
+
+def _export_matrix_chunk(char_id, chunk, image_format="png32", to_bytes=False):
+    """Worker entry point: export (position, image path, output path, combination) entries."""
+    results = []
+    for position, image_path, output_path, combination in chunk:
+        try:
+            original_img, original_palette = _decode_frame(image_path)
+            template = _worker_templates[combination]
+            if to_bytes:
+                buffer = io.BytesIO()
+                save_export_frame(original_img, original_palette, template, char_id, buffer, image_format)
+                results.append((position, None, buffer.getvalue()))
+            else:
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                save_export_frame(original_img, original_palette, template, char_id, output_path, image_format)
+                results.append((position, None, None))
+        except Exception as e:
+            results.append((position, f"{image_path}: {e}", None))
+    return results
+
+
+def layer_combinations(choices):
+    """Every combination of per-layer choices: [(layer, [(name, value)])] -> [[(layer, name, value)]]."""
+    layers = [(layer, options) for layer, options in choices if options]
+    return [[(layer, name, value) for (layer, _), (name, value) in zip(layers, combination)]
+            for combination in itertools.product(*(options for _, options in layers))]
+
+
+class OutfitMatrixJob(FrameExportJob):
+    """Frames x palette combinations; combinations are (name, merged palette template).
+
+    Each combination's frames go to a sub folder named after it.
+    """
+
+    def __init__(self, char_id, combinations, image_paths, output_dir, image_format="png32",
+                 archive_format=None, compression_level=6, manifest=None, incremental=True):
+        super().__init__(char_id, [None] * 256, image_paths, output_dir, image_format,
+                         archive_format, compression_level, manifest, incremental)
+        self.combinations = [name for name, _ in combinations]
+        self.templates = tuple(tuple(template) for _, template in combinations)
+        extension = IMAGE_FORMATS[image_format][0]
+        root = os.path.basename(output_dir) if archive_format else output_dir
+        self.frames = []
+        self.frame_combinations = []
+        # Frame-major order keeps a frame's combinations in consecutive tasks
+        for image_path in image_paths:
+            name = os.path.splitext(os.path.basename(image_path))[0]
+            for combination, combination_name in enumerate(self.combinations):
+                if archive_format:
+                    output_path = f"{root}/{combination_name}/{name}{extension}"
+                else:
+                    output_path = os.path.join(root, combination_name, f"{name}{extension}")
+                self.frames.append((image_path, output_path))
+                self.frame_combinations.append(combination)
+        self.manifest["combinations"] = list(self.combinations)
+        self.chunk_size = MATRIX_CHUNK_SIZE
+
+    def remaining(self):
+        return [(i, image_path, output_path, self.frame_combinations[i])
+                for i, (image_path, output_path) in enumerate(self.frames) if i not in self.completed]
+
+    def template_for(self, position):
+        return self.templates[self.frame_combinations[position]]
+
+    def worker_initializer(self):
+        return _init_matrix_worker, (self.templates,)
+
+    def chunk_call(self, chunk, to_bytes=False):
+        return _export_matrix_chunk, (self.char_id, chunk, self.image_format, to_bytes)
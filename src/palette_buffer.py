@@ -0,0 +1,187 @@
+import time
+from collections import deque
+
+# Compact palette storage for PaletteLayer.colors.
+#
+# A palette is 256 RGB triplets, i.e. exactly the 768 bytes of a VGA .pal file.
+# PaletteBuffer keeps those bytes instead of a list of tuples and behaves like the
+# list the rest of the code expects (indexing returns (r, g, b) tuples, item
+# assignment accepts any 3-sequence). copy() is copy-on-write: both buffers share
+# the same immutable bytes until one of them is written to, so snapshots taken on
+# every slider tick cost nothing until the palette actually changes.
+
+PALETTE_SIZE = 256
+
+
+class PaletteBuffer:
+    """List-like 256-color palette backed by a 768-byte copy-on-write buffer."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data=None):
+        if data is None:
+            data = bytes(PALETTE_SIZE * 3)
+        elif len(data) != PALETTE_SIZE * 3:
+            raise ValueError(f"Palette buffer must be {PALETTE_SIZE * 3} bytes, got {len(data)}")
+        # bytes = shared/read-only, bytearray = owned/writable
+        self._data = data if isinstance(data, (bytes, bytearray)) else bytes(data)
+
+    @classmethod
+    def from_colors(cls, colors):
+        """Build a buffer from a sequence of (r, g, b); missing entries are black."""
+        if isinstance(colors, PaletteBuffer):
+            return colors.copy()
+        data = bytearray(PALETTE_SIZE * 3)
+        for i, color in enumerate(colors):
+            if i >= PALETTE_SIZE:
+                break
+            data[i * 3:i * 3 + 3] = bytes((int(color[0]), int(color[1]), int(color[2])))
+        return cls(data)
+
+    def to_bytes(self):
+        """Return the raw 768-byte VGA palette."""
+        return bytes(self._data)
+
+    def tolist(self):
+        """Return the palette as a plain list of (r, g, b) tuples."""
+        data = self._data
+        return [(data[i], data[i + 1], data[i + 2]) for i in range(0, PALETTE_SIZE * 3, 3)]
+
+    def copy(self):
+        """Return a copy-on-write snapshot sharing this buffer's bytes."""
+        if isinstance(self._data, bytearray):
+            # Freeze our own bytes so both sides copy before their next write
+            self._data = bytes(self._data)
+        return PaletteBuffer(self._data)
+
+    def __len__(self):
+        return PALETTE_SIZE
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(PALETTE_SIZE))]
+        if index < 0:
+            index += PALETTE_SIZE
+        if not 0 <= index < PALETTE_SIZE:
+            raise IndexError("palette index out of range")
+        o = index * 3
+        data = self._data
+        return (data[o], data[o + 1], data[o + 2])
+
+    def __setitem__(self, index, color):
+        if index < 0:
+            index += PALETTE_SIZE
+        if not 0 <= index < PALETTE_SIZE:
+            raise IndexError("palette index out of range")
+        if not isinstance(self._data, bytearray):
+            self._data = bytearray(self._data)
+        o = index * 3
+        self._data[o:o + 3] = bytes((int(color[0]), int(color[1]), int(color[2])))
+
+    def __iter__(self):
+        data = self._data
+        for o in range(0, PALETTE_SIZE * 3, 3):
+            yield (data[o], data[o + 1], data[o + 2])
+
+    def __eq__(self, other):
+        if isinstance(other, PaletteBuffer):
+            return self._data == other._data
+        if isinstance(other, (list, tuple)):
+            return self.tolist() == [tuple(c) for c in other]
+        return NotImplemented
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"PaletteBuffer({len(self)} colors)"
+
+    def changed_indices(self, other):
+        """Return the palette indices whose color differs from another buffer."""
+        a, b = self._data, other._data
+        if a == b:
+            return []
+        return [i for i in range(PALETTE_SIZE) if a[i * 3:i * 3 + 3] != b[i * 3:i * 3 + 3]]
+
+
+class PaletteHistory:
+    """Per-layer undo/redo that stores only the palette indices each step changed.
+
+    Call record() after every edit; edits to the same layer within
+    `coalesce_seconds` of each other (e.g. one slider drag) become one step.
+    Each stack is bounded, so memory stays constant over long sessions.
+    """
+
+    def __init__(self, max_steps=200, coalesce_seconds=0.6):
+        self.max_steps = max_steps
+        self.coalesce_seconds = coalesce_seconds
+        self._base = {}   # layer name -> PaletteBuffer snapshot of the last recorded state
+        self._undo = {}   # layer name -> deque of {index: (old_rgb, new_rgb)}
+        self._redo = {}
+        self._last_record = {}  # layer name -> time of last recorded edit
+
+    def track(self, name, colors):
+        """Start tracking a layer from its current colors (clears its history)."""
+        self._base[name] = PaletteBuffer.from_colors(colors)
+        self._undo[name] = deque(maxlen=self.max_steps)
+        self._redo[name] = deque(maxlen=self.max_steps)
+        self._last_record.pop(name, None)
+
+    def record(self, name, colors, coalesce=True):
+        """Record the difference between the layer's colors and its last recorded state."""
+        if name not in self._base:
+            self.track(name, colors)
+            return False
+        current = colors if isinstance(colors, PaletteBuffer) else PaletteBuffer.from_colors(colors)
+        base = self._base[name]
+        changed = current.changed_indices(base)
+        if not changed:
+            return False
+
+        now = time.monotonic()
+        undo = self._undo[name]
+        if (coalesce and undo and
+                now - self._last_record.get(name, 0) < self.coalesce_seconds):
+            # Same gesture: extend the last step, keeping each index's oldest color
+            step = undo[-1]
+            for i in changed:
+                old = step[i][0] if i in step else base[i]
+                step[i] = (old, current[i])
+        else:
+            undo.append({i: (base[i], current[i]) for i in changed})
+
+        self._redo[name].clear()
+        self._base[name] = current.copy()
+        self._last_record[name] = now
+        return True
+
+    def can_undo(self, name):
+        return bool(self._undo.get(name))
+
+    def can_redo(self, name):
+        return bool(self._redo.get(name))
+
+    def undo(self, name, colors):
+        """Revert the last step on a layer in place; returns the changed indices."""
+        return self._step(name, colors, self._undo, self._redo, 0)
+
+    def redo(self, name, colors):
+        """Re-apply the last undone step on a layer in place; returns the changed indices."""
+        return self._step(name, colors, self._redo, self._undo, 1)
+
+    def _step(self, name, colors, source, target, side):
+        stack = source.get(name)
+        if not stack:
+            return []
+        # Fold any unrecorded edits into history first so nothing is lost
+        self.record(name, colors, coalesce=False)
+        stack = source[name]
+        if not stack:
+            return []
+        step = stack.pop()
+        for i, pair in step.items():
+            colors[i] = pair[side]
+        target[name].append(step)
+        self._base[name] = PaletteBuffer.from_colors(colors)
+        self._last_record.pop(name, None)
+        return sorted(step)
@@ -0,0 +1,129 @@
+import os
+import re
+import threading
+
+# Live index of the palettes the icon editor can switch between.
+#
+# The "Edit which" dropdown lists the active fashion layers. Each layer's label
+# (fashion name — layer name) and character are worked out once per layer name
+# and palette type instead of re-running the character regex on every refresh or
+# selection. Palette directories (saved custom palettes, vanilla palettes) are
+# indexed by character and by lower-cased file name; when a directory listing
+# changes only the added and removed files are re-indexed, so a library with
+# thousands of custom palettes costs one dict lookup per selection.
+
+LAYER_CHAR_PATTERN = re.compile(r'(?:chr)?(\d{3})')
+FILE_CHAR_PATTERN = re.compile(r'chr\d{3}')
+
+
+class PaletteDirectoryIndex:
+    """Incrementally maintained index of the .pal files in one directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._listing = None    # listing tuple the index was last updated from
+        self._names = set()     # every file name in that listing
+        self._by_char = {}      # 'chr001' -> {file name: None} (insertion ordered)
+        self._by_base = {}      # lower-cased name without extension -> file name
+
+    def update(self, listing):
+        """Bring the index in line with a directory listing (a tuple of file names)."""
+        if listing is self._listing:
+            return
+        names = set(listing)
+        removed, added = self._names - names, names - self._names
+        self._listing, self._names = listing, names
+        for filename in removed:
+            self._remove(filename)
+        for filename in sorted(added):
+            self._add(filename)
+
+    def _add(self, filename):
+        lower = filename.lower()
+        if not lower.endswith('.pal'):
+            return
+        for char_id in set(FILE_CHAR_PATTERN.findall(lower)):
+            self._by_char.setdefault(char_id, {})[filename] = None
+        self._by_base.setdefault(os.path.splitext(lower)[0], filename)
+
+    def _remove(self, filename):
+        lower = filename.lower()
+        if not lower.endswith('.pal'):
+            return
+        for char_id in set(FILE_CHAR_PATTERN.findall(lower)):
+            bucket = self._by_char.get(char_id)
+            if bucket is not None:
+                bucket.pop(filename, None)
+                if not bucket:
+                    del self._by_char[char_id]
+        base = os.path.splitext(lower)[0]
+        if self._by_base.get(base) == filename:
+            del self._by_base[base]
+            # Another file may differ from this one only by case
+            for other in self._names:
+                if other != filename and other.lower().endswith('.pal') and \
+                        os.path.splitext(other.lower())[0] == base:
+                    self._by_base[base] = other
+                    break
+
+    def files_for_char(self, char_id):
+        """Return the .pal file names whose name contains char_id."""
+        return list(self._by_char.get(char_id.lower(), ()))
+
+    def find_by_base_name(self, base_name):
+        """Return the .pal file name whose name without extension matches (case-insensitive), or None."""
+        return self._by_base.get(base_name.lower())
+
+
+class PaletteIndex:
+    """Shared index of dropdown entries and palette directories for the icon editor."""
+
+    def __init__(self, assets):
+        self._assets = assets
+        self._lock = threading.RLock()
+        self._layer_entries = {}   # (layer name, palette type) -> (char_id, label) or None
+        self._directories = {}     # directory -> PaletteDirectoryIndex
+
+    def layer_entry(self, layer, fashion_name_for):
+        """Return (char_id, label) for a layer, or None if its name has no character number.
+
+        fashion_name_for(char_id, palette_type) gives the display name (IconHandler._get_fashion_name).
+        """
+        key = (layer.name, layer.palette_type)
+        with self._lock:
+            if key in self._layer_entries:
+                return self._layer_entries[key]
+        char_match = LAYER_CHAR_PATTERN.search(layer.name)
+        entry = None
+        if char_match:
+            char_id = f"chr{char_match.group(1).zfill(3)}"
+            entry = (char_id, f"{fashion_name_for(char_id, layer.palette_type)} — {layer.name}")
+        with self._lock:
+            self._layer_entries[key] = entry
+        return entry
+
+    def dropdown_entries(self, palette_layers, fashion_name_for, skip_types=()):
+        """Return [(label, char_id, layer)] for the active layers, in layer order."""
+        entries = []
+        for layer in palette_layers or ():
+            if not getattr(layer, "active", False):
+                continue
+            if not hasattr(layer, 'name') or not hasattr(layer, 'palette_type'):
+                continue
+            if layer.palette_type in skip_types:
+                continue
+            entry = self.layer_entry(layer, fashion_name_for)
+            if entry is not None:
+                entries.append((entry[1], entry[0], layer))
+        return entries
+
+    def directory(self, directory):
+        """Return the up-to-date PaletteDirectoryIndex of a directory."""
+        listing = self._assets.listdir_data(directory)
+        with self._lock:
+            index = self._directories.get(directory)
+            if index is None:
+                index = PaletteDirectoryIndex(directory)
+                self._directories[directory] = index
+            index.update(listing)
+            return index
@@ -0,0 +1,78 @@
+from PIL import Image, ImageChops
+
+import keying
+
+# Portrait (105x105) exports, with or without the MyShop "cute" background.
+#
+# A frame rendered on the preview background is centered on the portrait; its
+# background-colored pixels stay out. The foreground mask comes from per-channel
+# point() lookups instead of a per-pixel loop, and the MyShop base with its magenta
+# replaced (by a background color, or by transparency) is built once per color and
+# reused, so each portrait costs one paste.
+
+PORTRAIT_SIZE = (105, 105)
+
+
+def foreground_mask(img, background_color):
+    """Return an "L" mask that is 255 where a frame's pixel is not the background color."""
+    return ImageChops.invert(keying.color_match_alpha(img, background_color))
+
+
+def _portrait_offset(img):
+    return ((PORTRAIT_SIZE[0] - img.width) // 2, (PORTRAIT_SIZE[1] - img.height) // 2)
+
+
+class MyShopBase:
+    """The MyShop base image with its magenta recolored, cached per background color."""
+
+    MAGENTA = (255, 0, 255)
+
+    def __init__(self, base_img, cache_size=8):
+        self.base_img = base_img
+        self._cache = {}
+        self._cache_size = cache_size
+
+    def recolored(self, background_color=None):
+        """Return the base with magenta turned into background_color (RGB), or transparent (RGBA) for None.
+
+        The cached image is shared; copy it before drawing on it.
+        """
+        key = tuple(background_color) if background_color is not None else None
+        img = self._cache.get(key)
+        if img is None:
+            magenta = keying.color_match_alpha(self.base_img.convert("RGB"), self.MAGENTA)
+            if key is None:
+                img = self.base_img.convert("RGBA")
+                img.paste((0, 0, 0, 0), mask=magenta)
+            else:
+                img = self.base_img.convert("RGB")
+                img.paste(key, mask=magenta)
+            if len(self._cache) >= self._cache_size:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = img
+        return img
+
+
+def compose_portrait(img, background_color, base=None, mask=None):
+    """Center a frame on a 105x105 RGB portrait filled with the background color or on a MyShopBase."""
+    if mask is None:
+        mask = foreground_mask(img, background_color)
+    if base is None:
+        portrait = Image.new("RGB", PORTRAIT_SIZE, background_color)
+    else:
+        portrait = base.recolored(background_color).copy()
+    portrait.paste(img, _portrait_offset(img), mask)
+    return portrait
+
+
+def compose_transparent_portrait(img, background_color, base=None, mask=None):
+    """Like compose_portrait, but RGBA with the background (and the base's magenta) transparent."""
+    if mask is None:
+        mask = foreground_mask(img, background_color)
+    if base is None:
+        portrait = Image.new("RGBA", PORTRAIT_SIZE, (0, 0, 0, 0))
+    else:
+        portrait = base.recolored(None).copy()
+    # Background pixels are masked out, so the frame can be pasted as it is
+    portrait.paste(img.convert("RGBA"), _portrait_offset(img), mask)
+    return portrait
@@ -0,0 +1,94 @@
+from PIL import Image
+
+# Click-to-palette-index lookup for preview surfaces.
+#
+# Every preview (simple live-editor preview, main canvas in single/all/custom mode,
+# icon editor preview) records where each frame was drawn and keeps the frame's
+# decoded palette indices. A click is then resolved with a rectangle test and one
+# byte lookup instead of reopening the image file and redoing the zoom math.
+
+
+class IndexMap:
+    """Palette indices of one indexed frame, stored as raw bytes (one byte per pixel)."""
+
+    __slots__ = ("width", "height", "data")
+
+    def __init__(self, width, height, data):
+        self.width = width
+        self.height = height
+        self.data = data
+
+    @classmethod
+    def from_image(cls, img):
+        """Build an index map from a PIL image (converted to "P" if needed)."""
+        if img.mode != "P":
+            img = img.convert("P")
+        return cls(img.size[0], img.size[1], img.tobytes())
+
+    @classmethod
+    def from_path(cls, image_path):
+        with Image.open(image_path) as img:
+            return cls.from_image(img)
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+    def index_at(self, x, y):
+        """Return the palette index at source pixel (x, y), or None if outside the frame."""
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.data[y * self.width + x]
+        return None
+
+
+class PreviewHit:
+    """Result of a hit test: which frame was clicked, where, and which palette index."""
+
+    __slots__ = ("frame_key", "x", "y", "index")
+
+    def __init__(self, frame_key, x, y, index):
+        self.frame_key = frame_key
+        self.x = x
+        self.y = y
+        self.index = index
+
+
+class PreviewHitMap:
+    """Screen-to-source transforms for every frame currently drawn on a surface."""
+
+    def __init__(self):
+        self._placements = []
+
+    def clear(self):
+        self._placements = []
+
+    def add(self, frame_key, index_map, x, y, display_w, display_h, anchor="nw"):
+        """Record a frame drawn at (x, y) with the given display size and Tk anchor."""
+        if index_map is None or display_w <= 0 or display_h <= 0:
+            return
+        # Resolve the anchor to the top-left corner, the same way Tk places images
+        if anchor in ("center", "n", "s"):
+            left = x - display_w // 2
+        elif anchor in ("ne", "e", "se"):
+            left = x - display_w
+        else:
+            left = x
+        if anchor in ("center", "w", "e"):
+            top = y - display_h // 2
+        elif anchor in ("sw", "s", "se"):
+            top = y - display_h
+        else:
+            top = y
+        scale_x = index_map.width / display_w
+        scale_y = index_map.height / display_h
+        self._placements.append((left, top, display_w, display_h, scale_x, scale_y, frame_key, index_map))
+
+    def lookup(self, x, y):
+        """Resolve surface coordinates to a PreviewHit, or None if no frame is there."""
+        # Later placements are drawn on top, so test them first
+        for left, top, w, h, sx, sy, frame_key, index_map in reversed(self._placements):
+            if left <= x < left + w and top <= y < top + h:
+                src_x = min(int((x - left) * sx), index_map.width - 1)
+                src_y = min(int((y - top) * sy), index_map.height - 1)
+                return PreviewHit(frame_key, src_x, src_y, index_map.index_at(src_x, src_y))
+        return None
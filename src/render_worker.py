@@ -0,0 +1,178 @@
+import threading
+from PIL import Image
+
+# Background rendering for the live palette editor previews.
+#
+# Slider callbacks run on the Tk event thread, so palette application, keying and
+# zoom resizing are handed to a single worker thread. Each request carries an
+# immutable snapshot (frame path + 256-entry display palette + output size), so the
+# worker never touches PaletteTool state. Only the newest request per channel is
+# kept: older pending requests are dropped when a newer edit arrives, and results
+# that finish after a newer request was submitted are discarded.
+#
+# Tk is not thread-safe, so results are collected on the Tk thread by a short
+# `after` poll that only runs while work is outstanding.
+
+
+class RenderRequest:
+    """Immutable snapshot of everything needed to render one preview frame."""
+
+    __slots__ = ("image_path", "palette", "size", "resample", "indexed_img")
+
+    def __init__(self, image_path, palette, size=None, resample=Image.NEAREST, indexed_img=None):
+        self.image_path = image_path
+        # Optional already-decoded indexed frame; it is only read, never modified
+        self.indexed_img = indexed_img
+        # Flatten to a tuple so later palette edits can't leak into this request
+        self.palette = tuple(int(c) for rgb in palette for c in rgb)
+        self.size = tuple(size) if size else None
+        self.resample = resample
+
+
+def render_indexed_frame(indexed_img, palette, size=None, resample=Image.NEAREST):
+    """Apply a flat 768-value palette to an indexed frame and return an RGB image."""
+    frame = indexed_img.copy()
+    frame.putpalette(palette)
+    rgb_img = frame.convert("RGB")
+    if size and size != rgb_img.size and size[0] > 0 and size[1] > 0:
+        rgb_img = rgb_img.resize(size, resample)
+    return rgb_img
+
+
+class RenderWorker:
+    """Single background thread that renders palette previews off the Tk thread."""
+
+    POLL_MS = 10
+
+    def __init__(self, master, frame_cache_size=64):
+        self.master = master
+        self._cond = threading.Condition()
+        self._pending = {}      # channel -> (generation, request, callback)
+        self._results = []      # (channel, generation, image, error, callback)
+        self._generation = {}   # channel -> newest submitted generation
+        self._polling = False
+        self._stopped = False
+        self._busy = False
+
+        # Decoded indexed frames keyed by path (guarded by _cond)
+        self._frame_cache = {}
+        self._frame_cache_order = []
+        self._frame_cache_size = frame_cache_size
+
+        self._thread = threading.Thread(target=self._run, name="RenderWorker", daemon=True)
+        self._thread.start()
+
+    def submit(self, channel, request, callback):
+        """Queue a render for a channel, replacing any request still waiting there.
+
+        The callback is invoked on the Tk thread as callback(image) only if no newer
+        request was submitted on the same channel in the meantime.
+        """
+        with self._cond:
+            generation = self._generation.get(channel, 0) + 1
+            self._generation[channel] = generation
+            self._pending[channel] = (generation, request, callback)
+            self._cond.notify()
+        self._schedule_poll()
+        return generation
+
+    def cancel(self, channel):
+        """Drop any pending or in-flight result for a channel."""
+        with self._cond:
+            self._generation[channel] = self._generation.get(channel, 0) + 1
+            self._pending.pop(channel, None)
+
+    def stop(self):
+        """Stop the worker thread; pending requests are discarded."""
+        with self._cond:
+            self._stopped = True
+            self._pending.clear()
+            self._cond.notify()
+
+    def _schedule_poll(self):
+        if self._polling or self._stopped:
+            return
+        try:
+            self.master.after(self.POLL_MS, self._poll)
+            self._polling = True
+        except Exception:
+            # Root window is gone
+            self._polling = False
+
+    def _poll(self):
+        """Deliver finished renders on the Tk thread."""
+        self._polling = False
+        with self._cond:
+            results = self._results
+            self._results = []
+            outstanding = bool(self._pending) or self._busy
+        for channel, generation, image, error, callback in results:
+            if generation != self._generation.get(channel):
+                continue  # A newer edit superseded this render
+            if error is not None:
+                print(f"CONSOLE ERROR MSG: Background render failed: {error}")
+                continue
+            try:
+                callback(image)
+            except Exception as e:
+                print(f"CONSOLE ERROR MSG: Error displaying background render: {e}")
+        if outstanding:
+            self._schedule_poll()
+
+    def load_frame(self, image_path, cache=True):
+        """Return the decoded indexed frame, from the preview cache when it is there.
+
+        With cache=False a frame that isn't cached yet is decoded without being added,
+        so bulk exports don't push the preview's frames out. Callers must not modify it.
+        """
+        if cache:
+            return self._load_frame(image_path)
+        with self._cond:
+            frame = self._frame_cache.get(image_path)
+        return frame if frame is not None else self._decode_frame(image_path)
+
+    @staticmethod
+    def _decode_frame(image_path):
+        with Image.open(image_path) as img:
+            return img.convert("P") if img.mode != "P" else img.copy()
+
+    def _load_frame(self, image_path):
+        with self._cond:
+            frame = self._frame_cache.get(image_path)
+        if frame is None:
+            frame = self._decode_frame(image_path)
+            with self._cond:
+                if image_path not in self._frame_cache:
+                    self._frame_cache_order.append(image_path)
+                self._frame_cache[image_path] = frame
+                while len(self._frame_cache_order) > self._frame_cache_size:
+                    old = self._frame_cache_order.pop(0)
+                    self._frame_cache.pop(old, None)
+        return frame
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+                channel = next(iter(self._pending))
+                generation, request, callback = self._pending.pop(channel)
+                self._busy = True
+
+            image, error = None, None
+            # Skip the work entirely if a newer request already arrived
+            if generation == self._generation.get(channel):
+                try:
+                    frame = request.indexed_img
+                    if frame is None:
+                        frame = self._load_frame(request.image_path)
+                    image = render_indexed_frame(frame, request.palette, request.size, request.resample)
+                except Exception as e:
+                    error = e
+
+            with self._cond:
+                self._busy = False
+                if image is not None or error is not None:
+                    self._results.append((channel, generation, image, error, callback))
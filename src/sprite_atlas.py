@@ -0,0 +1,183 @@
+import json
+import math
+import os
+from PIL import Image
+
+from frame_export import decode_export_frame, indexed_frame_palette, render_export_frame
+from icon_writer import write_image_atomic
+
+# Sprite sheet (atlas) export.
+#
+# A character's frames are rendered with the same merged palette and keying as
+# "Export all frames", trimmed to their opaque area and packed into one RGBA sheet.
+# The sheet is written with a single PNG save, next to a JSON file that lists each
+# frame's rectangle in the sheet and where the trimmed area sits in the original
+# frame, so tools that pack atlases themselves can cut the frames back out.
+#
+# Packers:
+#   shelf     - rows of frames sorted by height; fast and predictable
+#   maxrects  - free-rectangle packing (bottom-left rule); tighter sheets
+
+PACKERS = ("maxrects", "shelf")
+PACKER_LABELS = {
+    "maxrects": "MaxRects",
+    "shelf": "Shelf",
+}
+
+
+def _sheet_width(sizes):
+    """Starting sheet width: roughly square, but never narrower than the widest frame."""
+    area = sum(w * h for w, h in sizes)
+    return max(max(w for w, _ in sizes), int(math.ceil(math.sqrt(area))))
+
+
+def pack_shelf(sizes, width=None):
+    """Place (w, h) sizes on shelves; returns ([(x, y)] in input order, (sheet w, sheet h))."""
+    if not sizes:
+        return [], (0, 0)
+    width = width or _sheet_width(sizes)
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0
+    used_width = 0
+    for i in order:
+        w, h = sizes[i]
+        if x and x + w > width:
+            y += shelf_height
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        x += w
+        used_width = max(used_width, x)
+        shelf_height = max(shelf_height, h)
+    return positions, (used_width, y + shelf_height)
+
+
+def _contains(outer, inner):
+    return (inner[0] >= outer[0] and inner[1] >= outer[1] and
+            inner[0] + inner[2] <= outer[0] + outer[2] and
+            inner[1] + inner[3] <= outer[1] + outer[3])
+
+
+def _split_free_rects(free_rects, used):
+    """Cut a placed rectangle out of the free rectangles and drop the redundant ones."""
+    x, y, w, h = used
+    split = []
+    for free in free_rects:
+        fx, fy, fw, fh = free
+        if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+            split.append(free)
+            continue
+        if x > fx:
+            split.append((fx, fy, x - fx, fh))
+        if x + w < fx + fw:
+            split.append((x + w, fy, fx + fw - x - w, fh))
+        if y > fy:
+            split.append((fx, fy, fw, y - fy))
+        if y + h < fy + fh:
+            split.append((fx, y + h, fw, fy + fh - y - h))
+    # A free rectangle inside another one can never give a better placement
+    split.sort(key=lambda r: r[2] * r[3])
+    return [r for i, r in enumerate(split)
+            if not any(_contains(other, r) for other in split[i + 1:])]
+
+
+def pack_maxrects(sizes, width=None):
+    """MaxRects packing into a sheet of fixed width; returns like pack_shelf."""
+    if not sizes:
+        return [], (0, 0)
+    width = width or _sheet_width(sizes)
+    free_rects = [(0, 0, width, sum(h for _, h in sizes))]
+    order = sorted(range(len(sizes)), key=lambda i: (-max(sizes[i]), -min(sizes[i])))
+    positions = [None] * len(sizes)
+    used_width = used_height = 0
+    for i in order:
+        w, h = sizes[i]
+        best = None
+        for fx, fy, fw, fh in free_rects:
+            if w <= fw and h <= fh and (best is None or (fy, fx) < (best[1], best[0])):
+                best = (fx, fy)
+        positions[i] = best
+        free_rects = _split_free_rects(free_rects, (best[0], best[1], w, h))
+        used_width = max(used_width, best[0] + w)
+        used_height = max(used_height, best[1] + h)
+    return positions, (used_width, used_height)
+
+
+def pack_frames(sizes, packer="maxrects", padding=1):
+    """Pack frame sizes with padding pixels between frames; returns ([(x, y)], (sheet w, sheet h))."""
+    if packer not in PACKERS:
+        raise ValueError(f"Unknown sprite sheet packer: {packer}")
+    padded = [(w + padding, h + padding) for w, h in sizes]
+    pack = pack_maxrects if packer == "maxrects" else pack_shelf
+    positions, (sheet_width, sheet_height) = pack(padded)
+    if sizes:
+        # No padding after the last column / row
+        sheet_width -= padding
+        sheet_height -= padding
+    return positions, (max(sheet_width, 1), max(sheet_height, 1))
+
+
+def build_sprite_atlas(char_id, template, image_paths, packer="maxrects", padding=1, trim=True,
+                       load_frame=None, progress=None, cancel_event=None):
+    """Render and pack frames into one sheet.
+
+    load_frame(image_path) returns a decoded indexed frame (e.g. RenderWorker.load_frame);
+    without it frames are decoded like "Export all frames". progress(done, total) is called
+    per rendered frame. Returns (sheet RGBA image, frame entries, failed), or None when
+    cancel_event is set before the sheet is put together.
+    """
+    sprites = []
+    failed = []
+    total = len(image_paths)
+    for done, image_path in enumerate(image_paths, 1):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        try:
+            if load_frame is not None:
+                original_img = load_frame(image_path)
+                original_palette = indexed_frame_palette(original_img)
+            else:
+                original_img, original_palette = decode_export_frame(image_path)
+            rgba_img = render_export_frame(original_img, original_palette, template, char_id)
+            box = (0, 0) + rgba_img.size
+            if trim:
+                # Fully transparent frames keep one pixel so they still get a rectangle
+                box = rgba_img.getchannel("A").getbbox() or (0, 0, 1, 1)
+                rgba_img = rgba_img.crop(box)
+            sprites.append((image_path, rgba_img, box, original_img.size))
+        except Exception as e:
+            failed.append(f"{image_path}: {e}")
+        if progress:
+            progress(done, total)
+
+    positions, sheet_size = pack_frames([sprite[1].size for sprite in sprites], packer, padding)
+    sheet = Image.new("RGBA", sheet_size, (0, 0, 0, 0))
+    entries = []
+    for (image_path, rgba_img, box, source_size), (x, y) in zip(sprites, positions):
+        sheet.paste(rgba_img, (x, y))
+        w, h = rgba_img.size
+        entries.append({
+            "name": os.path.splitext(os.path.basename(image_path))[0],
+            "source": image_path,
+            "frame": {"x": x, "y": y, "w": w, "h": h},
+            "trimmed": (w, h) != tuple(source_size),
+            "sprite_source_size": {"x": box[0], "y": box[1], "w": w, "h": h},
+            "source_size": {"w": source_size[0], "h": source_size[1]},
+        })
+    return sheet, entries, failed
+
+
+def save_sprite_atlas(sheet, entries, image_path, meta=None):
+    """Write the sheet PNG and its JSON sidecar (same name, .json); returns the sidecar path."""
+    json_path = os.path.splitext(image_path)[0] + ".json"
+    data = {
+        "frames": entries,
+        "meta": dict(meta or {}, image=os.path.basename(image_path), format="RGBA8888",
+                     size={"w": sheet.width, "h": sheet.height}),
+    }
+    write_image_atomic(sheet, image_path, "PNG")
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, json_path)
+    return json_path
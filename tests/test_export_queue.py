@@ -0,0 +1,57 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from export_queue import ExportQueue, DONE  # noqa: E402
+
+
+class ExportQueueHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.history_path = os.path.join(self.directory, "export_queue.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _join_export_threads(self):
+        # A finishing export saves the history and then starts the next queued one,
+        # so join until no export thread is left
+        while True:
+            threads = [thread for thread in threading.enumerate() if thread.name.startswith("Export-")]
+            if not threads:
+                return
+            for thread in threads:
+                thread.join()
+
+    def test_concurrent_saves(self):
+        export_queue = ExportQueue(self.history_path, max_workers=6)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            for i in range(30):
+                export_queue.submit(f"export {i}", [os.path.join(self.directory, str(i))],
+                                    lambda progress, cancel_event: "ok")
+            threads = [threading.Thread(target=export_queue.save_history) for _ in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self._join_export_threads()
+        self.assertNotIn("CONSOLE ERROR MSG", output.getvalue())
+        with open(self.history_path, encoding="utf-8") as f:
+            saved = json.load(f)["exports"]
+        self.assertEqual([entry["status"] for entry in saved], [DONE] * 30)
+        self.assertEqual([name for name in os.listdir(self.directory) if name.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
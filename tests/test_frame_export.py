@@ -0,0 +1,80 @@
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import zipfile
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+from frame_export import FrameExportJob, run_export  # noqa: E402
+from outfit_matrix import OutfitMatrixJob  # noqa: E402
+
+FRAME_COUNT = 20
+
+
+class RunExportPoolTest(unittest.TestCase):
+    """run_export with a process pool (workers >= 2) on real character frames."""
+
+    def setUp(self):
+        self.image_paths = sorted(glob.glob(os.path.join(SRC_DIR, "rawbmps", "chr002", "*.bmp")))[:FRAME_COUNT]
+        if len(self.image_paths) < FRAME_COUNT:
+            self.skipTest("chr002 frames not found")
+        self.output_dir = tempfile.mkdtemp()
+        self.template = [None] * 256
+        self.template[5] = (10, 20, 30)
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def _job(self, name, **kwargs):
+        job = FrameExportJob("chr002", self.template, self.image_paths,
+                             os.path.join(self.output_dir, name), **kwargs)
+        # Small chunks so the frames are spread over several pool tasks
+        job.chunk_size = 4
+        return job
+
+    def _files(self, folder):
+        files = {}
+        for name in os.listdir(folder):
+            if name.endswith(".png"):
+                with open(os.path.join(folder, name), "rb") as f:
+                    files[name] = f.read()
+        return files
+
+    def test_folder_export_matches_serial(self):
+        pooled = self._job("pooled", incremental=False)
+        result = run_export(pooled, workers=2)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(result.exported, FRAME_COUNT)
+
+        serial = self._job("serial", incremental=False)
+        run_export(serial, workers=1)
+        self.assertEqual(self._files(pooled.output_dir), self._files(serial.output_dir))
+
+    def test_archive_export(self):
+        job = self._job("archived", archive_format="zip")
+        result = run_export(job, workers=2)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(result.exported, FRAME_COUNT)
+        with zipfile.ZipFile(job.archive_path) as archive:
+            names = [name for name in archive.namelist() if name.endswith(".png")]
+        self.assertEqual(len(names), FRAME_COUNT)
+
+    def test_outfit_matrix(self):
+        other = list(self.template)
+        other[5] = (200, 100, 0)
+        job = OutfitMatrixJob("chr002", [("a", self.template), ("b", other)], self.image_paths,
+                              os.path.join(self.output_dir, "matrix"), incremental=False)
+        job.chunk_size = 8
+        result = run_export(job, workers=2)
+        self.assertEqual(result.failed, [])
+        self.assertEqual(result.exported, 2 * FRAME_COUNT)
+        for combination in ("a", "b"):
+            self.assertEqual(len(self._files(os.path.join(job.output_dir, combination))), FRAME_COUNT)
+
+
+if __name__ == "__main__":
+    unittest.main()